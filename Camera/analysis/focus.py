@@ -0,0 +1,346 @@
+import numpy as np
+import time
+
+from Camera.meta.image_statistics import MAD_TO_SIGMA
+
+
+FWHM_TO_SIGMA = 2. * np.sqrt(2. * np.log(2.))
+
+
+def estimate_background(img, max_pixels=262144):
+    """
+    Estimates the background and the noise of an image with the median and
+    the MAD of a regular subsample.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param max_pixels: the maximal number of used pixels
+    :type max_pixels: int
+    :returns: the background and the robust sigma of the background
+    :rtype: tuple
+    """
+    step = max(int(np.ceil(np.sqrt(float(img.size) / max_pixels))), 1)
+    sample = np.asarray(img[::step, ::step], dtype=np.float32).ravel()
+    background = float(np.median(sample))
+    sigma = MAD_TO_SIGMA * float(np.median(np.abs(sample - background)))
+    return background, sigma
+
+
+def find_stars(img, background, sigma, threshold=5., radius=6, max_stars=200,
+               saturation=65535):
+    """
+    Finds the local maxima above the threshold. Maxima next to a brighter
+    maximum, at the border or with saturated pixels are rejected.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param background: the background of the image
+    :type background: float
+    :param sigma: the noise of the background
+    :type sigma: float
+    :param threshold: the detection threshold in units of sigma
+    :type threshold: float
+    :param radius: the half size of the measurement box in pixels
+    :type radius: int
+    :param max_stars: the maximal number of stars, the brightest are used
+    :type max_stars: int
+    :param saturation: the first saturated value
+    :type saturation: int
+    :returns: the y- and x-positions of the stars, the brightest first
+    :rtype: tuple
+    """
+    h, w = img.shape
+    if h <= 2 * radius or w <= 2 * radius:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    limit = background + threshold * max(sigma, 1.)
+    core = img[1:-1, 1:-1]
+    # a maximum is larger than its 8 neighbours, the strict comparison to
+    # the upper left neighbours removes equal pairs
+    peaks = core > limit
+    for dy, dx in ((-1, -1), (-1, 0), (-1, 1), (0, -1)):
+        peaks &= core > img[1 + dy:h - 1 + dy, 1 + dx:w - 1 + dx]
+    for dy, dx in ((0, 1), (1, -1), (1, 0), (1, 1)):
+        peaks &= core >= img[1 + dy:h - 1 + dy, 1 + dx:w - 1 + dx]
+    y, x = np.nonzero(peaks)
+    y += 1
+    x += 1
+    inside = (y >= radius) & (y < h - radius) & (x >= radius) & (x < w - radius)
+    y = y[inside]
+    x = x[inside]
+    values = img[y, x]
+    order = np.argsort(values)[::-1][:4 * max_stars]
+    y = y[order]
+    x = x[order]
+    if len(y) == 0:
+        return y, x
+    boxes = __cut_boxes__(img, y, x, radius)
+    unsaturated = boxes.reshape(len(y), -1).max(axis=1) < saturation
+    y = y[unsaturated]
+    x = x[unsaturated]
+    # removes the fainter maxima of blended stars
+    distance = np.hypot(y[:, None] - y[None, :], x[:, None] - x[None, :])
+    brighter = np.tril(distance < 2 * radius, -1)
+    isolated = ~brighter.any(axis=1)
+    return y[isolated][:max_stars], x[isolated][:max_stars]
+
+
+def __cut_boxes__(img, y, x, radius):
+    """
+    Cuts the boxes around the positions in one indexing step.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param y: the y-positions
+    :type y: numpy.ndarray
+    :param x: the x-positions
+    :type x: numpy.ndarray
+    :param radius: the half size of the boxes
+    :type radius: int
+    :returns: array with the shape (stars, 2 * radius + 1, 2 * radius + 1)
+    :rtype: numpy.ndarray
+    """
+    offsets = np.arange(-radius, radius + 1)
+    return img[(y[:, None] + offsets)[:, :, None],
+               (x[:, None] + offsets)[:, None, :]]
+
+
+def measure_stars(img, threshold=5., radius=None, max_stars=200, saturation=65535,
+                  min_radius=6, max_radius=40):
+    """
+    Detects the stars and measures their HFD and FWHM with the moments of
+    the background subtracted boxes. All stars are measured together.
+    Without a radius the box grows with the stars: a box, which is smaller
+    than 1.5 times the median HFD, cuts the wings of defocused stars, so
+    the stars are measured again with a larger box.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param threshold: the detection threshold in units of sigma
+    :type threshold: float
+    :param radius: the half size of the measurement box in pixels or None
+    :type radius: int
+    :param max_stars: the maximal number of stars
+    :type max_stars: int
+    :param saturation: the first saturated value
+    :type saturation: int
+    :param min_radius: the first box half size without a radius
+    :type min_radius: int
+    :param max_radius: the largest box half size without a radius
+    :type max_radius: int
+    :returns:
+        dict with the arrays 'x', 'y' (centroids), 'flux', 'peak', 'hfd',
+        'fwhm' and 'ellipticity' and the values 'background', 'sigma' and
+        'radius' (the used box half size)
+    :rtype: dict
+    """
+    background, sigma = estimate_background(img)
+    if radius is not None:
+        return __measure_boxes__(img, background, sigma, threshold, radius,
+                                 max_stars, saturation)
+    radius = min_radius
+    while True:
+        stars = __measure_boxes__(img, background, sigma, threshold, radius,
+                                  max_stars, saturation)
+        if len(stars['hfd']) == 0:
+            return stars
+        needed = int(np.ceil(1.5 * np.median(stars['hfd'])))
+        if needed <= radius or radius >= max_radius:
+            return stars
+        radius = min(max(needed, radius + 2), max_radius)
+
+
+def __measure_boxes__(img, background, sigma, threshold, radius, max_stars,
+                      saturation):
+    """
+    Detects the stars and measures them in boxes of one size.
+
+    :returns: see :func:`measure_stars`
+    :rtype: dict
+    """
+    y, x = find_stars(img, background, sigma, threshold, radius, max_stars,
+                      saturation)
+    boxes = __cut_boxes__(img, y, x, radius).astype(np.float32) - background
+    np.clip(boxes, 0, None, out=boxes)
+    offsets = np.arange(-radius, radius + 1, dtype=np.float32)
+    flux = boxes.sum(axis=(1, 2))
+    valid = flux > 0
+    boxes = boxes[valid]
+    flux = flux[valid]
+    y = y[valid]
+    x = x[valid]
+
+    # first moments
+    cy = (boxes.sum(axis=2) * offsets).sum(axis=1) / flux
+    cx = (boxes.sum(axis=1) * offsets).sum(axis=1) / flux
+    dy = offsets[None, :, None] - cy[:, None, None]
+    dx = offsets[None, None, :] - cx[:, None, None]
+    # second moments
+    myy = (boxes * dy * dy).sum(axis=(1, 2)) / flux
+    mxx = (boxes * dx * dx).sum(axis=(1, 2)) / flux
+    mxy = (boxes * dx * dy).sum(axis=(1, 2)) / flux
+    fwhm = FWHM_TO_SIGMA * np.sqrt(np.clip((mxx + myy) / 2., 0, None))
+    # the axis ratio from the eigenvalues of the moment matrix
+    root = np.sqrt(((mxx - myy) / 2.) ** 2 + mxy ** 2)
+    major = (mxx + myy) / 2. + root
+    minor = np.clip((mxx + myy) / 2. - root, 0, None)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ellipticity = np.where(major > 0, 1. - np.sqrt(minor / major), 0.)
+    # the half flux diameter is two times the flux weighted mean distance
+    hfd = 2. * (boxes * np.hypot(dy, dx)).sum(axis=(1, 2)) / flux
+
+    return {'x': x + cx, 'y': y + cy, 'flux': flux,
+            'peak': boxes.max(axis=(1, 2)) if len(boxes) > 0 else flux,
+            'hfd': hfd, 'fwhm': fwhm, 'ellipticity': ellipticity,
+            'background': background, 'sigma': sigma, 'radius': radius}
+
+
+def get_focus_metrics(img, **kwargs):
+    """
+    Returns the focus metrics of a frame.
+
+    :param img: the frame
+    :type img: numpy.ndarray
+    :param kwargs: the arguments of :func:`measure_stars`
+    :returns:
+        dict with the number of 'stars', the medians 'hfd', 'fwhm' and
+        'ellipticity' (None without stars), the 'hfd_sigma' (robust),
+        'background', 'sigma', the box 'radius' and the 'duration' of the
+        measurement
+    :rtype: dict
+    """
+    start = time.perf_counter()
+    stars = measure_stars(img, **kwargs)
+    n = len(stars['hfd'])
+    metrics = {'stars': n, 'hfd': None, 'fwhm': None, 'ellipticity': None,
+               'hfd_sigma': None, 'background': stars['background'],
+               'sigma': stars['sigma'], 'radius': stars['radius']}
+    if n > 0:
+        hfd = float(np.median(stars['hfd']))
+        metrics['hfd'] = hfd
+        metrics['fwhm'] = float(np.median(stars['fwhm']))
+        metrics['ellipticity'] = float(np.median(stars['ellipticity']))
+        metrics['hfd_sigma'] = MAD_TO_SIGMA * float(np.median(np.abs(stars['hfd'] - hfd)))
+    metrics['duration'] = time.perf_counter() - start
+    return metrics
+
+
+def fit_focus_curve(positions, values, model='hyperbola', weights=None):
+    """
+    Fits the focus curve and returns the best focuser position.
+    The hyperbola value = a * sqrt(1 + ((position - c) / b) ** 2) is the
+    shape of the HFD or FWHM of a defocused star. It's fitted as parabola
+    of the squared values, so the fit is linear. The parabola is fitted
+    directly to the values.
+
+    :param positions: the focuser positions
+    :type positions: list
+    :param values: the HFD or FWHM at the positions
+    :type values: list
+    :param model: 'hyperbola' or 'parabola'
+    :type model: str
+    :param weights: the weights of the points or None
+    :type weights: list
+    :returns:
+        dict with the best 'position', the 'minimum' value at the position,
+        the 'model', its 'coefficients' and the 'residual' (RMS of the values)
+    :rtype: dict
+    :raises ValueError:
+        if there are less than 3 points, the model is unknown or the curve
+        has no minimum
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(positions) & np.isfinite(values)
+    positions = positions[valid]
+    values = values[valid]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[valid]
+    if len(positions) < 3:
+        raise ValueError('At least 3 points are needed')
+    # centered positions for a stable fit
+    center = positions.mean()
+    shifted = positions - center
+    if model == 'hyperbola':
+        p = np.polyfit(shifted, values ** 2, 2, w=weights)
+    elif model == 'parabola':
+        p = np.polyfit(shifted, values, 2, w=weights)
+    else:
+        raise ValueError('Unknown model: {}'.format(model))
+    if p[0] <= 0:
+        raise ValueError('The focus curve has no minimum')
+    best = -p[1] / (2. * p[0])
+    minimum = p[2] - p[1] ** 2 / (4. * p[0])
+    if model == 'hyperbola':
+        if minimum <= 0:
+            raise ValueError('The focus curve has no minimum')
+        a = np.sqrt(minimum)
+        coefficients = {'a': float(a), 'b': float(a / np.sqrt(p[0])),
+                        'c': float(best + center)}
+        fitted = np.sqrt(np.clip(np.polyval(p, shifted), 0, None))
+        minimum = a
+    else:
+        coefficients = {'p2': float(p[0]), 'p1': float(p[1] - 2 * p[0] * center),
+                        'p0': float(np.polyval(p, -center))}
+        fitted = np.polyval(p, shifted)
+    return {'position': float(best + center), 'minimum': float(minimum),
+            'model': model, 'coefficients': coefficients,
+            'residual': float(np.sqrt(np.mean((values - fitted) ** 2)))}
+
+
+class FocusCurve:
+    """
+    Collects the focus metrics of an autofocus run and fits the curve.
+    """
+
+    def __init__(self, metric='hfd', min_stars=3):
+        """
+        :param metric: 'hfd' or 'fwhm'
+        :type metric: str
+        :param min_stars: the minimal number of stars of a usable frame
+        :type min_stars: int
+        """
+        self.metric = metric
+        self.min_stars = min_stars
+        self.points = []
+
+    def add(self, position, img, **kwargs):
+        """
+        Measures a frame and adds it to the curve.
+
+        :param position: the focuser position of the frame
+        :type position: float
+        :param img: the frame
+        :type img: numpy.ndarray
+        :param kwargs: the arguments of :func:`measure_stars`
+        :returns: the focus metrics of the frame, see :func:`get_focus_metrics`
+        :rtype: dict
+        """
+        metrics = get_focus_metrics(img, **kwargs)
+        self.add_metrics(position, metrics)
+        return metrics
+
+    def add_metrics(self, position, metrics):
+        """
+        Adds already measured metrics to the curve.
+
+        :param position: the focuser position of the frame
+        :type position: float
+        :param metrics: the metrics, see :func:`get_focus_metrics`
+        :type metrics: dict
+        """
+        if metrics['stars'] >= self.min_stars and metrics[self.metric] is not None:
+            self.points.append((position, metrics[self.metric], metrics['stars']))
+
+    def fit(self, model='hyperbola'):
+        """
+        Fits the curve with the number of stars as weights.
+
+        :param model: 'hyperbola' or 'parabola'
+        :type model: str
+        :returns: the fit, see :func:`fit_focus_curve`
+        :rtype: dict
+        """
+        positions = [p[0] for p in self.points]
+        values = [p[1] for p in self.points]
+        weights = np.sqrt([p[2] for p in self.points])
+        return fit_focus_curve(positions, values, model, weights)
@@ -0,0 +1,344 @@
+from collections import OrderedDict
+from datetime import datetime
+from threading import Thread, Event, Lock
+import numpy as np
+import os
+import time
+
+from Camera.meta.directory_layout import clean_name
+from Camera.meta.image_statistics import STATISTICS_KEYS
+
+
+class LiveStack:
+    """
+    The LiveStack is the running mean and variance of a sequence of frames
+    with the Welford algorithm. With sigma clipping, every pixel which
+    deviates more than clip_sigma standard deviations of the current
+    stack is rejected (after min_clip_frames frames). The memory is fixed:
+    three float32 arrays of the frame size.
+    The frames aren't registered, the stack assumes a guided telescope.
+    """
+
+    def __init__(self, shape, clip_sigma=None, min_clip_frames=5):
+        """
+        :param shape: the shape of the frames
+        :type shape: tuple
+        :param clip_sigma: the clipping limit in standard deviations or None
+        :type clip_sigma: float
+        :param min_clip_frames: the number of frames before the clipping starts
+        :type min_clip_frames: int
+        """
+        self.shape = tuple(shape)
+        self.clip_sigma = clip_sigma
+        self.min_clip_frames = min_clip_frames
+        self.mean = np.zeros(self.shape, dtype=np.float32)
+        self.m2 = np.zeros(self.shape, dtype=np.float32)
+        self.count = np.zeros(self.shape, dtype=np.float32)
+        self.frames = 0
+        self.rejected = 0
+        self.paths = []
+        self.update_time = None
+        self.lock = Lock()
+
+    def add(self, img, path=None):
+        """
+        Adds a frame to the stack.
+
+        :param img: the frame
+        :type img: numpy.ndarray
+        :param path: the path of the frame or None
+        :type path: str
+        :raises ValueError: if the frame has another shape than the stack
+        """
+        if img.shape != self.shape:
+            raise ValueError('The frame has the shape {}, the stack {}'.format(
+                img.shape, self.shape))
+        x = np.asarray(img, dtype=np.float32)
+        self.lock.acquire()
+        try:
+            delta = x - self.mean
+            if self.clip_sigma is not None and self.frames >= self.min_clip_frames:
+                n = np.maximum(self.count, 2)
+                variance = self.m2 / (n - 1)
+                # the limit for a new frame is wider than clip_sigma standard
+                # deviations, because the mean and the variance are only
+                # estimates (Student-t quantile in the Cornish-Fisher
+                # approximation), else the clipping shrinks the variance
+                z = self.clip_sigma
+                widening = (1 + (z * z + 1) / (4 * (n - 1))) ** 2 * (n + 1) / n
+                # pixels without scatter are never clipped
+                use = (delta * delta <= z * z * widening * variance) | (variance == 0)
+                self.rejected += int(use.size - np.count_nonzero(use))
+            else:
+                use = True
+            np.add(self.count, 1, out=self.count, where=use)
+            np.add(self.mean, delta / np.maximum(self.count, 1), out=self.mean, where=use)
+            np.add(self.m2, delta * (x - self.mean), out=self.m2, where=use)
+            self.frames += 1
+            if path is not None:
+                self.paths.append(path)
+            self.update_time = time.time()
+        finally:
+            self.lock.release()
+
+    def get_view(self):
+        """
+        Returns the current stack without a copy. The view is read-only and
+        changes with the next frame.
+
+        :returns: the mean of all used frames
+        :rtype: numpy.ndarray
+        """
+        view = self.mean.view()
+        view.flags.writeable = False
+        return view
+
+    def get_variance(self):
+        """
+        Returns the variance of the frames of every pixel.
+
+        :returns: the variance
+        :rtype: numpy.ndarray
+        """
+        self.lock.acquire()
+        variance = self.m2 / np.maximum(self.count - 1, 1)
+        self.lock.release()
+        return variance
+
+    def get_snapshot(self):
+        """
+        Returns a copy of the stack, which isn't changed by the next frame.
+
+        :returns: the mean, the variance and the number of frames
+        :rtype: tuple
+        """
+        self.lock.acquire()
+        mean = self.mean.copy()
+        variance = self.m2 / np.maximum(self.count - 1, 1)
+        frames = self.frames
+        self.lock.release()
+        return mean, variance, frames
+
+    def write_snapshot(self, path, header=None):
+        """
+        Writes the current stack as FITS file.
+
+        :param path: the path of the file
+        :type path: str
+        :param header: the header of a frame or None
+        :type header: astropy.io.fits.Header
+        :returns: the path of the file
+        :rtype: str
+        """
+        from astropy.io import fits
+        mean, variance, frames = self.get_snapshot()
+        hdu = fits.PrimaryHDU(mean)
+        if header is not None:
+            for card in header.cards:
+                # the data statistics belong to the single frame
+                if card.keyword not in hdu.header and card.keyword not in \
+                        ('BZERO', 'BSCALE') + STATISTICS_KEYS:
+                    hdu.header.append(card)
+        hdu.header['NCOMBINE'] = (frames, 'Number of stacked frames')
+        hdu.header['STACKREJ'] = (self.rejected, 'Number of clipped pixels')
+        if self.clip_sigma is not None:
+            hdu.header['STACKCLP'] = (self.clip_sigma, 'Sigma clipping limit')
+        for i, frame_path in enumerate(self.paths[:999]):
+            hdu.header['IMCMB{:03d}'.format(i + 1)] = frame_path[-68:]
+        variance_hdu = fits.ImageHDU(variance, name='VARIANCE')
+        fits.HDUList([hdu, variance_hdu]).writeto(path, overwrite=True)
+        return path
+
+
+class LiveStacker:
+    """
+    The LiveStacker keeps one :class:`LiveStack` per key like target,
+    filter, image type and sequence. If there are more stacks than
+    max_stacks, the oldest stack is removed, so the memory is bounded.
+    The snapshots are written by a background thread, a stack with several
+    new frames since its last snapshot is written only once.
+    """
+
+    def __init__(self, max_stacks=4, clip_sigma=3., min_clip_frames=5,
+                 snapshot_directory=None):
+        """
+        :param max_stacks: the maximal number of stacks
+        :type max_stacks: int
+        :param clip_sigma: the clipping limit of the stacks or None
+        :type clip_sigma: float
+        :param min_clip_frames: the number of frames before the clipping starts
+        :type min_clip_frames: int
+        :param snapshot_directory:
+            the directory for FITS snapshots of the stacks or None
+        :type snapshot_directory: str
+        """
+        self.max_stacks = max_stacks
+        self.clip_sigma = clip_sigma
+        self.min_clip_frames = min_clip_frames
+        self.snapshot_directory = snapshot_directory
+        self.stacks = OrderedDict()
+        self.lock = Lock()
+        # the stacks and headers of the snapshots, which aren't written yet
+        self.pending_snapshots = OrderedDict()
+        self.snapshot_event = Event()
+        self.snapshots_written = Event()
+        self.snapshots_written.set()
+        self.snapshot_thread = None
+        self.error_message = ''
+
+    def add(self, key, img, path=None, header=None):
+        """
+        Adds a frame to the stack of the key. A stack with another frame
+        size is started again.
+
+        :param key: the key of the stack like (target, filter, type, sequence)
+        :type key: tuple
+        :param img: the frame
+        :type img: numpy.ndarray
+        :param path: the path of the frame or None
+        :type path: str
+        :param header: the header of the frame for the snapshot or None
+        :type header: astropy.io.fits.Header
+        :returns: the stack
+        :rtype: :class:`LiveStack`
+        """
+        self.lock.acquire()
+        stack = self.stacks.pop(key, None)
+        if stack is None or stack.shape != img.shape:
+            stack = LiveStack(img.shape, self.clip_sigma, self.min_clip_frames)
+        self.stacks[key] = stack
+        while len(self.stacks) > self.max_stacks:
+            self.stacks.popitem(last=False)
+        self.lock.release()
+        stack.add(img, path)
+        if self.snapshot_directory is not None:
+            self.__queue_snapshot__(key, stack, header)
+        return stack
+
+    def __queue_snapshot__(self, key, stack, header):
+        """
+        Marks the snapshot of a stack for the snapshot thread. An older
+        pending snapshot of the same key is replaced.
+
+        :param key: the key of the stack
+        :type key: tuple
+        :param stack: the stack
+        :type stack: :class:`LiveStack`
+        :param header: the header of the frame or None
+        :type header: astropy.io.fits.Header
+        """
+        self.lock.acquire()
+        self.pending_snapshots.pop(key, None)
+        self.pending_snapshots[key] = (stack, header)
+        self.snapshots_written.clear()
+        if self.snapshot_thread is None:
+            self.snapshot_thread = Thread(target=self.__write_snapshots__)
+            self.snapshot_thread.daemon = True
+            self.snapshot_thread.start()
+        self.lock.release()
+        self.snapshot_event.set()
+
+    def __write_snapshots__(self):
+        """
+        Writes the pending snapshots, runs in the snapshot thread.
+        """
+        while True:
+            self.snapshot_event.wait()
+            self.lock.acquire()
+            self.snapshot_event.clear()
+            pending = list(self.pending_snapshots.items())
+            self.pending_snapshots.clear()
+            self.lock.release()
+            for key, (stack, header) in pending:
+                try:
+                    stack.write_snapshot(self.get_snapshot_path(key), header)
+                except Exception as e:
+                    self.__create_error_message__(
+                        'Can\'t write the snapshot of {}: {}'.format(key, e))
+            self.lock.acquire()
+            if len(self.pending_snapshots) == 0:
+                self.snapshots_written.set()
+            self.lock.release()
+
+    def wait_snapshots(self, timeout=None):
+        """
+        Waits until all pending snapshots are written.
+
+        :param timeout: the maximal waiting time in seconds or None
+        :type timeout: float
+        :returns: True if all snapshots are written, else False
+        :rtype: bool
+        """
+        return self.snapshots_written.wait(timeout)
+
+    def get_snapshot_path(self, key):
+        """
+        Returns the path of the FITS snapshot of a stack.
+
+        :param key: the key of the stack
+        :type key: tuple
+        :returns: the path in the snapshot directory
+        :rtype: str
+        """
+        name = '_'.join(clean_name(str(part)) for part in key)
+        return os.path.join(self.snapshot_directory, 'stack_{}.fits'.format(name))
+
+    def get_stack(self, key):
+        """
+        Returns the stack of a key.
+
+        :param key: the key of the stack
+        :type key: tuple
+        :returns: the stack or None
+        :rtype: :class:`LiveStack`
+        """
+        self.lock.acquire()
+        stack = self.stacks.get(key)
+        self.lock.release()
+        return stack
+
+    def get_keys(self):
+        """
+        Returns the keys of all stacks, the newest last.
+
+        :returns: the keys
+        :rtype: list
+        """
+        self.lock.acquire()
+        keys = list(self.stacks.keys())
+        self.lock.release()
+        return keys
+
+    def reset(self, key=None):
+        """
+        Removes a stack or all stacks.
+
+        :param key: the key of the stack or None for all stacks
+        :type key: tuple
+        """
+        self.lock.acquire()
+        if key is None:
+            self.stacks.clear()
+        else:
+            self.stacks.pop(key, None)
+        self.lock.release()
+
+    def __create_error_message__(self, message):
+        """
+        Stores the message of the last error with the time, it's available
+        by :meth:`get_error_message`.
+
+        :param message: The message of the error
+        :type message: str
+        """
+        self.error_message = message + '\nTime: ' + \
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def get_error_message(self):
+        """
+        Returns the last error message.
+
+        :returns: last error message
+        :rtype: str
+        """
+        return self.error_message
@@ -0,0 +1,401 @@
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+import os
+
+from astropy.io import fits
+
+
+def parse_subframe(subframe):
+    """
+    Converts a subframe string like '0000:0000;2048:2048' to a list.
+
+    :param subframe: the subframe string
+    :type subframe: str
+    :returns: [x0, y0, w, h]
+    :rtype: list
+    """
+    start, size = subframe.split(';')
+    return [int(v) for v in start.split(':') + size.split(':')]
+
+
+class MasterLibrary:
+    """
+    The MasterLibrary indexes the master frames in a directory by their
+    headers (see :class:`Camera.calibration.master_builder.CalibrationBuilder`).
+    The headers are read once, the data is read only if a master is needed.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: the directory with the master frames
+        :type directory: str
+        """
+        self.directory = directory
+        self.masters = []
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reads the headers of all master frames in the directory.
+        """
+        masters = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(('.fit', '.fits')):
+                continue
+            path = os.path.join(self.directory, name)
+            header = fits.getheader(path)
+            image_type = str(header.get('IMAGETYP', ''))
+            if not image_type.startswith('MASTER'):
+                continue
+            masters.append({'path': path,
+                            'type': image_type[len('MASTER'):].lower(),
+                            'binning': header.get('BINNING', ''),
+                            'subframe': parse_subframe(header.get('SUBFRAME',
+                                                                  '0000:0000;0000:0000')),
+                            'filter': header.get('FILTER', ''),
+                            'temperature': header.get('CCDTEMP', 99),
+                            'exposure_time': header.get('EXPTIME', 0.),
+                            'bias_subtracted': 'BIASSUB' in header})
+        self.masters = masters
+
+    def find(self, image_type, binning, subframe, temperature,
+             temperature_tolerance, filter_name=None, exposure_time=None):
+        """
+        Finds the best master frame. The master must have the same binning
+        and must cover the subframe. Masters with the exact subframe and
+        the closest exposure time are preferred.
+
+        :param image_type: 'bias', 'dark' or 'flat'
+        :type image_type: str
+        :param binning: the binning string like '1:1'
+        :type binning: str
+        :param subframe: the subframe as [x0, y0, w, h]
+        :type subframe: list
+        :param temperature: the set temperature of the chip
+        :type temperature: float
+        :param temperature_tolerance: the maximal temperature difference
+        :type temperature_tolerance: float
+        :param filter_name: the filter name (only for flats)
+        :type filter_name: str
+        :param exposure_time: the exposure time (only for darks)
+        :type exposure_time: float
+        :returns: the index entry of the master or None
+        :rtype: dict
+        """
+        best = None
+        best_rank = None
+        x0, y0, w, h = subframe
+        for master in self.masters:
+            if master['type'] != image_type or master['binning'] != binning:
+                continue
+            if filter_name is not None and master['filter'] != filter_name:
+                continue
+            if image_type != 'flat' and \
+                    abs(master['temperature'] - temperature) > temperature_tolerance:
+                continue
+            mx0, my0, mw, mh = master['subframe']
+            if x0 < mx0 or y0 < my0 or x0 + w > mx0 + mw or y0 + h > my0 + mh:
+                continue
+            rank = (master['subframe'] != list(subframe),
+                    0 if exposure_time is None else
+                    abs(master['exposure_time'] - exposure_time))
+            if best_rank is None or rank < best_rank:
+                best = master
+                best_rank = rank
+        return best
+
+    @staticmethod
+    def read(master, subframe):
+        """
+        Reads the part of the master which corresponds to the subframe.
+
+        :param master: the index entry of the master, see :meth:`find`
+        :type master: dict
+        :param subframe: the subframe as [x0, y0, w, h]
+        :type subframe: list
+        :returns: the data of the subframe
+        :rtype: numpy.ndarray
+        """
+        x0, y0, w, h = subframe
+        mx0, my0 = master['subframe'][:2]
+        with fits.open(master['path'], memmap=True) as hdul:
+            data = np.array(hdul[0].data[y0 - my0:y0 - my0 + h,
+                                         x0 - mx0:x0 - mx0 + w],
+                            dtype=np.float32)
+        return data
+
+
+class CalibrationSet:
+    """
+    The prepared calibration of one setup. The bias and the scaled dark
+    are combined to one offset, so a frame is calibrated with one
+    subtraction and one division.
+    """
+
+    def __init__(self, offset, flat, names):
+        """
+        :param offset: the bias and dark offset or None
+        :type offset: numpy.ndarray
+        :param flat: the normalised flat or None
+        :type flat: numpy.ndarray
+        :param names: the file names of the used masters by type
+        :type names: dict
+        """
+        self.offset = offset
+        self.flat = flat
+        self.names = names
+
+    def get_size(self):
+        """
+        Returns the memory size of the set.
+
+        :returns: the size in bytes
+        :rtype: int
+        """
+        size = 0
+        for data in (self.offset, self.flat):
+            if data is not None:
+                size += data.nbytes
+        return size
+
+
+class MasterFrameCache:
+    """
+    LRU cache of :class:`CalibrationSet` objects with a memory budget.
+    """
+
+    def __init__(self, memory_budget=536870912):
+        """
+        :param memory_budget: the maximal size of all sets in bytes
+        :type memory_budget: int
+        """
+        self.memory_budget = memory_budget
+        self.sets = OrderedDict()
+        self.size = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the set with this key.
+
+        :param key: the key of the set
+        :type key: tuple
+        :returns: the set or None
+        :rtype: :class:`CalibrationSet`
+        """
+        self.lock.acquire()
+        calibration_set = self.sets.get(key)
+        if calibration_set is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.sets.move_to_end(key)
+        self.lock.release()
+        return calibration_set
+
+    def add(self, key, calibration_set):
+        """
+        Adds a set and removes the least recently used sets if the memory
+        budget is exceeded.
+
+        :param key: the key of the set
+        :type key: tuple
+        :param calibration_set: the set
+        :type calibration_set: :class:`CalibrationSet`
+        """
+        self.lock.acquire()
+        if key in self.sets:
+            self.size -= self.sets.pop(key).get_size()
+        self.sets[key] = calibration_set
+        self.size += calibration_set.get_size()
+        while self.size > self.memory_budget and len(self.sets) > 1:
+            old_key, old_set = self.sets.popitem(last=False)
+            self.size -= old_set.get_size()
+        self.lock.release()
+
+    def clear(self):
+        """
+        Removes all sets.
+        """
+        self.lock.acquire()
+        self.sets.clear()
+        self.size = 0
+        self.lock.release()
+
+
+class CalibrationStage:
+    """
+    The CalibrationStage applies the bias and dark subtraction and the flat
+    division directly after the readout. The masters are taken from a
+    :class:`MasterLibrary` and prepared once per setup in a
+    :class:`MasterFrameCache`.
+    """
+
+    def __init__(self, library, cache=None, mode='next_to',
+                 temperature_tolerance=1.):
+        """
+        :param library: the library of the master frames
+        :type library: :class:`MasterLibrary`
+        :param cache: the cache of the prepared masters or None for a new one
+        :type cache: :class:`MasterFrameCache`
+        :param mode:
+            'next_to' to write the calibrated frame next to the raw frame
+            (with the suffix '_cal') or 'replace' to write it in its place
+        :type mode: str
+        :param temperature_tolerance:
+            the maximal difference between the set temperature and the
+            temperature of the bias and dark masters
+        :type temperature_tolerance: float
+        """
+        if mode not in ('next_to', 'replace'):
+            raise ValueError('Unknown mode: {}'.format(mode))
+        if cache is None:
+            cache = MasterFrameCache()
+        self.library = library
+        self.cache = cache
+        self.mode = mode
+        self.temperature_tolerance = temperature_tolerance
+
+    def get_set(self, binning, subframe, filter_name, temperature,
+                exposure_time):
+        """
+        Returns the prepared calibration of a setup.
+
+        :param binning: the binning string like '1:1'
+        :type binning: str
+        :param subframe: the subframe as [x0, y0, w, h]
+        :type subframe: list
+        :param filter_name: the name of the filter
+        :type filter_name: str
+        :param temperature: the set temperature
+        :type temperature: float
+        :param exposure_time: the exposure time
+        :type exposure_time: float
+        :returns: the calibration set
+        :rtype: :class:`CalibrationSet`
+        """
+        key = (binning, tuple(subframe), filter_name, temperature, exposure_time)
+        calibration_set = self.cache.get(key)
+        if calibration_set is None:
+            calibration_set = self.__prepare__(binning, subframe, filter_name,
+                                               temperature, exposure_time)
+            self.cache.add(key, calibration_set)
+        return calibration_set
+
+    def __prepare__(self, binning, subframe, filter_name, temperature,
+                    exposure_time):
+        """
+        Reads the masters of a setup and combines the bias and the dark.
+        """
+        library = self.library
+        tolerance = self.temperature_tolerance
+        bias = library.find('bias', binning, subframe, temperature, tolerance)
+        dark = library.find('dark', binning, subframe, temperature, tolerance,
+                            exposure_time=exposure_time)
+        flat = library.find('flat', binning, subframe, temperature, tolerance,
+                            filter_name=filter_name)
+        names = {}
+        offset = None
+        if bias is not None:
+            offset = library.read(bias, subframe)
+            names['bias'] = os.path.basename(bias['path'])
+        if dark is not None:
+            dark_data = library.read(dark, subframe)
+            if dark['exposure_time'] == exposure_time and not dark['bias_subtracted']:
+                # the dark includes the bias
+                offset = dark_data
+            else:
+                if not dark['bias_subtracted'] and offset is not None:
+                    dark_data -= offset
+                if dark['exposure_time'] > 0:
+                    dark_data *= float(exposure_time) / dark['exposure_time']
+                if offset is None:
+                    offset = dark_data
+                else:
+                    offset += dark_data
+            names['dark'] = os.path.basename(dark['path'])
+        flat_data = None
+        if flat is not None:
+            flat_data = library.read(flat, subframe)
+            # avoid a division by zero at dead pixels
+            flat_data[flat_data <= 0] = 1.
+            names['flat'] = os.path.basename(flat['path'])
+        return CalibrationSet(offset, flat_data, names)
+
+    def apply(self, img, info, temperature):
+        """
+        Calibrates a frame.
+
+        :param img: the raw frame
+        :type img: numpy.ndarray
+        :param info: the information of the image
+        :type info: Camera.meta.image_information.ImageInformation
+        :param temperature: the set temperature of the chip
+        :type temperature: float
+        :returns:
+            the calibrated float32 frame and the names of the applied
+            masters, or None if there is no master for this setup or no
+            master has the size of the frame
+        :rtype: tuple
+        """
+        calibration_set = self.get_set(info.get_binning_string(),
+                                       info.get_subframe(),
+                                       info.get_filter_name(), temperature,
+                                       info.get_exposure_time())
+        # masters of another frame size are skipped, the header names only
+        # the applied masters
+        offset = calibration_set.offset
+        if offset is not None and offset.shape != img.shape:
+            offset = None
+        flat = calibration_set.flat
+        if flat is not None and flat.shape != img.shape:
+            flat = None
+        if offset is None and flat is None:
+            return None
+        names = dict(calibration_set.names)
+        data = img.astype(np.float32)
+        if offset is not None:
+            data -= offset
+        else:
+            names.pop('bias', None)
+            names.pop('dark', None)
+        if flat is not None:
+            data /= flat
+        else:
+            names.pop('flat', None)
+        return data, names
+
+    def get_path(self, save_path):
+        """
+        Returns the path of the calibrated frame.
+
+        :param save_path: the path of the raw frame
+        :type save_path: str
+        :returns: the path of the calibrated frame
+        :rtype: str
+        """
+        if self.mode == 'replace':
+            return save_path
+        return save_path.split('.fit')[0] + '_cal.fits'
+
+
+def add_calibration_header(header, names):
+    """
+    Adds the names of the used masters to the header.
+
+    :param header: the header of the calibrated frame
+    :type header: astropy.io.fits.Header
+    :param names: the file names of the masters by type
+    :type names: dict
+    :returns: the header
+    """
+    cards = {'bias': ('BIASCORR', 'Subtracted master bias'),
+             'dark': ('DARKCORR', 'Subtracted master dark'),
+             'flat': ('FLATCORR', 'Divided master flat')}
+    for image_type, (key, comment) in cards.items():
+        if image_type in names:
+            header[key] = (names[image_type], comment)
+    return header
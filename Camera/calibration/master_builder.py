@@ -0,0 +1,386 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import tempfile
+import os
+
+from astropy.io import fits
+
+from Camera.meta.image_log import read_log
+
+
+MASTER_TYPES = {'bias': 'MASTERBIAS', 'dark': 'MASTERDARK',
+                'flat': 'MASTERFLAT'}
+# the measured peak memory of a row block in units of the stack: the median
+# needs a copy of the stack, the sigma clipping the deviations, their sorted
+# copy and the clip mask, both need the rows of the masters while reading
+MEMORY_FACTORS = {'median': 3, 'sigma_clip': 5}
+
+
+def __read_rows__(path, r0, r1):
+    """
+    Reads the rows r0 to r1 of an image without loading the complete image.
+
+    :param path: the path to the image
+    :type path: str
+    :param r0: the first row
+    :type r0: int
+    :param r1: the row after the last row
+    :type r1: int
+    :returns: the rows as float32
+    :rtype: numpy.ndarray
+    """
+    # the scaling is applied to the rows only, otherwise astropy would scale
+    # the complete image
+    with fits.open(path, memmap=True, do_not_scale_image_data=True) as hdul:
+        hdu = hdul[0]
+        rows = np.array(hdu.data[r0:r1], dtype=np.float32)
+        bscale = hdu.header.get('BSCALE', 1.)
+        bzero = hdu.header.get('BZERO', 0.)
+    if bscale != 1.:
+        rows *= bscale
+    if bzero != 0.:
+        rows += bzero
+    return rows
+
+
+def __read_sample__(path, step):
+    """
+    Reads every step-th pixel of an image.
+
+    :param path: the path to the image
+    :type path: str
+    :param step: the step in both directions
+    :type step: int
+    :returns: the sample as float32
+    :rtype: numpy.ndarray
+    """
+    with fits.open(path, memmap=True, do_not_scale_image_data=True) as hdul:
+        hdu = hdul[0]
+        sample = np.array(hdu.data[::step, ::step], dtype=np.float32)
+        bscale = hdu.header.get('BSCALE', 1.)
+        bzero = hdu.header.get('BZERO', 0.)
+    return sample * bscale + bzero
+
+
+def __combine_block__(job):
+    """
+    Combines one row block of all frames and writes it to the output memmap.
+    It runs in a worker process.
+
+    :param job: the parameters of the block, see :meth:`CalibrationBuilder.combine`
+    :type job: dict
+    """
+    r0, r1 = job['rows']
+    stack = np.empty((len(job['paths']), r1 - r0, job['shape'][1]),
+                     dtype=np.float32)
+    for i, path in enumerate(job['paths']):
+        stack[i] = __read_rows__(path, r0, r1)
+    # subtract the masters from all frames at once
+    if job['bias'] is not None:
+        stack -= __read_rows__(job['bias'], r0, r1)
+    if job['dark'] is not None:
+        dark = __read_rows__(job['dark'], r0, r1)
+        # frame by frame, so there is no temporary of the stack size
+        for i, scale in enumerate(job['dark_scale']):
+            stack[i] -= dark * scale
+    if job['scales'] is not None:
+        stack /= job['scales'][:, np.newaxis, np.newaxis]
+
+    if job['method'] == 'median':
+        block = np.median(stack, axis=0)
+    else:
+        block = __sigma_clipped_mean__(stack, job['sigma'], job['iterations'])
+
+    output = np.memmap(job['output'], dtype=np.float32, mode='r+',
+                       shape=tuple(job['shape']))
+    output[r0:r1] = block
+    output.flush()
+    del output
+
+
+def __sigma_clipped_mean__(stack, sigma, iterations):
+    """
+    Calculates the sigma clipped mean along the first axis. The width of
+    the distribution is estimated from the MAD, so a single outlier in a
+    small stack is clipped, too. The stack is sorted in place and the
+    clipped values are set to NaN. The medians are taken from the sorted
+    arrays, because numpy.nanmedian needs several copies of the stack.
+
+    :param stack: the frames
+    :type stack: numpy.ndarray
+    :param sigma: the clipping limit in standard deviations
+    :type sigma: float
+    :param iterations: the maximal number of clipping iterations
+    :type iterations: int
+    :returns: the clipped mean
+    :rtype: numpy.ndarray
+    """
+    # the NaN are sorted to the end
+    stack.sort(axis=0)
+    for i in range(iterations):
+        center = __sorted_nanmedian__(stack)
+        deviation = np.subtract(stack, center)
+        np.abs(deviation, out=deviation)
+        std = 1.4826 * __sorted_nanmedian__(np.sort(deviation, axis=0))
+        clip = deviation > sigma * std
+        del deviation
+        if not clip.any():
+            break
+        stack[clip] = np.nan
+        del clip
+        stack.sort(axis=0)
+    count = np.count_nonzero(~np.isnan(stack), axis=0)
+    np.nan_to_num(stack, copy=False, nan=0.)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, stack.sum(axis=0) / count, np.nan).astype(np.float32)
+
+
+def __sorted_nanmedian__(stack):
+    """
+    Calculates the median along the first axis of a stack, which is sorted
+    along the first axis with the NaN at the end.
+
+    :param stack: the sorted frames
+    :type stack: numpy.ndarray
+    :returns: the median, NaN if there is no value
+    :rtype: numpy.ndarray
+    """
+    count = np.count_nonzero(~np.isnan(stack), axis=0)
+    low = np.take_along_axis(stack, np.maximum(count - 1, 0)[np.newaxis] // 2, axis=0)[0]
+    high = np.take_along_axis(stack, count[np.newaxis] // 2, axis=0)[0]
+    return (low + high) / 2.
+
+
+class CalibrationBuilder:
+    """
+    The CalibrationBuilder selects the bias, dark and flat frames out of the
+    image log and combines them to master frames. The frames are never
+    loaded completely, every worker process reads only a block of rows of
+    all frames, so the memory usage is bounded by memory_budget per worker,
+    including the temporary arrays of the combination.
+    """
+
+    def __init__(self, log_path='./image_log.txt', processes=None,
+                 memory_budget=268435456, tmp_dir=None):
+        """
+        :param log_path: the path to the image log
+        :type log_path: str
+        :param processes: the number of worker processes or None for all cores
+        :type processes: int
+        :param memory_budget:
+            the maximal memory of a worker in bytes, the row block stack
+            gets a part of it, see :data:`MEMORY_FACTORS`
+        :type memory_budget: int
+        :param tmp_dir: the directory of the temporary memmap or None
+        :type tmp_dir: str
+        """
+        self.log_path = log_path
+        self.processes = processes
+        self.memory_budget = memory_budget
+        self.tmp_dir = tmp_dir
+
+    def select(self, image_type, exposure_time=None, binning=None,
+               subframe=None, chip_temperature=None, temperature_tolerance=1.,
+               filter_name=None):
+        """
+        Selects the frames out of the image log.
+
+        :param image_type: the image type like 'bias', 'dark' or 'flat'
+        :type image_type: str
+        :param exposure_time: the exposure time or None for all
+        :type exposure_time: float
+        :param binning: the binning as [x, y] or None for all
+        :type binning: list
+        :param subframe: the subframe as [x0, y0, w, h] or None for all
+        :type subframe: list
+        :param chip_temperature: the temperature of the chip or None for all
+        :type chip_temperature: float
+        :param temperature_tolerance: the maximal temperature difference
+        :type temperature_tolerance: float
+        :param filter_name: the name of the filter or None for all
+        :type filter_name: str
+        :returns: the log entries of the selected frames
+        :rtype: list
+        """
+        selection = []
+        for entry in read_log(self.log_path):
+            if entry.get('type') != image_type or 'path' not in entry:
+                continue
+            if not os.path.exists(entry['path']):
+                continue
+            if exposure_time is not None and \
+                    abs(float(entry['exposure_time']) - exposure_time) > 1e-3:
+                continue
+            if binning is not None and \
+                    entry['binning'] != '{:1d}:{:1d}'.format(*binning):
+                continue
+            if subframe is not None and \
+                    entry['subframe'] != '{:04d}:{:04d};{:04d}:{:04d}'.format(*subframe):
+                continue
+            if chip_temperature is not None and \
+                    abs(float(entry['chip_temp']) - chip_temperature) > temperature_tolerance:
+                continue
+            if filter_name is not None and entry['filter'] != filter_name:
+                continue
+            selection.append(entry)
+        return selection
+
+    def combine(self, entries, save_path, image_type, method='median',
+                sigma=3., iterations=3, bias=None, dark=None):
+        """
+        Combines the frames to a master frame.
+
+        :param entries: the log entries of the frames, see :meth:`select`
+        :type entries: list
+        :param save_path: the path of the master frame
+        :type save_path: str
+        :param image_type: 'bias', 'dark' or 'flat'
+        :type image_type: str
+        :param method: 'median' or 'sigma_clip' for a sigma clipped mean
+        :type method: str
+        :param sigma: the clipping limit of the sigma clipped mean
+        :type sigma: float
+        :param iterations: the maximal number of clipping iterations
+        :type iterations: int
+        :param bias: the path of a master bias to subtract or None
+        :type bias: str
+        :param dark:
+            the path of a master dark to subtract or None, it is scaled by
+            the exposure times
+        :type dark: str
+        :returns: the path of the master frame
+        :rtype: str
+        """
+        if len(entries) == 0:
+            raise ValueError('No frames to combine')
+        if method not in ('median', 'sigma_clip'):
+            raise ValueError('Unknown method: {}'.format(method))
+        paths = [entry['path'] for entry in entries]
+        header = fits.getheader(paths[0])
+        shape = (header['NAXIS2'], header['NAXIS1'])
+
+        dark_scale = None
+        if dark is not None:
+            dark_time = fits.getheader(dark).get('EXPTIME', 0.)
+            exposure_times = np.array([float(entry['exposure_time'])
+                                       for entry in entries], dtype=np.float32)
+            if dark_time > 0:
+                dark_scale = exposure_times / dark_time
+            else:
+                dark_scale = np.ones(len(entries), dtype=np.float32)
+        scales = None
+        if image_type == 'flat':
+            scales = self.__get_flat_scales__(paths, bias, dark, dark_scale)
+
+        # the size of the row blocks is limited by the memory budget with
+        # the temporary arrays of the method
+        row_bytes = len(paths) * shape[1] * 4 * MEMORY_FACTORS[method]
+        block_rows = max(1, min(shape[0], self.memory_budget // row_bytes))
+
+        fd, output = tempfile.mkstemp(suffix='.dat', dir=self.tmp_dir)
+        os.close(fd)
+        master = np.memmap(output, dtype=np.float32, mode='w+', shape=shape)
+        del master
+        jobs = []
+        for r0 in range(0, shape[0], block_rows):
+            jobs.append({'rows': (r0, min(r0 + block_rows, shape[0])),
+                         'paths': paths, 'shape': shape, 'output': output,
+                         'bias': bias, 'dark': dark, 'dark_scale': dark_scale,
+                         'scales': scales, 'method': method, 'sigma': sigma,
+                         'iterations': iterations})
+        try:
+            with ProcessPoolExecutor(self.processes) as executor:
+                for _ in executor.map(__combine_block__, jobs):
+                    pass
+            master = np.memmap(output, dtype=np.float32, mode='r', shape=shape)
+            if image_type == 'flat':
+                master = master / np.median(master[::4, ::4])
+            hdu = fits.PrimaryHDU(np.asarray(master, dtype=np.float32))
+            self.__create_header__(hdu.header, header, entries, image_type,
+                                   method, sigma, iterations, bias, dark)
+            hdu.writeto(save_path, overwrite=True)
+            del master
+        finally:
+            os.remove(output)
+        return save_path
+
+    def build(self, image_type, save_path, method='median', bias=None,
+              dark=None, **selection):
+        """
+        Selects the frames and combines them to a master frame.
+
+        :param image_type: 'bias', 'dark' or 'flat'
+        :type image_type: str
+        :param save_path: the path of the master frame
+        :type save_path: str
+        :param method: 'median' or 'sigma_clip'
+        :type method: str
+        :param bias: the path of a master bias to subtract or None
+        :type bias: str
+        :param dark: the path of a master dark to subtract or None
+        :type dark: str
+        :param selection: the selection parameters, see :meth:`select`
+        :returns: the path of the master frame
+        :rtype: str
+        """
+        entries = self.select(image_type, **selection)
+        return self.combine(entries, save_path, image_type, method=method,
+                            bias=bias, dark=dark)
+
+    @staticmethod
+    def __get_flat_scales__(paths, bias, dark, dark_scale, step=8):
+        """
+        Returns the median of every flat after the bias and dark subtraction,
+        estimated from every step-th pixel.
+
+        :returns: the medians of the flats
+        :rtype: numpy.ndarray
+        """
+        scales = np.empty(len(paths), dtype=np.float32)
+        offset = 0.
+        if bias is not None:
+            offset += np.median(__read_sample__(bias, step))
+        dark_level = 0.
+        if dark is not None:
+            dark_level = np.median(__read_sample__(dark, step))
+        for i, path in enumerate(paths):
+            level = np.median(__read_sample__(path, step))
+            if dark_scale is not None:
+                level -= dark_level * dark_scale[i]
+            scales[i] = max(level - offset, 1.)
+        return scales
+
+    @staticmethod
+    def __create_header__(header, first_header, entries, image_type, method,
+                          sigma, iterations, bias, dark):
+        """
+        Adds the provenance information to the header of the master frame.
+        """
+        header['IMAGETYP'] = (MASTER_TYPES.get(image_type, image_type.upper()),
+                              'Type of the master frame')
+        if 'EXPTIME' in first_header:
+            header['EXPTIME'] = (first_header['EXPTIME'], 'Exposure time')
+        entry = entries[0]
+        header['FILTER'] = (entry['filter'], 'Name of the filter')
+        header['BINNING'] = (entry['binning'], 'Binning x:y')
+        header['SUBFRAME'] = (entry['subframe'], 'Subframe x0:y0;w:h')
+        temperatures = [float(e['chip_temp']) for e in entries]
+        header['CCDTEMP'] = (float(np.mean(temperatures)),
+                             'Mean chip temperature of the frames')
+        header['NCOMBINE'] = (len(entries), 'Number of combined frames')
+        header['COMBMETH'] = (method, 'Combine method')
+        if method == 'sigma_clip':
+            header['CLIPSIG'] = (sigma, 'Clipping limit in sigma')
+            header['CLIPITER'] = (iterations, 'Maximal clipping iterations')
+        if bias is not None:
+            header['BIASSUB'] = (os.path.basename(bias), 'Subtracted master bias')
+        if dark is not None:
+            header['DARKSUB'] = (os.path.basename(dark), 'Subtracted master dark')
+        if image_type == 'flat':
+            header['FLATNORM'] = (True, 'Normalised to a median of 1')
+        header['DATE'] = (datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
+                          'Creation date of the master frame')
+        for i, e in enumerate(entries):
+            header['IMCMB{:03d}'.format(i + 1)] = os.path.basename(e['path'])
+        return header
@@ -10,10 +10,25 @@ as a direct interaction to comtype drivers.
 """
 
 from datetime import datetime
-from threading import Lock
+from threading import Lock, Thread, Event, current_thread
 from comtypes import COMError
 from comtypes.client import CreateObject
 import os
+import time
+
+from Camera.meta.metrics import TimedComObject
+
+try:
+    from comtypes import CoInitializeEx, COINIT_MULTITHREADED
+except ImportError:
+    CoInitializeEx = None
+    COINIT_MULTITHREADED = 0
+
+
+CONNECT_MODES = ('now', 'background', 'lazy')
+# HRESULT of an unavailable RPC server, it's used for the fast failing
+# calls while the driver reconnects
+RPC_S_SERVER_UNAVAILABLE = -2147023174
 
 
 class DriverLog:
@@ -75,22 +90,74 @@ class Driver:
     The Driver class is the basic class for comtype driver interaction. It has 
     the very basic methods to create a connection to a driver. It can be used 
     for all comtype drivers like interface, filter wheel or mount ASCOM-driver.
+    The connection can be created directly ('now'), in a background thread
+    ('background') or at the first use of the driver ('lazy').
     """
-    def __init__(self, driver_type, driver_name):
+    def __init__(self, driver_type, driver_name, connect_mode='now'):
         """
         :param driver_type: The type of the driver in ASCOM-meaning.
         :type driver_type: str
         :param driver_name: Name of the driver
         :type driver_name: str
+        :param connect_mode: 'now', 'background' or 'lazy'
+        :type connect_mode: str
         """
+        if connect_mode not in CONNECT_MODES:
+            raise ValueError('Unknown connect mode: {}'.format(connect_mode))
         self.config_path = './config.txt'
         self.driver_type = driver_type
-        self.driver = None
+        self.com_object = None
         self.connection = False
-        self.__driver_initialisation__(driver_name)
         self.error_message = ''
         self.driver_lock = Lock()
-        
+        self.connect_mode = connect_mode
+        self.connect_lock = Lock()
+        self.connect_event = Event()
+        self.connect_error = None
+        self.connection_time = {}
+        # the health is set by a Camera.drivers.health_monitor.HealthMonitor
+        self.health = 'connected'
+        self.healthy = Event()
+        self.healthy.set()
+        # 'fail' to fail directly or 'wait' to wait for the reconnection
+        self.unavailable_policy = 'fail'
+        self.unavailable_timeout = 10.
+        # the thread, which restores the settings after a reconnection
+        self.restore_thread = None
+        # Camera.meta.metrics.Metrics to measure the COM latencies or None
+        self.metrics = None
+        self.__driver_initialisation__(driver_name)
+
+    @property
+    def driver(self):
+        """
+        The COM-object of the driver. If the connection isn't finished yet,
+        it waits for the connection or starts it in the lazy mode.
+        While the driver reconnects, a COMError is raised directly or after
+        the waiting time, see unavailable_policy. Only the reconnecting
+        thread can use the driver to restore the settings.
+        """
+        if self.health == 'reconnecting' and \
+                self.restore_thread is not current_thread():
+            if not (self.unavailable_policy == 'wait' and
+                    self.healthy.wait(self.unavailable_timeout)):
+                raise COMError(RPC_S_SERVER_UNAVAILABLE,
+                               '{} is reconnecting'.format(self.driver_type),
+                               (None, None, None, 0, None))
+        if self.com_object is None:
+            if self.connect_mode == 'lazy':
+                self.__connect_driver__()
+            self.connect_event.wait()
+            if self.connect_error is not None:
+                raise self.connect_error
+        if self.metrics is not None:
+            return TimedComObject(self.com_object, self.metrics, self.driver_type)
+        return self.com_object
+
+    @driver.setter
+    def driver(self, com_object):
+        self.com_object = com_object
+
     def __driver_initialisation__(self, driver_name, test=False):
         """
         Initialized the ASCOM driver
@@ -107,16 +174,81 @@ class Driver:
                 if not test:
                     set_driver_information(self.config_path, self.driver_type,
                                            driver_name)
-        # Create an object of a COM-object of the interface
-        self.driver = CreateObject(driver_name)
-        self.connect()
+        self.driver_name = driver_name
+        if self.connect_mode == 'now':
+            self.__connect_driver__()
+        elif self.connect_mode == 'background':
+            th = Thread(target=self.__connect_driver__, args=(True,))
+            th.daemon = True
+            th.start()
+
+    def __connect_driver__(self, new_thread=False):
+        """
+        Creates the COM-object of the driver and connects it. The needed
+        times are stored in connection_time.
+        :param new_thread: True if it runs in its own thread
+        :type new_thread: bool
+        """
+        self.connect_lock.acquire()
+        try:
+            # the connection can be finished by another thread
+            if self.connect_event.is_set():
+                return
+            if new_thread and CoInitializeEx is not None:
+                # the connect thread ends after the connection, the object
+                # must live in the multithreaded apartment, so it's usable
+                # by the other threads without marshalling
+                CoInitializeEx(COINIT_MULTITHREADED)
+            start = time.perf_counter()
+            # Create an object of a COM-object of the interface
+            self.com_object = CreateObject(self.driver_name)
+            created = time.perf_counter()
+            self.connect()
+            end = time.perf_counter()
+            self.connection_time = {'create': created - start,
+                                    'connect': end - created,
+                                    'total': end - start}
+        except Exception as e:
+            self.connect_error = e
+            self.__create_error_message__('Can\'t create the driver ' +
+                                          self.driver_name)
+            if not new_thread:
+                raise
+        finally:
+            self.connect_event.set()
+            self.connect_lock.release()
+
+    def wait_connected(self, timeout=None):
+        """
+        Waits until the connection is finished. In the lazy mode the
+        connection is started, if it wasn't started yet.
+
+        :param timeout: the maximal waiting time in seconds or None
+        :type timeout: float
+        :returns: True if the driver is connected, else False
+        :rtype: bool
+        """
+        if self.connect_mode == 'lazy' and not self.connect_event.is_set():
+            self.__connect_driver__()
+        self.connect_event.wait(timeout)
+        return self.connection
+
+    def get_connection_time(self):
+        """
+        Returns the times of the creation of the COM-object and of the
+        connection in seconds.
+
+        :returns: dict with 'create', 'connect' and 'total' or an empty dict
+        :rtype: dict
+        """
+        return self.connection_time
 
     def connect(self):
         """
         Starts the connection to the ASCOM driver
         """
         try:
-            self.driver.Connected = True
+            self.com_object.Connected = True
             self.connection = True
         except COMError:
             self.connection = False
@@ -125,8 +257,84 @@ class Driver:
         """
         Closes the connection to the ASCOM driver
         """
-        self.driver.Connected = False
+        if self.connect_mode == 'background':
+            self.connect_event.wait()
+        # a lazy driver, which was never used, has nothing to close
+        self.health = 'disconnected'
+        if self.com_object is not None:
+            self.com_object.Connected = False
         self.connection = False
+
+    def probe(self, timeout=0.5):
+        """
+        Checks the connection with the cheap Connected property. If the
+        driver lock isn't free in the time, the driver can't be checked.
+
+        :param timeout: the maximal waiting time for the driver lock
+        :type timeout: float
+        :returns:
+            True if the driver answers, False if it doesn't answer or None
+            if the driver is busy
+        :rtype: bool
+        """
+        if not self.driver_lock.acquire(timeout=timeout):
+            return None
+        try:
+            return bool(self.com_object.Connected)
+        except Exception:
+            return False
+        finally:
+            self.driver_lock.release()
+
+    def reconnect(self):
+        """
+        Creates a new COM-object of the driver, connects it and restores
+        the settings, see :meth:`__restore_settings__`.
+
+        :returns: True if the driver is connected, else False
+        :rtype: bool
+        """
+        self.driver_lock.acquire()
+        try:
+            try:
+                self.com_object.Connected = False
+            except Exception:
+                pass
+            self.com_object = CreateObject(self.driver_name)
+            self.connect()
+        except Exception as e:
+            self.__create_error_message__('Can\'t reconnect the driver: ' + str(e))
+            self.connection = False
+        finally:
+            self.driver_lock.release()
+        if self.connection:
+            # the new COM-object has the default settings of the driver
+            self.restore_thread = current_thread()
+            try:
+                self.__restore_settings__()
+            finally:
+                self.restore_thread = None
+        return self.connection
+
+    def __restore_settings__(self):
+        """
+        Clears the cached settings after a reconnection and writes them
+        into the new COM-object. The drivers with settings override it.
+        """
+        pass
+
+    def set_health(self, health):
+        """
+        Sets the health of the driver.
+
+        :param health: 'connected' or 'reconnecting'
+        :type health: str
+        """
+        self.health = health
+        if health == 'connected':
+            self.healthy.set()
+        else:
+            self.healthy.clear()
         
     def __create_error_message__(self, message):
         """
@@ -9,7 +9,14 @@ import numpy as np
 import time
 
 from .Driver import Driver
+from .thermal_controller import ThermalController
 from Camera.interface.camera_meta import CameraInformation
+from Camera.meta.binning import split_binning, software_bin
+
+
+# HRESULTs of a missing property: DISP_E_MEMBERNOTFOUND, DISP_E_UNKNOWNNAME,
+# E_NOTIMPL and the PropertyNotImplementedException of ASCOM
+NOT_IMPLEMENTED_HRESULTS = (-2147352573, -2147352570, -2147467263, -2147220480)
 
 
 class CameraDriver(Driver):
@@ -19,13 +26,31 @@ class CameraDriver(Driver):
     with multi access checks and other security algorithms
     """
 
-    def __init__(self, camera_driver_name, log=True):
-        Driver.__init__(self, 'Camera', camera_driver_name)
+    def __init__(self, camera_driver_name, log=True, connect_mode='now'):
+        Driver.__init__(self, 'Camera', camera_driver_name, connect_mode)
         self.camera_information = CameraInformation(active_log=log)
         self.image_lock = Lock()
         self.image = None
         self.image_ready = False
         self.current_exposure = False
+        # the last known state of the cooler or None
+        self.cooler_on = None
+        # perf_counter marks of the download of the image, which was
+        # returned by the last get_image
+        self.download_marks = {}
+        # perf_counter marks of the download of the waiting image
+        self.image_marks = {}
+        # the running temperature ramp or None
+        self.thermal_controller = None
+        # False if the driver doesn't support CameraState, None if unknown
+        self.camera_state_supported = None
+        # MaxBinX, MaxBinY and CanAsymmetricBin, read at the first use
+        self.binning_capabilities = None
+        # the binning is split into a hardware and a software part
+        self.hardware_binning = (1, 1)
+        self.software_binning = (1, 1)
+        # the hardware and software binning of the last exposure
+        self.exposure_binning = ((1, 1), (1, 1))
 
     def start_exposure(self, exposure_time):
         """
@@ -38,6 +63,7 @@ class CameraDriver(Driver):
         :rtype: bool
         """
         self.current_exposure = True
+        self.exposure_binning = (self.hardware_binning, self.software_binning)
         # return value
         rvalue = False
         # try to start an exposure
@@ -69,13 +95,7 @@ class CameraDriver(Driver):
         """
         Checks the current image status and stores the result in image_ready.
         """
-        self.driver_lock.acquire()
-        self.image_ready = self.driver.ImageReady
-        self.driver_lock.release()
-        while not self.image_ready:
-            self.driver_lock.acquire()
-            self.image_ready = self.driver.ImageReady
-            self.driver_lock.release()
+        while not self.is_image_ready():
             time.sleep(0.1)
 
     def stop_exposure(self):
@@ -147,6 +167,64 @@ class CameraDriver(Driver):
             # return the return value
             return rvalue
 
+    def get_camera_state(self):
+        """
+        Reads the ASCOM camera state (0 idle, 1 waiting, 2 exposing,
+        3 reading, 4 download, 5 error).
+
+        Only a missing property marks the state as unsupported, other
+        errors are retried once.
+
+        :returns:
+            the camera state or None if the driver doesn't support it or
+            doesn't answer
+        :rtype: int
+        """
+        # don't ask a driver again, which doesn't support the state
+        if self.camera_state_supported is False:
+            return None
+        # set the default return value
+        rvalue = None
+        for attempt in range(2):
+            try:
+                # lock the interface driver
+                self.driver_lock.acquire()
+                # reads the camera state
+                rvalue = int(self.driver.CameraState)
+                self.camera_state_supported = True
+                break
+            # except drivers without the camera state
+            except AttributeError:
+                self.camera_state_supported = False
+                break
+            # except a COMError of the driver
+            except COMError as e:
+                if getattr(e, 'hresult', None) in NOT_IMPLEMENTED_HRESULTS:
+                    self.camera_state_supported = False
+                    break
+                # a transient error like a timeout, the state stays supported
+                if attempt == 1:
+                    # writes the error information to the interface log
+                    self.camera_information.set_error_update('get_camera_state', e)
+                    # set an error message
+                    self.__create_error_message__('Can\'t read the camera state')
+            # do anyways
+            finally:
+                # release the interface driver lock
+                self.driver_lock.release()
+        # return the return value
+        return rvalue
+
+    def is_exposing(self):
+        """
+        Asks the driver if the exposure is still running. Drivers without
+        the camera state are never exposing.
+
+        :returns: True if the driver waits or exposes, else False
+        :rtype: bool
+        """
+        return self.get_camera_state() in (1, 2)
+
     def is_image_ready(self):
         """
         Checks if the image is ready to download.
@@ -154,9 +232,22 @@ class CameraDriver(Driver):
         :returns: True if the image is ready, else False
         :rtype: bool
         """
-        self.driver_lock.acquire()
-        self.image_ready = self.driver.ImageReady
-        self.driver_lock.release()
+        try:
+            # lock the interface driver
+            self.driver_lock.acquire()
+            # asks for the image
+            self.image_ready = self.driver.ImageReady
+        # except a interface error, like a reconnecting driver
+        except COMError as e:
+            # writes the error information to the interface log
+            self.camera_information.set_error_update('is_image_ready', e)
+            # create the error message
+            self.__create_error_message__('Can\'t check the image status')
+            self.image_ready = False
+        # do anyways
+        finally:
+            # release the interface driver lock
+            self.driver_lock.release()
         return self.image_ready
 
     def download_image(self):
@@ -179,12 +270,16 @@ class CameraDriver(Driver):
             self.driver_lock.acquire()
             while not self.driver.ImageReady:
                 time.sleep(0.1)
+            marks = {'image_ready': time.perf_counter()}
             # readout the image
             print('download image')
             rvalue = self.driver.ImageArray
             print('image downloaded')
+            marks['transfer_end'] = time.perf_counter()
+            # the marks belong to this image and are taken together with it
             self.image_lock.acquire()
             self.image = rvalue
+            self.image_marks = marks
             self.image_lock.release()
         # except a interface error
         except COMError as e:
@@ -202,17 +297,64 @@ class CameraDriver(Driver):
             self.current_exposure = False
             return rvalue
 
+    def read_frame(self, poll=0.005, timeout=None):
+        """
+        Waits for the image of the current exposure and reads it directly.
+        The driver lock is held only for the single calls, not while waiting.
+
+        :param poll: the time between two ImageReady checks in seconds
+        :type poll: float
+        :param timeout: the maximal waiting time in seconds or None
+        :type timeout: float
+        :returns: the image or None if the image isn\'t readable
+        :rtype: numpy.ndarray
+        """
+        end = None if timeout is None else time.time() + timeout
+        while not self.is_image_ready():
+            if end is not None and time.time() > end:
+                return None
+            time.sleep(poll)
+        # create a default return value
+        rvalue = None
+        try:
+            # lock the interface driver
+            self.driver_lock.acquire()
+            # readout the image
+            rvalue = self.driver.ImageArray
+        # except a interface error
+        except COMError as e:
+            # writes the error information to the interface log
+            self.camera_information.set_error_update('read_frame', e)
+            # create the error message
+            self.__create_error_message__('Can\'t read the image')
+            rvalue = None
+        # do anyways
+        finally:
+            # release the interface driver lock
+            self.driver_lock.release()
+            self.current_exposure = False
+        if rvalue is None:
+            return None
+        img = np.ascontiguousarray(np.transpose(np.array(rvalue, dtype=np.uint16)))
+        return software_bin(img, *self.exposure_binning[1])
+
     def get_image(self):
         """
         Returns the last image onetime. If there was no exposure before or you
         take the image before, the return value will be 'None'
+        The download marks of the image are available in download_marks.
         """
         self.image_lock.acquire()
         img = self.image
         self.image = None
+        self.download_marks = self.image_marks
+        self.image_marks = {}
         self.image_lock.release()
         img = np.array(img, dtype=np.uint16)
-        img = np.transpose(img)
+        # one C-contiguous copy, which is shared by the FITS writing and the
+        # previews
+        img = np.ascontiguousarray(np.transpose(img))
+        img = software_bin(img, *self.exposure_binning[1])
         self.current_exposure = False
         return img
 
@@ -250,6 +392,35 @@ class CameraDriver(Driver):
             # return the temperature
             return temperature
 
+    def get_cooler_power(self):
+        """
+        Reads the current power of the cooler.
+
+        :returns:
+            The cooler power in percent or None if the power isn\'t
+            readable.
+        :rtype: float
+        """
+        # set a default power
+        rvalue = None
+        # try to read the cooler power
+        try:
+            # lock the interface driver
+            self.driver_lock.acquire()
+            # reads the current cooler power
+            rvalue = self.driver.CoolerPower
+        # Except a error of the driver, like drivers without CanGetCoolerPower
+        except COMError as e:
+            # writes the error information to the interface log
+            self.camera_information.set_error_update('get_cooler_power', e)
+            rvalue = None
+        # do anyways
+        finally:
+            # release the interface driver lock
+            self.driver_lock.release()
+            # return the cooler power
+            return rvalue
+
     def get_set_temperature(self):
         """
         Returns the temperature which was set.
@@ -280,6 +451,7 @@ class CameraDriver(Driver):
                 if not self.driver.CoolerOn:
                     # turn the cooler on
                     self.driver.CoolerOn = True
+                self.cooler_on = True
                 # set the new ccd temperature
                 self.driver.SetCCDTemperature = float(temperature)
                 # sets the new temperature to the interface information
@@ -318,9 +490,9 @@ class CameraDriver(Driver):
             # lock the interface driver
             self.driver_lock.acquire()
             # reads the x-binning
-            rvalue[0] = self.driver.BinX
+            rvalue[0] = self.driver.BinX * self.software_binning[0]
             # reads the y-binning
-            rvalue[1] = self.driver.BinY
+            rvalue[1] = self.driver.BinY * self.software_binning[1]
         # expect a interface error
         except COMError as e:
             # writes the error information to the interface log
@@ -349,16 +521,26 @@ class CameraDriver(Driver):
         """
         # set the default return value
         rvalue = False
+        subframe_changed = False
+        # the capabilities are read with an own lock
+        capabilities = self.get_binning_capabilities()
         # try to set the new binning
         try:
             self.camera_information.set_new_update('set_binning')
             # lock the interface driver
             self.driver_lock.acquire()
             if not self.camera_information.is_current_binning(x_bin, y_bin):
+                # the part of the binning, which the camera can't do, is
+                # done in the software
+                hardware, software = split_binning(x_bin, y_bin,
+                                                   *capabilities)
                 # set the new binning in x direction
-                self.driver.BinX = x_bin
+                self.driver.BinX = hardware[0]
                 # set the new binning in y-direction
-                self.driver.BinY = y_bin
+                self.driver.BinY = hardware[1]
+                subframe_changed = software != self.software_binning
+                self.hardware_binning = hardware
+                self.software_binning = software
                 self.camera_information.set_binning(x_bin, y_bin)
             # set the return value to True
             rvalue = True
@@ -374,8 +556,46 @@ class CameraDriver(Driver):
         finally:
             # release the interface driver lock
             self.driver_lock.release()
-            # return the return value
-            return rvalue
+        # the subframe in the driver depends on the software binning
+        if subframe_changed:
+            info = self.camera_information
+            self.set_subframe(info.get_subframe_x0(), info.get_subframe_y0(),
+                              info.get_subframe_width(), info.get_subframe_height(),
+                              force=True)
+        # return the return value
+        return rvalue
+
+    def get_binning_capabilities(self):
+        """
+        Reads the maximal hardware binning and the support of asymmetric
+        binning at the first call.
+
+        :returns:
+            MaxBinX, MaxBinY and CanAsymmetricBin, or 1, 1, False if the
+            driver doesn't support them (the binning is done in the software)
+        :rtype: tuple
+        """
+        if self.binning_capabilities is not None:
+            return self.binning_capabilities
+        # set the default return value
+        rvalue = (1, 1, False)
+        try:
+            # lock the interface driver
+            self.driver_lock.acquire()
+            # reads the capabilities
+            rvalue = (int(self.driver.MaxBinX), int(self.driver.MaxBinY),
+                      bool(self.driver.CanAsymmetricBin))
+        # expect a interface driver error
+        except (COMError, AttributeError) as e:
+            # writes the error information to the interface log
+            self.camera_information.set_error_update('get_binning_capabilities', e)
+            rvalue = (1, 1, False)
+        # do anyways
+        finally:
+            # release the interface driver lock
+            self.driver_lock.release()
+        self.binning_capabilities = rvalue
+        return rvalue
 
     def get_subframe(self):
         """
@@ -395,13 +615,13 @@ class CameraDriver(Driver):
             # lock the interface driver
             self.driver_lock.acquire()
             # readout the start of the subframe in x-direction
-            rvalue[0] = self.driver.StartX
+            rvalue[0] = self.driver.StartX // self.software_binning[0]
             # readout the start of the subframe in y-direction
-            rvalue[1] = self.driver.StartY
+            rvalue[1] = self.driver.StartY // self.software_binning[1]
             # readout the size of the subframe in x-direction
-            rvalue[2] = self.driver.NumX
+            rvalue[2] = self.driver.NumX // self.software_binning[0]
             # readout the size of the subframe in y-direction
-            rvalue[3] = self.driver.NumY
+            rvalue[3] = self.driver.NumY // self.software_binning[1]
         # expect a interface error
         except COMError as e:
             # writes the error information to the interface log
@@ -417,9 +637,10 @@ class CameraDriver(Driver):
             # return the return value
             return rvalue
 
-    def set_subframe(self, x0, y0, w, h):
+    def set_subframe(self, x0, y0, w, h, force=False):
         """
-        Sets a new subframe.
+        Sets a new subframe. The subframe is in the pixels of the complete
+        binning, it's scaled by the software binning for the driver.
 
         :param x0: the starting point of the subframe in x-direction
         :type x0: int
@@ -429,6 +650,8 @@ class CameraDriver(Driver):
         :type w: int
         :param h: the height of the subframe (y-direction)
         :type h: int
+        :param force: True to write the subframe even if it's the current one
+        :type force: bool
         :returns: True if the new subframe is set, else False
         :rtype: bool
         """
@@ -440,15 +663,18 @@ class CameraDriver(Driver):
             # lock the interface driver
             self.driver_lock.acquire()
             # if the new subframe is different to the current one
-            if not self.camera_information.is_current_subframe(x0, y0, w, h):
+            if force or not self.camera_information.is_current_subframe(x0, y0, w, h):
+                # the subframe is in the final binned pixels, the driver
+                # needs it in the hardware binned pixels
+                sx, sy = self.software_binning
                 # set x0
-                self.driver.StartX = x0
+                self.driver.StartX = x0 * sx
                 # set y0
-                self.driver.StartY = y0
+                self.driver.StartY = y0 * sy
                 # set width
-                self.driver.NumX = w
+                self.driver.NumX = w * sx
                 # set height
-                self.driver.NumY = h
+                self.driver.NumY = h * sy
                 # sets the subframe information to the information object
                 self.camera_information.set_subframe(x0, y0, w, h)
             # set the return value to True
@@ -475,6 +701,7 @@ class CameraDriver(Driver):
             self.driver_lock.acquire()
             # ask for cooler status
             rvalue = self.driver.CoolerOn
+            self.cooler_on = rvalue
         # expect a interface error
         except COMError as e:
             # write a new error information to the log
@@ -502,6 +729,7 @@ class CameraDriver(Driver):
             self.driver_lock.acquire()
             # set new cooler status
             self.driver.CoolerOn = status
+            self.cooler_on = status
         # expect a interface error
         except COMError as e:
             # write a new error information to the log
@@ -513,19 +741,70 @@ class CameraDriver(Driver):
             # release the lock of the interface
             self.driver_lock.release()
 
-    def warm_up(self):
-        """
-        Warms the CCD-chip slowly up.
-        """
-        temperature = self.get_temperature()
-        self.set_temperature(temperature + 3)
-        time.sleep(10)
-        temperature_act = self.get_temperature()
-        while abs(temperature - temperature_act) > 2:
-            temperature = temperature_act
-            self.set_temperature(temperature + 3)
-            time.sleep(10)
-            temperature_act = self.get_temperature()
+    def __restore_settings__(self):
+        """
+        Clears the cached settings and capabilities after a reconnection
+        and writes the cooler status, the set temperature, the binning and
+        the subframe into the new COM-object.
+        """
+        info = self.camera_information
+        binning = (info.get_bin_x(), info.get_bin_y())
+        subframe = (info.get_subframe_x0(), info.get_subframe_y0(),
+                    info.get_subframe_width(), info.get_subframe_height())
+        temperature = info.get_temperature()
+        cooler_on = self.cooler_on
+        # the new driver can be another version, so everything is read again
+        info.clear_settings()
+        self.binning_capabilities = None
+        self.camera_state_supported = None
+        self.hardware_binning = (1, 1)
+        self.software_binning = (1, 1)
+        if cooler_on is not None:
+            self.set_cooler(cooler_on)
+        if cooler_on and temperature != 99:
+            self.set_temperature(temperature)
+        # a failed restore leaves the binning unknown
+        if None not in binning:
+            self.set_binning(*binning)
+        self.set_subframe(*subframe, force=True)
+
+    def ramp_temperature(self, target, rate=2., **kwargs):
+        """
+        Changes the temperature of the CCD-chip with a fixed rate in a
+        background thread. A running ramp is stopped before.
+
+        :param target:
+            the target temperature or None to warm up to the ambient
+            temperature
+        :type target: float
+        :param rate: the ramp rate in °C per minute
+        :type rate: float
+        :param kwargs:
+            additional arguments of
+            :class:`Camera.drivers.thermal_controller.ThermalController`
+        :returns: the controller of the ramp
+        :rtype: :class:`Camera.drivers.thermal_controller.ThermalController`
+        """
+        if self.thermal_controller is not None:
+            self.thermal_controller.stop()
+            self.thermal_controller.wait()
+        self.thermal_controller = ThermalController(self, target, rate, **kwargs)
+        return self.thermal_controller
+
+    def warm_up(self, rate=2., target=None, **kwargs):
+        """
+        Warms the CCD-chip slowly up, see :meth:`ramp_temperature`.
+
+        :param rate: the ramp rate in °C per minute
+        :type rate: float
+        :param target:
+            the target temperature or None to warm up to the ambient
+            temperature
+        :type target: float
+        :returns: the controller of the ramp
+        :rtype: :class:`Camera.drivers.thermal_controller.ThermalController`
+        """
+        return self.ramp_temperature(target, rate, **kwargs)
 
     def is_exposure(self):
         """
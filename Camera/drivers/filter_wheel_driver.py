@@ -13,13 +13,15 @@ class FilterWheelDriver(Driver):
     interface.
     """
 
-    def __init__(self, driver_name):
+    def __init__(self, driver_name, connect_mode='now'):
         # init the super class Driver
-        Driver.__init__(self, 'Filter wheel', driver_name)
+        Driver.__init__(self, 'Filter wheel', driver_name, connect_mode)
         # creates a dict with the filter names and the corresponding position of
         # the filter wheel
         self.filter_names = {'U': 0, 'B': 1, 'V': 2, 'R': 3, 'I': 4, 'Clear': 5, 'None': 6}
         self.filter_ids = ['U', 'B', 'V', 'R', 'I', 'Clear', 'None']
+        # the last known position of the filter wheel or None
+        self.position = None
 
     def get_corresponding_filter_nr(self, name):
         """
@@ -50,6 +52,7 @@ class FilterWheelDriver(Driver):
             self.driver_lock.acquire()
             # set the new filter
             self.driver.Position = filter_nr
+            self.position = filter_nr
             # set the return value to True
             rvalue = True
         # except a filter wheel error
@@ -106,6 +109,7 @@ class FilterWheelDriver(Driver):
             self.driver_lock.acquire()
             # reads the filter wheel position
             rvalue = self.driver.Position
+            self.position = rvalue
         # except a filter wheel error
         except COMError:
             # create the error message
@@ -120,6 +124,16 @@ class FilterWheelDriver(Driver):
             # return the return value
             return rvalue
 
+    def __restore_settings__(self):
+        """
+        Moves the filter wheel of the new COM-object after a reconnection
+        back to the last known position.
+        """
+        position = self.position
+        self.position = None
+        if position is not None and position >= 0:
+            self.set_filter(position)
+
     def get_filter_name(self):
         """
         Returns the name of the current filter.
@@ -0,0 +1,209 @@
+from threading import Thread, Event, Lock
+import time
+
+try:
+    from comtypes import CoInitializeEx, COINIT_MULTITHREADED
+except ImportError:
+    CoInitializeEx = None
+    COINIT_MULTITHREADED = 0
+
+
+class DriverHealth:
+    """
+    Stores the probe and reconnect state of one driver.
+    """
+
+    def __init__(self, driver, interval):
+        """
+        :param driver: the driver
+        :type driver: :class:`Camera.drivers.Driver.Driver`
+        :param interval: the first probe interval in seconds
+        :type interval: float
+        """
+        self.driver = driver
+        self.interval = interval
+        self.next_time = time.time()
+        self.attempts = 0
+        self.state_since = time.time()
+
+        self.probes = 0
+        self.probe_failures = 0
+        self.busy_probes = 0
+        self.reconnect_attempts = 0
+        self.reconnects = 0
+        self.last_probe_latency = 0.
+        self.downtime = 0.
+        self.transitions = {}
+
+
+class HealthMonitor(Thread):
+    """
+    The HealthMonitor probes the drivers in a background thread. The probe
+    interval grows while the drivers answer and falls back to the minimum
+    after a problem. If a driver doesn't answer, it's marked as
+    'reconnecting' (the calls of the driver fail fast or wait, see
+    :attr:`Camera.drivers.Driver.Driver.unavailable_policy`) and it's
+    reconnected with an exponential backoff.
+    """
+
+    def __init__(self, drivers, min_interval=1., max_interval=30.,
+                 backoff_start=1., backoff_max=300., slow_probe=0.5):
+        """
+        :param drivers: the drivers to watch
+        :type drivers: list
+        :param min_interval: the shortest probe interval in seconds
+        :type min_interval: float
+        :param max_interval: the longest probe interval in seconds
+        :type max_interval: float
+        :param backoff_start: the first waiting time before a reconnect
+        :type backoff_start: float
+        :param backoff_max: the longest waiting time between reconnects
+        :type backoff_max: float
+        :param slow_probe:
+            probes which need more seconds are handled as a warning and the
+            interval falls back to the minimum
+        :type slow_probe: float
+        """
+        Thread.__init__(self)
+        self.daemon = True
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_start = backoff_start
+        self.backoff_max = backoff_max
+        self.slow_probe = slow_probe
+        self.states = [DriverHealth(driver, min_interval) for driver in drivers]
+        self.state_listeners = []
+        self.lock = Lock()
+        self.stop_event = Event()
+        self.start()
+
+    def run(self):
+        # the probes and the reconnects use COM in this thread
+        if CoInitializeEx is not None:
+            CoInitializeEx(COINIT_MULTITHREADED)
+        while not self.stop_event.is_set():
+            now = time.time()
+            for state in self.states:
+                if state.next_time <= now:
+                    self.__check__(state)
+            next_time = min(state.next_time for state in self.states)
+            self.stop_event.wait(max(next_time - time.time(), 0.05))
+
+    def __check__(self, state):
+        """
+        Probes or reconnects one driver and plans the next check.
+
+        :param state: the state of the driver
+        :type state: :class:`DriverHealth`
+        """
+        driver = state.driver
+        # not connected yet or closed on purpose
+        if driver.health == 'disconnected' or not driver.connect_event.is_set():
+            state.next_time = time.time() + self.max_interval
+            return
+        if driver.health == 'reconnecting':
+            state.reconnect_attempts += 1
+            if driver.reconnect():
+                state.reconnects += 1
+                state.attempts = 0
+                state.interval = self.min_interval
+                self.__set_health__(state, 'connected')
+                state.next_time = time.time() + state.interval
+            else:
+                state.attempts += 1
+                backoff = min(self.backoff_start * 2 ** state.attempts,
+                              self.backoff_max)
+                state.next_time = time.time() + backoff
+            return
+
+        start = time.perf_counter()
+        alive = driver.probe()
+        latency = time.perf_counter() - start
+        state.probes += 1
+        state.last_probe_latency = latency
+        if alive is None:
+            # the driver lock is held by a long call, it's handled as a
+            # slow probe
+            state.busy_probes += 1
+            state.interval = self.min_interval
+            state.next_time = time.time() + state.interval
+        elif alive:
+            if latency > self.slow_probe:
+                state.interval = self.min_interval
+            else:
+                state.interval = min(state.interval * 1.5, self.max_interval)
+            state.next_time = time.time() + state.interval
+        else:
+            state.probe_failures += 1
+            state.interval = self.min_interval
+            self.__set_health__(state, 'reconnecting')
+            state.next_time = time.time() + self.backoff_start
+
+    def __set_health__(self, state, health):
+        """
+        Changes the health of a driver and counts the transition.
+
+        :param state: the state of the driver
+        :type state: :class:`DriverHealth`
+        :param health: the new health
+        :type health: str
+        """
+        old = state.driver.health
+        if old == health:
+            return
+        now = time.time()
+        self.lock.acquire()
+        if old == 'reconnecting':
+            state.downtime += now - state.state_since
+        state.state_since = now
+        key = '{}->{}'.format(old, health)
+        state.transitions[key] = state.transitions.get(key, 0) + 1
+        self.lock.release()
+        state.driver.set_health(health)
+        for listener in list(self.state_listeners):
+            listener(state.driver.driver_type, old, health)
+
+    def add_state_listener(self, listener):
+        """
+        Adds a listener, which is called with the driver type, the old and
+        the new health after every change.
+
+        :param listener: the listener
+        :type listener: callable
+        """
+        self.state_listeners.append(listener)
+
+    def get_metrics(self):
+        """
+        Returns the health metrics of all drivers.
+
+        :returns: dict with the driver type as key and the metrics as value
+        :rtype: dict
+        """
+        metrics = {}
+        now = time.time()
+        self.lock.acquire()
+        for state in self.states:
+            downtime = state.downtime
+            if state.driver.health == 'reconnecting':
+                downtime += now - state.state_since
+            metrics[state.driver.driver_type] = {
+                'health': state.driver.health,
+                'state_duration': now - state.state_since,
+                'probe_interval': state.interval,
+                'probes': state.probes,
+                'probe_failures': state.probe_failures,
+                'busy_probes': state.busy_probes,
+                'last_probe_latency': state.last_probe_latency,
+                'reconnect_attempts': state.reconnect_attempts,
+                'reconnects': state.reconnects,
+                'downtime': downtime,
+                'transitions': dict(state.transitions)}
+        self.lock.release()
+        return metrics
+
+    def stop(self):
+        """
+        Stops the monitor.
+        """
+        self.stop_event.set()
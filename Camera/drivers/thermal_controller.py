@@ -0,0 +1,232 @@
+from threading import Thread, Event, Lock
+import time
+
+
+class ThermalController(Thread):
+    """
+    The ThermalController ramps the set temperature of the CCD-chip in a
+    background thread with a fixed rate to the target temperature. It
+    watches the CCD temperature and the cooler power: if the chip lags
+    behind the set temperature or the cooler runs at its limit, the ramp
+    slows down or holds until the chip follows again.
+    Every driver call holds the driver lock only for a single property, so
+    exposures can run during the ramp.
+
+    The listeners are called after every step with a dict with the keys
+    'state' ('ramping', 'holding', 'done', 'ambient', 'stopped', 'timeout'
+    or 'error'), 'temperature', 'setpoint', 'target', 'cooler_power',
+    'progress' (0 to 1 or None) and 'eta' (seconds or None).
+    """
+
+    def __init__(self, camera_driver, target=None, rate=2., interval=5.,
+                 tolerance=0.5, max_lag=2., power_limit=95., timeout=None,
+                 stagnation_time=300.):
+        """
+        :param camera_driver: the driver of the camera
+        :type camera_driver: :class:`Camera.drivers.camera_driver.CameraDriver`
+        :param target:
+            the target temperature or None to warm up until the cooler is
+            idle and the chip doesn't follow anymore (ambient temperature),
+            without the cooler power until the chip doesn't get warmer for
+            stagnation_time seconds
+        :type target: float
+        :param rate: the ramp rate in °C per minute
+        :type rate: float
+        :param interval: the time between two steps in seconds
+        :type interval: float
+        :param tolerance:
+            the maximal difference between the CCD temperature and the target
+            to finish the ramp
+        :type tolerance: float
+        :param max_lag:
+            the maximal difference between the CCD temperature and the set
+            temperature, before the ramp holds
+        :type max_lag: float
+        :param power_limit:
+            the cooler power in percent, at which the cool down holds
+        :type power_limit: float
+        :param timeout: the maximal duration of the ramp in seconds or None
+        :type timeout: float
+        :param stagnation_time:
+            the time in seconds, in which the chip must get warmer by more
+            than the tolerance, before the warm up ends at the ambient
+            temperature, if the cooler power is unknown
+        :type stagnation_time: float
+        """
+        Thread.__init__(self)
+        self.daemon = True
+        self.camera_driver = camera_driver
+        self.target = target
+        self.rate = rate
+        self.interval = interval
+        self.tolerance = tolerance
+        self.max_lag = max_lag
+        self.power_limit = power_limit
+        self.timeout = timeout
+        self.stagnation_time = stagnation_time
+        self.listeners = []
+        self.lock = Lock()
+        self.stop_event = Event()
+        self.done_event = Event()
+        self.status = {'state': 'ramping', 'temperature': None,
+                       'setpoint': None, 'target': target,
+                       'cooler_power': None, 'progress': None, 'eta': None}
+        self.start()
+
+    def run(self):
+        try:
+            self.__ramp__()
+        finally:
+            self.done_event.set()
+
+    def __ramp__(self):
+        """
+        Changes the set temperature step by step until the ramp is finished.
+        """
+        start_time = time.time()
+        start = self.camera_driver.get_temperature()
+        setpoint = start
+        if self.target is None:
+            direction = 1
+        else:
+            direction = 1 if self.target > start else -1
+        last_time = time.time()
+        # the warmest temperature and its time to detect a stagnant chip
+        warmest = start
+        warmest_time = start_time
+        while True:
+            temperature = self.camera_driver.get_temperature()
+            power = self.camera_driver.get_cooler_power()
+            now = time.time()
+            lag = (setpoint - temperature) * direction
+            if temperature > warmest + self.tolerance:
+                warmest = temperature
+                warmest_time = now
+
+            if temperature == 99:
+                # the temperature isn't readable
+                state = 'error'
+            elif self.target is not None and \
+                    setpoint == self.target and \
+                    abs(temperature - self.target) <= self.tolerance:
+                state = 'done'
+            elif self.target is None and lag > self.max_lag and \
+                    ((power is not None and power <= 0) or
+                     (power is None and now - warmest_time >= self.stagnation_time)):
+                # the cooler is idle and the chip doesn't get warmer anymore
+                state = 'ambient'
+            elif self.stop_event.is_set():
+                state = 'stopped'
+            elif self.timeout is not None and now - start_time > self.timeout:
+                state = 'timeout'
+            else:
+                # adapts the step to the lag of the chip and to the cooler
+                if lag > self.max_lag or (direction < 0 and power is not None and
+                                          power >= self.power_limit):
+                    factor = 0.
+                elif lag > self.max_lag / 2:
+                    factor = 0.5
+                else:
+                    factor = 1.
+                step = factor * self.rate * (now - last_time) / 60.
+                setpoint += direction * step
+                if self.target is not None and \
+                        (self.target - setpoint) * direction <= 0:
+                    setpoint = self.target
+                if step > 0:
+                    self.camera_driver.set_temperature(round(setpoint, 2))
+                state = 'ramping' if factor > 0 else 'holding'
+            last_time = now
+
+            self.__update__(state, temperature, setpoint, power, start)
+            if state not in ('ramping', 'holding'):
+                break
+            self.stop_event.wait(self.interval)
+
+    def __update__(self, state, temperature, setpoint, power, start):
+        """
+        Updates the status and calls the listeners.
+
+        :param state: the state of the ramp
+        :type state: str
+        :param temperature: the CCD temperature
+        :type temperature: float
+        :param setpoint: the current set temperature
+        :type setpoint: float
+        :param power: the cooler power in percent or None
+        :type power: float
+        :param start: the CCD temperature at the start of the ramp
+        :type start: float
+        """
+        progress = None
+        eta = None
+        if self.target is not None:
+            if self.target != start:
+                progress = min(max((temperature - start) / (self.target - start), 0.), 1.)
+            else:
+                progress = 1.
+            eta = abs(self.target - temperature) / self.rate * 60.
+        if state == 'done':
+            progress = 1.
+            eta = 0.
+        status = {'state': state, 'temperature': temperature,
+                  'setpoint': setpoint, 'target': self.target,
+                  'cooler_power': power, 'progress': progress, 'eta': eta}
+        self.lock.acquire()
+        self.status = status
+        self.lock.release()
+        for listener in list(self.listeners):
+            # a broken listener mustn't stop the ramp
+            try:
+                listener(dict(status))
+            except Exception as e:
+                print(e)
+
+    def add_listener(self, listener):
+        """
+        Adds a listener, which is called with the status after every step.
+
+        :param listener: the listener
+        :type listener: callable
+        """
+        self.listeners.append(listener)
+
+    def get_status(self):
+        """
+        Returns the status of the last step.
+
+        :returns: the status, see :class:`ThermalController`
+        :rtype: dict
+        """
+        self.lock.acquire()
+        status = dict(self.status)
+        self.lock.release()
+        return status
+
+    def wait(self, timeout=None):
+        """
+        Waits until the ramp is finished.
+
+        :param timeout: the maximal waiting time in seconds or None
+        :type timeout: float
+        :returns: the final state or None if the ramp is still running
+        :rtype: str
+        """
+        if not self.done_event.wait(timeout):
+            return None
+        return self.get_status()['state']
+
+    def is_running(self):
+        """
+        Asks if the ramp is still running.
+
+        :returns: True if the ramp is running, else False
+        :rtype: bool
+        """
+        return not self.done_event.is_set()
+
+    def stop(self):
+        """
+        Stops the ramp at the current set temperature.
+        """
+        self.stop_event.set()
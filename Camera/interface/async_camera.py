@@ -0,0 +1,206 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .camera import Camera
+
+
+class AsyncCamera:
+    """
+    The AsyncCamera is an asyncio facade of the :class:`Camera` class.
+    All blocking calls, which end in a COM call of the drivers, are executed
+    in a dedicated executor with one thread, so the event loop is never
+    blocked and the COM calls are still serialized.
+    Completion (via :class:`Camera.interface.image_handle.ImageHandle`) and
+    status changes are pushed from the camera threads to the loop, this means
+    there is no need to poll :meth:`Camera.get_properties`.
+    """
+
+    def __init__(self, camera=None, loop=None, **camera_kwargs):
+        """
+        :param camera:
+            An existing camera object or None to create a new one with the
+            camera_kwargs
+        :type camera: :class:`Camera`
+        :param loop: the event loop or None to use the running loop
+        :type loop: asyncio.AbstractEventLoop
+        """
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.loop = loop
+        if camera is None:
+            camera = Camera(**camera_kwargs)
+        self.camera = camera
+        self.image_lock = asyncio.Lock()
+
+    def __get_loop__(self):
+        """
+        Returns the event loop of this facade.
+
+        :returns: the event loop
+        :rtype: asyncio.AbstractEventLoop
+        """
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        return self.loop
+
+    async def __call__(self, method, *args):
+        """
+        Runs a blocking method in the executor of the facade.
+
+        :param method: the blocking method
+        :type method: callable
+        :returns: the return value of the method
+        """
+        return await self.__get_loop__().run_in_executor(self.executor,
+                                                         method, *args)
+
+    async def take_image(self, image_information):
+        """
+        Starts a new exposure and waits until all images of the
+        image information are saved.
+
+        :param image_information: Information of the image
+        :type image_information: Camera.meta.image_information.ImageInformation
+        :returns:
+            the path of the saved image or a list with the paths if the
+            image information is a sequence
+        :rtype: str, list
+        """
+        async with self.image_lock:
+            handle = await self(self.camera.take_image, image_information)
+            if len(handle) == 1:
+                return await asyncio.wrap_future(handle.get_frame(0))
+            return await asyncio.wrap_future(handle.future)
+
+    async def wait_ready(self, timeout=None):
+        """
+        Waits until the camera is ready, this means there is no exposure,
+        readout or sequence at the moment.
+
+        :param timeout: the maximal time to wait in seconds or None
+        :type timeout: float
+        :returns: True if the camera is ready, False after a timeout
+        :rtype: bool
+        """
+        loop = self.__get_loop__()
+        changed = asyncio.Event()
+
+        def status_listener(old, new):
+            loop.call_soon_threadsafe(changed.set)
+
+        end = None if timeout is None else loop.time() + timeout
+        self.camera.camera_status.add_status_listener(status_listener)
+        try:
+            while not self.camera.is_camera_ready2():
+                wait = 1.
+                if end is not None:
+                    wait = min(wait, end - loop.time())
+                    if wait <= 0:
+                        return False
+                changed.clear()
+                # the sequence flag doesn't trigger a status change, that's
+                # why it is checked at least every second
+                try:
+                    await asyncio.wait_for(changed.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.camera.camera_status.remove_status_listener(status_listener)
+        return True
+
+    async def status_transitions(self):
+        """
+        Asynchronous iterator over the status transitions of the camera.
+
+        .. code-block:: python
+
+            async for old, new in async_camera.status_transitions():
+                print(old, '->', new)
+
+        :returns: tuples with the old and the new status label
+        :rtype: tuple
+        """
+        loop = self.__get_loop__()
+        queue = asyncio.Queue()
+
+        def status_listener(old, new):
+            loop.call_soon_threadsafe(queue.put_nowait, (old, new))
+
+        self.camera.camera_status.add_status_listener(status_listener)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.camera.camera_status.remove_status_listener(status_listener)
+
+    async def ramp_temperature(self, temperature, step=3., interval=10.,
+                               tolerance=0.5, timeout=None):
+        """
+        Changes the CCD temperature to the new temperature with the
+        :class:`Camera.drivers.thermal_controller.ThermalController` of the
+        driver, which slows the ramp down if the chip lags behind. If the
+        coroutine is cancelled, the ramp stops.
+
+        :param temperature: the target temperature
+        :type temperature: float
+        :param step: the maximal change of the set temperature per step
+        :type step: float
+        :param interval: the time between two steps in seconds
+        :type interval: float
+        :param tolerance:
+            the maximal difference between the CCD temperature and the target
+            temperature to finish the ramp
+        :type tolerance: float
+        :param timeout: the maximal duration of the ramp in seconds or None
+        :type timeout: float
+        :returns: the CCD temperature at the end of the ramp
+        :rtype: float
+        """
+        loop = self.__get_loop__()
+        finished = asyncio.Event()
+
+        def listener(status):
+            if status['state'] not in ('ramping', 'holding'):
+                loop.call_soon_threadsafe(finished.set)
+
+        # the step per interval is the rate of the controller
+        controller = await self(partial(self.camera.camera.ramp_temperature,
+                                        temperature, step / interval * 60.,
+                                        interval=interval, tolerance=tolerance,
+                                        timeout=timeout))
+        controller.add_listener(listener)
+        try:
+            if controller.is_running():
+                await finished.wait()
+        except asyncio.CancelledError:
+            controller.stop()
+            raise
+        return controller.get_status()['temperature']
+
+    async def get_properties(self):
+        """
+        Returns the current camera properties, see :meth:`Camera.get_properties`.
+
+        :returns: the camera properties
+        :rtype: dict
+        """
+        return await self(self.camera.get_properties)
+
+    async def stop_exposure(self):
+        """
+        Stops the current exposure and starts the readout.
+        """
+        await self(self.camera.stop_exposure)
+
+    async def abort_exposure(self):
+        """
+        Stops the current exposure without a readout.
+        """
+        await self(self.camera.abort_exposure)
+
+    async def disconnect(self):
+        """
+        Disconnects the camera and shuts the executor down.
+        """
+        await self(self.camera.disconnect)
+        self.executor.shutdown(wait=False)
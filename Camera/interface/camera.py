@@ -1,18 +1,21 @@
 
-from threading import Thread
-from multiprocessing import Process
+from threading import Thread, Event
 from Camera.meta.image_log import ImageLog
+from Camera.meta.image_writer import write_image
+from Camera.meta.frame_buffer import FrameBuffer
+from Camera.meta.telemetry import TelemetryStore
+from Camera.analysis.focus import get_focus_metrics
+from Camera.meta.preview import create_previews, save_previews
+from Camera.meta.image_statistics import compute_statistics, get_subsample, \
+    add_statistics_header, get_log_statistics, STATISTICS_KEYS
 from Camera.drivers.Driver import Chooser, get_driver_information, set_driver_information
 from Camera.drivers.camera_driver import CameraDriver
 from Camera.drivers.filter_wheel_driver import FilterWheelDriver
 from .camera_meta import CameraStatus
-
-try:
-    from ImageProcessing.astrometry.coordinate_align import Astrometry
-except ImportError:
-    Astrometry = None
-
-from astropy.io import fits
+from .image_handle import ImageHandle
+from .video_stream import VideoStream
+from .wcs_pool import WCSPool
+from .wcs_cache import WCSCache, get_wcs_key, get_separation
 import os
 import time
 
@@ -27,6 +30,19 @@ class Camera:
     sequence = False
     images_left = 0
     current_imageing = False
+    image_handle = None
+    current_frame = None
+    wcs_pool = None
+    previews = True
+    saturation = 65535
+    statistics_max_pixels = 16777216
+    calibration_stage = None
+    directory_layout = None
+    health_monitor = None
+    metrics = None
+    metrics_server = None
+    video_stream = None
+    live_stacker = None
 
     coordinate_signal = None
     signal_image_saved = None
@@ -38,14 +54,65 @@ class Camera:
 
     def __init__(self, camera_driver_name='ASCOM.Simulator.Camera',
                  filterwheel_driver_name='ASCOM.Simulator.FilterWheel',
-                 signal=None):
-        self.__driver_initialisation__(camera_driver_name, filterwheel_driver_name)
-        self.camera_status = CameraStatus()
-        self.image_log = ImageLog(signal=signal)
-        self.th = Thread(target=self.run)
-        self.th.start()
-
-    def __driver_initialisation__(self, camera_driver, filter_wheel_driver, test=False):
+                 signal=None, image_log=None, writer=None, start_thread=True,
+                 connect_mode='now'):
+        """
+        :param camera_driver_name: the name of the camera driver
+        :type camera_driver_name: str
+        :param filterwheel_driver_name: the name of the filter wheel driver
+        :type filterwheel_driver_name: str
+        :param signal: optional signal of the image log
+        :param image_log: a shared image log or None to create a new one
+        :type image_log: :class:`Camera.meta.image_log.ImageLog`
+        :param writer:
+            a shared image writer or None to write the images in the
+            status thread
+        :type writer: :class:`Camera.meta.image_writer.ImageWriter`
+        :param start_thread:
+            True to start the own status thread, False if the status updates
+            are called from outside like from a :class:`CameraGroup`
+        :type start_thread: bool
+        :param connect_mode:
+            'now' to connect the drivers one after the other, 'background'
+            to connect them in parallel background threads or 'lazy' to
+            connect them at their first use (the status thread uses the
+            camera at its start), see :meth:`wait_connected`
+        :type connect_mode: str
+        """
+        self.__driver_initialisation__(camera_driver_name, filterwheel_driver_name,
+                                       connect_mode=connect_mode)
+        self.camera_status = CameraStatus(threaded=start_thread)
+        if image_log is None:
+            image_log = ImageLog(signal=signal)
+        self.image_log = image_log
+        self.writer = writer
+        self.image_saved_listeners = []
+        # the last frames for consumers like the GUI or the focus tools
+        self.frame_buffer = FrameBuffer()
+        # the history of the temperatures, replace it with a store with a
+        # path to keep the history on the disk
+        self.telemetry = TelemetryStore()
+        # the cooler power is read only every cooler_power_interval seconds
+        self.cooler_power_interval = 10.
+        self.cooler_power = None
+        self.cooler_power_time = 0.
+        # the status loop polls with poll_interval near the end of an
+        # exposure or a readout, with exposure_interval during a long
+        # exposure or a readout and with idle_interval without an exposure
+        self.poll_interval = 0.1
+        self.exposure_interval = 1.
+        self.idle_interval = 2.
+        # seconds before the predicted end, when the tight polling starts
+        self.deadline_guard = 0.3
+        # wakes the status loop up, for example after the start of an exposure
+        self.poll_event = Event()
+        self.th = None
+        if start_thread:
+            self.th = Thread(target=self.run)
+            self.th.start()
+
+    def __driver_initialisation__(self, camera_driver, filter_wheel_driver, test=False,
+                                  connect_mode='now'):
         """
         Starts the drivers to the interface and the filter wheel.
         It searchs in the config file for the driver names.
@@ -54,6 +121,8 @@ class Camera:
         :type camera_driver: str
         :param filter_wheel_driver:
             the name of the filter wheel driver or an empty string
+        :param connect_mode: 'now', 'background' or 'lazy'
+        :type connect_mode: str
         """
         # If there is no information of the drivers
         if camera_driver == '':
@@ -77,27 +146,191 @@ class Camera:
                     set_driver_information('./config.txt', 'Filterwheel',
                                            filter_wheel_driver)
         # Create an object of a COM-object of the interface
-        self.camera = CameraDriver(camera_driver)
+        self.camera = CameraDriver(camera_driver, connect_mode=connect_mode)
         # Create an object of a COM-object of the filterwheel
-        self.filterwheel = FilterWheelDriver(filter_wheel_driver)
+        self.filterwheel = FilterWheelDriver(filter_wheel_driver,
+                                             connect_mode=connect_mode)
+
+    def wait_connected(self, timeout=None):
+        """
+        Waits until the connections to the camera and the filter wheel are
+        finished. Lazy drivers are connected now.
+
+        :param timeout: the maximal waiting time in seconds or None
+        :type timeout: float
+        :returns: True if both are connected, else False
+        :rtype: bool
+        """
+        end = None if timeout is None else time.time() + timeout
+        for device in (self.camera, self.filterwheel):
+            remaining = None if end is None else max(end - time.time(), 0)
+            if not device.wait_connected(remaining):
+                return False
+        return True
+
+    def start_health_monitor(self, unavailable_policy='fail', **kwargs):
+        """
+        Starts a :class:`Camera.drivers.health_monitor.HealthMonitor` for
+        the camera and the filter wheel, which reconnects lost drivers.
+
+        :param unavailable_policy:
+            'fail' to let the calls fail directly while a driver reconnects
+            or 'wait' to let them wait for the reconnection
+        :type unavailable_policy: str
+        :param kwargs: the arguments of the health monitor
+        :returns: the health monitor
+        :rtype: :class:`Camera.drivers.health_monitor.HealthMonitor`
+        """
+        from Camera.drivers.health_monitor import HealthMonitor
+        if self.health_monitor is None:
+            for device in (self.camera, self.filterwheel):
+                device.unavailable_policy = unavailable_policy
+            self.health_monitor = HealthMonitor([self.camera, self.filterwheel],
+                                                **kwargs)
+        return self.health_monitor
+
+    def start_metrics_server(self, port=9108, host='127.0.0.1'):
+        """
+        Starts a local HTTP server, which returns the metrics of the
+        acquisition pipeline in the Prometheus text format. The export
+        doesn't use the drivers, the temperature is the last value of the
+        status thread.
+
+        :param port: the port of the server, 0 for a free port
+        :type port: int
+        :param host: the address of the server
+        :type host: str
+        :returns: the server
+        :rtype: :class:`Camera.meta.metrics.MetricsServer`
+        """
+        from Camera.meta.metrics import Metrics, MetricsServer
+        if self.metrics_server is not None:
+            return self.metrics_server
+        if self.metrics is None:
+            metrics = Metrics()
+            metrics.describe('exposures_started', 'Started exposures')
+            metrics.describe('exposures_completed', 'Saved images')
+            metrics.describe('exposures_failed', 'Images which could not be saved')
+            metrics.describe('readout_seconds', 'Time from the readout start to the saving')
+            metrics.describe('conversion_seconds', 'Time to convert the image and create the header')
+            metrics.describe('write_seconds', 'Time to write the image')
+            metrics.describe('com_latency_seconds', 'Latency of the COM calls')
+            metrics.describe('status_updates', 'Updates of the status loop')
+            metrics.add_gauge('ccd_temperature', self.camera_status.get_temperature,
+                              'Last temperature of the CCD chip')
+            metrics.add_gauge('ccd_temperature_set', self.camera.get_set_temperature,
+                              'Set temperature of the CCD chip')
+            metrics.add_gauge('cooler_on', lambda: self.camera.cooler_on,
+                              'Last known state of the cooler')
+            metrics.add_gauge('status', self.camera_status.get_status_id,
+                              'Status id of the camera')
+            metrics.add_gauge('writer_queue_size',
+                              lambda: self.writer.get_queue_size() if self.writer else 0,
+                              'Images waiting for the writer')
+            metrics.add_gauge('wcs_queue_size', self.__get_wcs_queue_size__,
+                              'Images waiting for the WCS solution')
+            metrics.add_gauge('frame_buffer_bytes', self.frame_buffer.get_size,
+                              'Memory of the frame buffer')
+            self.metrics = metrics
+        for device in (self.camera, self.filterwheel):
+            device.metrics = self.metrics
+        if self.writer is not None:
+            self.writer.metrics = self.metrics
+        self.metrics_server = MetricsServer(self.metrics, host, port)
+        return self.metrics_server
+
+    def __get_wcs_queue_size__(self):
+        """
+        Returns the number of images waiting for the WCS solution.
+
+        :returns: the number of images or None if there is no WCS pool
+        :rtype: int
+        """
+        pool = self.wcs_pool if self.wcs_pool is not None else WCS_POOL
+        if pool is None:
+            return None
+        return pool.get_queue_size()
+
+    def __count__(self, name):
+        """
+        Increases a counter of the metrics, if they are enabled.
+
+        :param name: the name of the counter
+        :type name: str
+        """
+        if self.metrics is not None:
+            self.metrics.increment(name)
+
+    def __observe__(self, name, seconds):
+        """
+        Adds a duration to a timing of the metrics, if they are enabled.
+
+        :param name: the name of the timing
+        :type name: str
+        :param seconds: the duration
+        :type seconds: float
+        """
+        if self.metrics is not None:
+            self.metrics.observe(name, seconds)
+
+    def get_connection_times(self):
+        """
+        Returns the connection times of the camera and the filter wheel,
+        see :meth:`Camera.drivers.Driver.Driver.get_connection_time`.
+
+        :returns: dict with 'camera' and 'filterwheel'
+        :rtype: dict
+        """
+        return {'camera': self.camera.get_connection_time(),
+                'filterwheel': self.filterwheel.get_connection_time()}
 
     def run(self):
         while self.active:
+            self.poll_event.clear()
             self.status_update()
+            self.poll_event.wait(self.get_poll_interval())
+
+    def get_poll_interval(self):
+        """
+        Returns the time until the next status update. It's short only near
+        the predicted end of the exposure or the readout.
+
+        :returns: the time in seconds
+        :rtype: float
+        """
+        if self.is_exposure_in_process() and \
+                self.camera_status.exposure_process is not None:
+            time_left = self.camera_status.exposure_process.get_time_left()
+        elif self.is_readout_in_process() and \
+                self.camera_status.readout_process is not None:
+            time_left = self.camera_status.readout_process.get_time_left()
+        else:
+            return self.idle_interval
+        return min(max(time_left - self.deadline_guard, self.poll_interval),
+                   self.exposure_interval)
 
     def status_update(self):
         """
         Updates the interface status
         """
+        self.__count__('status_updates')
         # updates the current temperature of the ccd-chip
-        self.camera_status.set_temperature(self.camera.get_temperature())
+        temperature = self.camera.get_temperature()
+        self.camera_status.set_temperature(temperature)
+        self.__add_telemetry__(temperature)
         if self.is_exposure_in_process():
             if (self.camera_status.exposure_process.get_time_left_percent() == 100 and
                     not self.is_readout_in_process()):
                 if not self.image_abort:
+                    # the driver needs longer than predicted, the readout
+                    # starts at one of the next updates
+                    if self.camera.is_exposing():
+                        return
                     self.camera.download_image()
                     self.camera_status.start_readout(self.camera_status.get_image_information().get_readout_time())
                     self.readout_time = time.time()
+                    if self.current_frame is not None:
+                        self.current_frame.set_time('readout_start', self.readout_time)
                 else:
                     self.camera_status.reset()
             elif self.is_readout_in_process():
@@ -105,51 +338,324 @@ class Camera:
                     if self.camera.is_image_ready():
                         self.__save_image__()
                         self.camera_status.reset()
-        time.sleep(0.1)
+
+    def __add_telemetry__(self, temperature):
+        """
+        Adds the current temperature to the telemetry. The set temperature
+        and the filter position are the cached values of the drivers.
+
+        :param temperature: the current CCD temperature
+        :type temperature: float
+        """
+        now = time.time()
+        if now - self.cooler_power_time >= self.cooler_power_interval:
+            self.cooler_power = self.camera.get_cooler_power()
+            self.cooler_power_time = now
+        if temperature == 99:
+            # the temperature wasn't readable
+            temperature = None
+        self.telemetry.add(now, temperature, self.camera.get_set_temperature(),
+                           self.cooler_power, self.filterwheel.position)
+
+    def __get_temperature_statistics__(self, info):
+        """
+        Returns the statistics of the CCD temperature during the last
+        exposure from the telemetry.
+
+        :param info: the information of the image
+        :type info: :class:`Camera.meta.image_information.ImageInformation`
+        :returns: the statistics or None, see :meth:`TelemetryStore.get_statistics`
+        :rtype: dict
+        """
+        if self.telemetry is None:
+            return None
+        return self.telemetry.get_statistics(
+            self.readout_time - info.get_exposure_time(), self.readout_time)
 
     def __save_image__(self):
         """
-        Saves the image with all available information.
-        """
-        img = self.camera.get_image()
-        info = self.camera_status.get_image_information()
-        self.camera_status.reset()
-        self.last_image = img
-        hdu = fits.PrimaryHDU(img)
-        hdu.header = self.__create_header__(hdu.header, info)
-        save_path = info.get_save_path()
-        c = 0
-        while os.path.exists(save_path):
-            if c == 0:
-                save_path = save_path.split('.fit')[0]
-            else:
-                save_path = save_path.split('_{}.fit'.format(c-1))[0]
-            save_path += '_{}.fits'.format(c)
-            c += 1
-        hdu.writeto(save_path)
-
-        add_wcs(save_path, self.coordinate_signal)
+        Saves the image with all available information. If the camera has
+        an :class:`Camera.meta.image_writer.ImageWriter`, the image is written
+        by the writer and the camera is free for the next exposure directly
+        after the readout.
+        """
+        from astropy.io import fits
+        frame = self.current_frame
+        self.current_frame = None
+        try:
+            self.__observe__('readout_seconds', time.time() - self.readout_time)
+            conversion_start = time.perf_counter()
+            if frame is not None:
+                frame.mark('save_start', conversion_start)
+            img = self.camera.get_image()
+            if frame is not None:
+                frame.set_time('image_ready')
+                # the driver marks the end of the exposure and the transfer
+                for name, value in self.camera.download_marks.items():
+                    frame.mark(name, value)
+                frame.mark('converted')
+            info = self.camera_status.get_image_information()
+            save_path = self.__get_save_path__(info)
+            self.camera_status.reset()
+            self.last_image = img
+            statistics = compute_statistics(img, self.saturation,
+                                            get_subsample(img, self.statistics_max_pixels))
+            hdu = fits.PrimaryHDU(img)
+            hdu.header = self.__create_header__(hdu.header, info, statistics)
+            log_statistics = get_log_statistics(statistics)
+            temperature = self.__get_temperature_statistics__(info)
+            if temperature is not None:
+                hdu.header['CCDTMIN'] = (round(temperature['min'], 3),
+                                         'Minimal CCD temperature in the exposure')
+                hdu.header['CCDTMAX'] = (round(temperature['max'], 3),
+                                         'Maximal CCD temperature in the exposure')
+                hdu.header['CCDTMEAN'] = (round(temperature['mean'], 3),
+                                          'Mean CCD temperature in the exposure')
+                for key in ('min', 'max', 'mean'):
+                    log_statistics['ccd_temp_' + key] = round(temperature[key], 3)
+            # the histogram is too large for the header and the log, it's
+            # kept with the frame in the buffer
+            buffer_id = self.frame_buffer.add(img, info.to_dict(), log_statistics,
+                                              statistics['histogram'])
+            if frame is not None:
+                frame.mark('header_built')
+                self.__add_timing_header__(hdu.header, frame)
+            # the image information can change with the next exposure,
+            # that's why everything for the later steps is collected now
+            products = {'log_entry': self.__create_log_entry__(info),
+                        'wcs_key': get_wcs_key(info),
+                        'readout_time': self.readout_time,
+                        'statistics': log_statistics,
+                        'buffer_id': buffer_id,
+                        'previews': None}
+            if self.previews:
+                products['previews'] = create_previews(img)
+            products['calibrated'] = self.__calibrate_image__(img, info, hdu)
+            products['stack_key'] = self.__get_stack_key__(info, frame)
+            if (products['calibrated'] is not None and
+                    self.calibration_stage.mode == 'replace'):
+                # the calibrated frame is written instead of the raw frame
+                hdu = products['calibrated']
+                products['calibrated'] = None
+            products['stack_hdu'] = hdu
+            self.__observe__('conversion_seconds', time.perf_counter() - conversion_start)
+            if frame is not None:
+                frame.mark('processed')
+        except Exception as e:
+            self.__count__('exposures_failed')
+            self.__frame_failed__(frame, e)
+            raise
+
+        if self.writer is None:
+            write_start = time.perf_counter()
+            try:
+                save_path = write_image(hdu, save_path)
+            except Exception as e:
+                self.__count__('exposures_failed')
+                self.__frame_failed__(frame, e)
+                raise
+            self.__observe__('write_seconds', time.perf_counter() - write_start)
+            self.__image_written__(save_path, products, frame)
+        else:
+            def written(path, error):
+                if error is not None:
+                    self.__count__('exposures_failed')
+                    self.__frame_failed__(frame, error)
+                else:
+                    self.__image_written__(path, products, frame)
+            self.writer.write(hdu, save_path, written)
+        self.image_left -= 1
+        self.current_imageing = False
+
+    def __get_save_path__(self, info):
+        """
+        Returns the wanted path of the image, in the directory of the
+        directory layout if the camera has one.
+
+        :param info: the information of the image
+        :type info: Camera.meta.image_information.ImageInformation
+        :returns: the wanted path of the image
+        :rtype: str
+        """
+        if self.directory_layout is None:
+            return info.get_save_path()
+        return self.directory_layout.get_path(info)
+
+    def __calibrate_image__(self, img, info, hdu):
+        """
+        Calibrates the image with the calibration stage.
+
+        :param img: the raw image
+        :type img: numpy.ndarray
+        :param info: the information of the image
+        :type info: Camera.meta.image_information.ImageInformation
+        :param hdu: the HDU of the raw image
+        :type hdu: astropy.io.fits.PrimaryHDU
+        :returns:
+            the HDU of the calibrated image or None if there is no
+            calibration stage or no master for this image
+        :rtype: astropy.io.fits.PrimaryHDU
+        """
+        if self.calibration_stage is None:
+            return None
+        from astropy.io import fits
+        from Camera.calibration.calibration_stage import add_calibration_header
+        calibrated = self.calibration_stage.apply(
+            img, info, self.camera.camera_information.get_temperature())
+        if calibrated is None:
+            return None
+        data, names = calibrated
+        header = hdu.header.copy()
+        # the data statistics belong to the raw image
+        for key in ('BZERO', 'BSCALE') + STATISTICS_KEYS:
+            header.remove(key, ignore_missing=True)
+        cal_hdu = fits.PrimaryHDU(data, header=header)
+        add_calibration_header(cal_hdu.header, names)
+        return cal_hdu
+
+    def __get_stack_key__(self, info, frame):
+        """
+        Returns the key of the live stack of an image. Every sequence has
+        its own stack, so a new sequence of the same target starts a new
+        stack.
+
+        :param info: the information of the image
+        :type info: Camera.meta.image_information.ImageInformation
+        :param frame: the future of the frame or None
+        :type frame: :class:`Camera.interface.image_handle.FrameFuture`
+        :returns:
+            the target, the filter, the image type and the sequence id or
+            None if the image isn't part of a sequence or there is no live
+            stacker
+        :rtype: tuple
+        """
+        if self.live_stacker is None or info is None or info.get_image_amount() < 2 or \
+                frame is None or frame.sequence_id is None:
+            return None
+        return (info.get_object_name(), info.get_filter_name(), info.get_iraf_type(),
+                frame.sequence_id)
+
+    def __stack_image__(self, save_path, products):
+        """
+        Adds a saved image to its live stack. The calibrated image is used,
+        if there is one. Errors are available by
+        :meth:`Camera.analysis.stacking.LiveStacker.get_error_message`.
+
+        :param save_path: the path of the image
+        :type save_path: str
+        :param products: the products of the image, see :meth:`__save_image__`
+        :type products: dict
+        """
+        if products['stack_key'] is None:
+            return
+        if products['calibrated'] is not None:
+            hdu = products['calibrated']
+        else:
+            hdu = products['stack_hdu']
+        try:
+            self.live_stacker.add(products['stack_key'], hdu.data, save_path,
+                                  hdu.header)
+        except Exception as e:
+            self.live_stacker.__create_error_message__(
+                'Can\'t stack {}: {}'.format(save_path, e))
+
+    def __create_log_entry__(self, info):
+        """
+        Collects the information of the image for the image log.
+
+        :param info: the information of the image
+        :type info: Camera.meta.image_information.ImageInformation
+        :returns: the arguments for :meth:`ImageLog.add` without the readout time and path
+        :rtype: list
+        """
+        return [info.get_utc(),
+                info.get_observer(), info.get_object_name(),
+                info.get_ra_telescope(), info.get_dec_telescope(),
+                info.get_ra_target(), info.get_dec_target(),
+                info.get_image_type(), str(info.get_exposure_time()),
+                info.get_filter_name(),
+                info.get_subframe_string(),
+                info.get_binning_string(),
+                str(self.camera_status.get_temperature()),
+                str(info.get_temperature_dome()),
+                str(info.get_temperature_outside()),
+                str(info.get_humidity_dome()),
+                str(info.get_humidity_outside())]
+
+    def __image_written__(self, save_path, products, frame):
+        """
+        Finishes an image after it was written to the disk.
+
+        :param save_path: the path of the image
+        :type save_path: str
+        :param products:
+            the information of the image for the later steps, which are
+            collected in :meth:`__save_image__`
+        :type products: dict
+        :param frame: the future of the frame or None
+        :type frame: :class:`Camera.interface.image_handle.FrameFuture`
+        """
+        if frame is not None:
+            frame.mark('written')
+        self.frame_buffer.set_path(products['buffer_id'], save_path)
+        if products['previews'] is not None:
+            save_previews(products['previews'], save_path)
+        if products['calibrated'] is not None:
+            write_image(products['calibrated'],
+                        self.calibration_stage.get_path(save_path))
+        if frame is not None:
+            frame.mark('products_saved')
+        add_wcs(save_path, self.coordinate_signal, self.wcs_pool,
+                products['wcs_key'])
+        if frame is not None:
+            frame.mark('wcs_enqueued')
 
         # add a line to image log
-        self.image_log.add(info.get_utc(),
-                           info.get_observer(), info.get_object_name(),
-                           info.get_ra_telescope(), info.get_dec_telescope(),
-                           info.get_ra_target(), info.get_dec_target(),
-                           info.get_image_type(), str(info.get_exposure_time()),
-                           info.get_filter_name(),
-                           info.get_subframe_string(),
-                           info.get_binning_string(),
-                           str(self.camera_status.get_temperature()),
-                           str(info.get_temperature_dome()),
-                           str(info.get_temperature_outside()),
-                           str(info.get_humidity_dome()),
-                           str(info.get_humidity_outside()),
-                           time.time() - self.readout_time, save_path)
+        timing = None
+        if frame is not None:
+            timing = frame.get_spans()
+        self.image_log.add(*(products['log_entry'] +
+                             [time.time() - products['readout_time'], save_path]),
+                           statistics=products['statistics'], timing=timing)
+        if frame is not None:
+            frame.mark('logged')
+        self.__stack_image__(save_path, products)
         self.__image_done__(save_path)
-        self.image_left -= 1
-        self.current_imageing = False
+        self.__count__('exposures_completed')
+        if frame is not None and not frame.cancelled():
+            frame.set_time('saved')
+            frame.set_result(save_path)
 
-    def __create_header__(self, header, info):
+    @staticmethod
+    def __frame_failed__(frame, error):
+        """
+        Sets the error to the future of the frame.
+
+        :param frame: the future of the frame or None
+        :type frame: :class:`Camera.interface.image_handle.FrameFuture`
+        :param error: the error
+        :type error: Exception
+        """
+        if frame is not None and not frame.done():
+            frame.set_exception(error)
+
+    @staticmethod
+    def __add_timing_header__(header, frame):
+        """
+        Adds the timing spans of the frame, which are finished before the
+        header is complete, as HIERARCH cards. The later spans are in the
+        image log.
+
+        :param header: the header of the image
+        :type header: :class:`astropy.io.fits.Header`
+        :param frame: the future of the frame
+        :type frame: :class:`Camera.interface.image_handle.FrameFuture`
+        """
+        for name, seconds in frame.get_spans():
+            header['HIERARCH TIMING {}'.format(name.upper())] = (
+                round(seconds, 6), '[s] duration of the {} span'.format(name))
+
+    def __create_header__(self, header, info, statistics=None):
         """
         Create the header for the image.
         Including object, observer, exposure time, image type, Filter name,
@@ -160,6 +666,10 @@ class Camera:
         :param header:
             Original header of the image
         :type header: :class:`astropy.io.Header`
+        :param statistics:
+            the statistics of the image, see
+            :func:`Camera.meta.image_statistics.compute_statistics`
+        :type statistics: dict
 
         :returns: Original header with the additional information.
         """
@@ -178,6 +688,11 @@ class Camera:
 
             header[head.bin_x] = (info.get_bin_x(), 'Binning factor in width')
             header[head.bin_y] = (info.get_bin_y(), 'Binning factor in height')
+            hardware, software = self.camera.exposure_binning
+            header['HWBINX'] = (hardware[0], 'Hardware binning factor in width')
+            header['HWBINY'] = (hardware[1], 'Hardware binning factor in height')
+            header['SWBINX'] = (software[0], 'Software binning factor in width')
+            header['SWBINY'] = (software[1], 'Software binning factor in height')
             header[head.subframe_size_x] = (info.get_x0(),
                                             'Subframe X position in binned pixels')
             header[head.subframe_size_y] = (info.get_y0(),
@@ -232,6 +747,9 @@ class Camera:
             header[head.aperature] = (300, 'Aperature diameter in mm')
             header[head.instrument] = ('TEST_30cm_MI', 'Instrument name')
 
+        if statistics is not None:
+            add_statistics_header(header, statistics)
+
         return header
 
     def take_image(self, image_information):
@@ -241,18 +759,28 @@ class Camera:
 
         :param image_information: Information of the image
         :type image_information: Camera.meta.image_information.ImageInformation
+        :returns:
+            a handle with one future per image, which is done after the image
+            is saved
+        :rtype: :class:`Camera.interface.image_handle.ImageHandle`
         """
 
         self.camera_status.reset_stopped()
         self.image_abort = False
         if image_information.get_image_amount() > 1:
             self.sequence = True
-        th = Thread(target=self.__take_image__, args=(image_information,))
+        handle = ImageHandle(image_information.get_image_amount())
+        self.image_handle = handle
+        th = Thread(target=self.__take_image__, args=(image_information, handle))
         th.start()
+        return handle
 
-    def __take_image__(self, image_information):
+    def __take_image__(self, image_information, handle):
         self.image_left = image_information.get_image_amount()
+        started = 0
         for i in range(image_information.get_image_amount()):
+            frame = handle.get_frame(i)
+            frame.mark('dequeued')
             image_information.update_date()
             # stops the next exposure if the last exposure was stopped
             # or aborted
@@ -266,20 +794,62 @@ class Camera:
                 if c % 20 == 0:
                     if self.camera_status.is_stopped():
                         break
+            frame.mark('ready')
             self.current_imageing = True
-            # sets the properties for the next exposure
-            self.set_image_properties(image_information)
-            while not self.filterwheel.is_ready():
-                time.sleep(0.1)
-            # start the actual exposure in the driver
-            exposure_time = image_information.get_exposure_time()
-            self.camera.start_exposure(exposure_time)
-            self.camera_status.start_exposure_time(exposure_time)
-            self.camera_status.set_image_information(image_information)
+            self.__prepare_exposure__(image_information, frame)
+            self.__start_exposure__(image_information, frame)
+            started += 1
             time.sleep(2)
 
+        # frames which weren't started because of a stop or an abort
+        handle.cancel(started)
         self.sequence = False
 
+    def __prepare_exposure__(self, image_information, frame=None):
+        """
+        Sets the properties of the next exposure and waits until the filter
+        wheel is ready.
+
+        :param image_information: Information of the image
+        :type image_information: Camera.meta.image_information.ImageInformation
+        :param frame: the future of the frame or None
+        :type frame: :class:`Camera.interface.image_handle.FrameFuture`
+        """
+        # sets the properties for the next exposure
+        self.set_image_properties(image_information)
+        if frame is not None:
+            frame.mark('properties_set')
+        while not self.filterwheel.is_ready():
+            time.sleep(0.1)
+        if frame is not None:
+            frame.mark('filter_ready')
+
+    def __start_exposure__(self, image_information, frame):
+        """
+        Starts the actual exposure in the driver.
+
+        :param image_information: Information of the image
+        :type image_information: Camera.meta.image_information.ImageInformation
+        :param frame: the future of the frame or None
+        :type frame: :class:`Camera.interface.image_handle.FrameFuture`
+        :returns: True if the exposure starts, else False
+        :rtype: bool
+        """
+        exposure_time = image_information.get_exposure_time()
+        self.__count__('exposures_started')
+        self.current_frame = frame
+        if frame is not None:
+            frame.set_time('exposure_start')
+            frame.mark('exposure_call')
+        started = self.camera.start_exposure(exposure_time)
+        if frame is not None:
+            frame.mark('exposure_started')
+        self.camera_status.start_exposure_time(exposure_time)
+        self.camera_status.set_image_information(image_information)
+        # the status loop sleeps longer without an exposure
+        self.poll_event.set()
+        return started
+
     def set_image_properties(self, img_info):
         """
         Sets the properties of the next image by the information of the
@@ -295,6 +865,79 @@ class Camera:
         # set the new filter to the filter wheel
         self.filterwheel.set_filter_by_name(img_info.get_filter_name())
 
+    def get_focus_metrics(self, img=None, **kwargs):
+        """
+        Measures the star sizes of a frame, see
+        :func:`Camera.analysis.focus.get_focus_metrics`.
+
+        :param img: the frame or None for the last image
+        :type img: numpy.ndarray
+        :param kwargs: the arguments of :func:`Camera.analysis.focus.measure_stars`
+        :returns: the focus metrics or None if there is no image
+        :rtype: dict
+        """
+        if img is None:
+            img = self.last_image
+        if img is None:
+            return None
+        return get_focus_metrics(img, **kwargs)
+
+    def start_stream(self, exposure_time, subframe=None, binning=None,
+                     filter_name=None, **kwargs):
+        """
+        Starts a video stream of short exposures with a fixed subframe,
+        binning and filter. The frames aren't saved, see
+        :class:`Camera.interface.video_stream.VideoStream`. Normal
+        exposures wait until the stream is stopped.
+
+        :param exposure_time: the exposure time of every frame in seconds
+        :type exposure_time: float
+        :param subframe: the subframe as (x0, y0, w, h) or None to keep it
+        :type subframe: tuple
+        :param binning: the binning as (x, y) or None to keep it
+        :type binning: tuple
+        :param filter_name: the name of the filter or None to keep it
+        :type filter_name: str
+        :param kwargs:
+            additional arguments of
+            :class:`Camera.interface.video_stream.VideoStream`
+        :returns: the stream
+        :rtype: :class:`Camera.interface.video_stream.VideoStream`
+        :raises RuntimeError: if the camera takes an image at the moment
+        """
+        if not self.is_camera_ready() or self.current_imageing or self.sequence:
+            raise RuntimeError('The camera is busy')
+        # blocks the normal exposures during the stream
+        self.current_imageing = True
+        try:
+            if binning is not None:
+                self.set_binning(*binning)
+            if subframe is not None:
+                self.set_subframe(*subframe)
+            if filter_name is not None:
+                self.filterwheel.set_filter_by_name(filter_name)
+            while not self.filterwheel.is_ready():
+                time.sleep(0.1)
+            stream = VideoStream(self, exposure_time, **kwargs)
+            # the stream is known before it starts, so a stream which ends
+            # directly releases the camera in __stream_done__
+            self.video_stream = stream
+            stream.start()
+        except Exception:
+            self.current_imageing = False
+            raise
+        return stream
+
+    def __stream_done__(self, stream):
+        """
+        Releases the camera for normal exposures after the end of a stream.
+
+        :param stream: the finished stream
+        :type stream: :class:`Camera.interface.video_stream.VideoStream`
+        """
+        if self.video_stream is stream:
+            self.current_imageing = False
+
     def get_properties(self):
         """
         Returns the current interface properties.
@@ -483,6 +1126,10 @@ class Camera:
         the thread of this class will end after the next run.
         """
         self.active = False
+        if self.health_monitor is not None:
+            self.health_monitor.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
         self.disconnect_camera()
         self.disconnect_filter_wheel()
 
@@ -503,6 +1150,26 @@ class Camera:
     def set_signal(self, signal_readout):
         pass
 
+    def add_image_saved_listener(self, listener):
+        """
+        Adds a listener which is called with the path of every saved image.
+        Unlike the signals, more than one listener can be registered.
+
+        :param listener: callable with the path as the only argument
+        :type listener: callable
+        """
+        self.image_saved_listeners.append(listener)
+
+    def remove_image_saved_listener(self, listener):
+        """
+        Removes a listener which was added with :meth:`add_image_saved_listener`.
+
+        :param listener: the listener to remove
+        :type listener: callable
+        """
+        if listener in self.image_saved_listeners:
+            self.image_saved_listeners.remove(listener)
+
     def __image_done__(self, path):
         """
         Calls the signal to say that a image is ready.
@@ -512,6 +1179,8 @@ class Camera:
         """
         if self.signal_image_saved is not None:
             self.signal_image_saved.update_label(path)
+        for listener in list(self.image_saved_listeners):
+            listener(path)
 
     def stop_exposure(self):
         """
@@ -520,6 +1189,7 @@ class Camera:
         if self.camera_status.get_status_id() == 2 and not self.camera_status.is_stopped():
             self.camera_status.stop_exposure()
             self.camera.stop_exposure()
+            self.poll_event.set()
 
     def abort_exposure(self):
         """
@@ -532,6 +1202,9 @@ class Camera:
             self.image_abort = True
             self.current_imageing = False
             self.sequence = False
+            if self.image_handle is not None:
+                self.image_handle.cancel()
+            self.current_frame = None
 
     def get_set_temperature(self):
         """
@@ -560,12 +1233,47 @@ class Camera:
         """
         self.camera.set_cooler(status)
 
-    def warm_up(self):
+    def warm_up(self, rate=2., target=None, **kwargs):
         """
-        Increase the temperature of the interface slowly.
+        Increase the temperature of the interface slowly in a background
+        thread.
+
+        :param rate: the ramp rate in °C per minute
+        :type rate: float
+        :param target:
+            the target temperature or None to warm up to the ambient
+            temperature
+        :type target: float
+        :returns: the controller of the ramp
+        :rtype: :class:`Camera.drivers.thermal_controller.ThermalController`
         """
-        th = Thread(target=self.camera.warm_up)
-        th.start()
+        return self.camera.warm_up(rate, target, **kwargs)
+
+    def cool_down(self, target, rate=2., **kwargs):
+        """
+        Decrease the temperature of the interface with a fixed rate in a
+        background thread. The ramp holds while the cooler runs at its limit.
+
+        :param target: the target temperature
+        :type target: float
+        :param rate: the ramp rate in °C per minute
+        :type rate: float
+        :returns: the controller of the ramp
+        :rtype: :class:`Camera.drivers.thermal_controller.ThermalController`
+        """
+        return self.camera.ramp_temperature(target, rate, **kwargs)
+
+    def get_thermal_status(self):
+        """
+        Returns the status of the last temperature ramp, see
+        :class:`Camera.drivers.thermal_controller.ThermalController`.
+
+        :returns: the status or None if there was no ramp
+        :rtype: dict
+        """
+        if self.camera.thermal_controller is None:
+            return None
+        return self.camera.thermal_controller.get_status()
 
     def set_temperature(self, temperature):
         """
@@ -574,34 +1282,156 @@ class Camera:
         self.camera.set_temperature(temperature)
 
 
-def add_wcs(path, coordinate_signal):
+WCS_POOL = None
+ASTROMETRY = None
+ASTROMETRY_LOADED = False
+# the search arguments, which the astrometry accepts, see __get_search_arguments__
+SEARCH_ARGUMENTS = None
+
+
+def get_astrometry():
+    """
+    Returns the astrometry class, which is imported at the first call,
+    because the import is slow.
+
+    :returns: the astrometry class or None if it isn't installed
+    """
+    global ASTROMETRY, ASTROMETRY_LOADED
+    if not ASTROMETRY_LOADED:
+        try:
+            from ImageProcessing.astrometry.coordinate_align import Astrometry
+            ASTROMETRY = Astrometry
+        except ImportError:
+            ASTROMETRY = None
+        ASTROMETRY_LOADED = True
+    return ASTROMETRY
+
+
+def get_wcs_pool():
     """
-    Starts a secondary process to generate the WCS for the image
+    Returns the default WCS pool, which is shared by all cameras of the process.
+
+    :returns: the default WCS pool
+    :rtype: :class:`Camera.interface.wcs_pool.WCSPool`
+    """
+    global WCS_POOL
+    if WCS_POOL is None:
+        WCS_POOL = WCSPool(__add_wcs__, cache=WCSCache())
+    return WCS_POOL
+
+
+def add_wcs(path, coordinate_signal, pool=None, key=None):
+    """
+    Queues the image in a pool of worker processes to generate the WCS for
+    the image
     :param path: The path to the image
     :type path: str
     :param coordinate_signal: Signal to send the offset back to the main process
-    :return:
+    :param pool: the WCS pool or None to use the default pool
+    :type pool: :class:`Camera.interface.wcs_pool.WCSPool`
+    :param key: the key for the solution cache, see :func:`get_wcs_key`
+    :type key: tuple
+    :return: True if the image was queued, else False
     """
-    process = Process(target=__add_wcs__, args=(path, coordinate_signal,))
-    process.start()
+    if get_astrometry() is None:
+        return False
+    if pool is None:
+        pool = get_wcs_pool()
+    return pool.submit(path, coordinate_signal, key)
 
 
-def __add_wcs__(path, coordinate_signal):
+def __add_wcs__(path, hint=None):
     """
-    Calculates and adds the WCS to the image
+    Calculates and adds the WCS to the image. It runs in a worker process
+    of the WCS pool.
     :param path: The path to the image
     :type path: str
-    :param coordinate_signal: Signal to send the offset back to the main process
+    :param hint: the previous solution of the WCS cache or None
+    :type hint: dict
     :return:
+        None if the WCS isn't solved, else a dict with the offset
+        [delta_ra, delta_dec] (None if the hint was reused, because the
+        offset was already sent), the WCS header cards, the quality (the
+        distance to the previous solution in arcsec or None) and if the
+        hint was reused
     """
-    if Astrometry is None:
-        return
-
-    astrometry = Astrometry(path)
+    if get_astrometry() is None:
+        return None
+
+    if hint is not None and hint['reuse']:
+        # the previous solution is good enough for the same pointing
+        from astropy.io import fits
+        with fits.open(path, mode='update') as hdul:
+            hdul[0].header.update(hint['wcs'])
+        return {'offset': None, 'wcs': hint['wcs'],
+                'quality': hint['quality'], 'reused': True}
+
+    astrometry = get_astrometry()(path)
     try:
-        astrometry.calibrate()
+        __calibrate__(astrometry, hint)
         delta_ra, delta_dec = astrometry.evaluate()
-        coordinate_signal.emit([delta_ra, delta_dec])
     except TypeError as e:
         print(e)
+        return None
+    wcs = __read_wcs__(path)
+    quality = None
+    if hint is not None:
+        quality = get_separation(wcs, hint['wcs'])
+    return {'offset': [delta_ra, delta_dec], 'wcs': wcs,
+            'quality': quality, 'reused': False}
+
+
+def __get_search_arguments__():
+    """
+    Returns the search arguments of a hint, which the calibrate method of
+    the astrometry class accepts. The signature is checked only once.
+    :return: the names of the accepted arguments
+    :rtype: tuple
+    """
+    global SEARCH_ARGUMENTS
+    if SEARCH_ARGUMENTS is None:
+        import inspect
+        try:
+            parameters = inspect.signature(get_astrometry().calibrate).parameters
+        except (TypeError, ValueError):
+            parameters = {}
+        names = ('ra', 'dec', 'radius', 'scale_low', 'scale_high')
+        if any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+            SEARCH_ARGUMENTS = names
+        else:
+            SEARCH_ARGUMENTS = tuple(n for n in names if n in parameters)
+    return SEARCH_ARGUMENTS
+
+
+def __calibrate__(astrometry, hint):
+    """
+    Solves the WCS, with a narrowed search if there is a hint and the
+    astrometry supports search arguments.
+    :param astrometry: the astrometry object of the image
+    :param hint: the previous solution of the WCS cache or None
+    :type hint: dict
+    """
+    search = {}
+    if hint is not None:
+        search = dict((name, value) for name, value in hint['search'].items()
+                      if name in __get_search_arguments__() and value is not None)
+    return astrometry.calibrate(**search)
 
+
+def __read_wcs__(path):
+    """
+    Reads the WCS header cards of a solved image.
+    :param path: The path to the image
+    :type path: str
+    :return: the WCS header cards or an empty dict
+    :rtype: dict
+    """
+    from astropy.io import fits
+    from astropy.wcs import WCS
+    try:
+        wcs = WCS(fits.getheader(path))
+    except (ValueError, KeyError):
+        return {}
+    if not wcs.has_celestial:
+        return {}
+    return dict(wcs.to_header())
@@ -0,0 +1,296 @@
+from threading import Thread, Barrier, BrokenBarrierError, Lock, Event
+from datetime import datetime
+import time
+
+from Camera.meta.image_log import ImageLog
+from Camera.meta.image_writer import ImageWriter
+from .camera import Camera
+from .image_handle import ImageHandle
+
+
+class CameraGroup:
+    """
+    The CameraGroup manages several camera/filter wheel pairs on one mount.
+    All cameras share one status thread, one image log and one image writer
+    instead of starting their own. Exposures of all cameras can be started
+    synchronized, the skew between the starts is measured for every frame.
+    """
+
+    def __init__(self, driver_names, signal=None, connect_timeout=None):
+        """
+        :param driver_names:
+            list with the camera and filter wheel driver names as tuples like
+            [('ASCOM.Camera1', 'ASCOM.FilterWheel1'), ...]
+        :type driver_names: list
+        :param signal: optional signal of the shared image log
+        :param connect_timeout:
+            the maximal time in seconds to wait for the connections, which
+            are created in parallel, or None to wait without a limit
+        :type connect_timeout: float
+        """
+        self.image_log = ImageLog(signal=signal)
+        self.writer = ImageWriter()
+        self.cameras = []
+        for camera_driver, filter_wheel_driver in driver_names:
+            self.cameras.append(Camera(camera_driver, filter_wheel_driver,
+                                       image_log=self.image_log,
+                                       writer=self.writer,
+                                       start_thread=False,
+                                       connect_mode='background'))
+        # all drivers connect at the same time
+        end = None if connect_timeout is None else time.time() + connect_timeout
+        for camera in self.cameras:
+            camera.wait_connected(None if end is None else max(end - time.time(), 0))
+        self.active = True
+        self.skews = []
+        self.skew_lock = Lock()
+        self.sequence = False
+        self.error_message = ''
+        # wakes the shared scheduler up after the start of the exposures
+        self.poll_event = Event()
+        self.th = Thread(target=self.run)
+        self.th.start()
+
+    def __len__(self):
+        return len(self.cameras)
+
+    def __getitem__(self, index):
+        return self.cameras[index]
+
+    def run(self):
+        """
+        Shared scheduler, it updates the status of all cameras. An error of
+        one camera doesn't stop the updates of the other cameras.
+        """
+        while self.active:
+            self.poll_event.clear()
+            for index, camera in enumerate(self.cameras):
+                try:
+                    camera.status_update()
+                except Exception as e:
+                    self.__create_error_message__(
+                        'Can\'t update the status of camera {}: {}'.format(index, e))
+            self.poll_event.wait(min(camera.get_poll_interval()
+                                     for camera in self.cameras))
+
+    def take_images(self, image_informations):
+        """
+        Starts synchronized exposures with all cameras. The n-th exposures of
+        all cameras are started together, this means a sequence goes on
+        after all cameras are ready for the next frame.
+
+        :param image_informations:
+            list with one :class:`Camera.meta.image_information.ImageInformation`
+            object per camera
+        :type image_informations: list
+        :returns: list with one image handle per camera
+        :rtype: list
+        """
+        if len(image_informations) != len(self.cameras):
+            raise ValueError('One image information per camera is needed')
+        handles = []
+        for camera, info in zip(self.cameras, image_informations):
+            camera.camera_status.reset_stopped()
+            camera.image_abort = False
+            camera.sequence = info.get_image_amount() > 1
+            camera.image_left = info.get_image_amount()
+            handle = ImageHandle(info.get_image_amount())
+            camera.image_handle = handle
+            handles.append(handle)
+        self.sequence = True
+        th = Thread(target=self.__take_images__,
+                    args=(image_informations, handles))
+        th.start()
+        return handles
+
+    def __take_images__(self, image_informations, handles):
+        amount = max(info.get_image_amount() for info in image_informations)
+        started = [0] * len(self.cameras)
+        for i in range(amount):
+            # cameras with a shorter sequence or a stop don't take part
+            members = [k for k, info in enumerate(image_informations)
+                       if i < info.get_image_amount() and
+                       not self.cameras[k].camera_status.is_stopped()]
+            if len(members) == 0:
+                break
+            for k in members:
+                camera = self.cameras[k]
+                while not camera.is_camera_ready() or camera.current_imageing:
+                    time.sleep(0.1)
+                    if camera.camera_status.is_stopped():
+                        break
+            members = [k for k in members
+                       if not self.cameras[k].camera_status.is_stopped()]
+            if len(members) == 0:
+                break
+
+            barrier = Barrier(len(members))
+            start_times = {}
+            threads = []
+            for k in members:
+                image_informations[k].update_date()
+                self.cameras[k].current_imageing = True
+                th = Thread(target=self.__start_synchronized__,
+                            args=(k, image_informations[k],
+                                  handles[k].get_frame(i), barrier, start_times))
+                th.start()
+                threads.append(th)
+            for th in threads:
+                th.join()
+            for k in start_times.keys():
+                started[k] += 1
+            self.__add_skew__(i, start_times)
+
+        for k, handle in enumerate(handles):
+            handle.cancel(started[k])
+            self.cameras[k].sequence = False
+        self.sequence = False
+
+    def __start_synchronized__(self, index, image_information, frame, barrier,
+                               start_times):
+        """
+        Prepares the exposure of one camera and starts it after all cameras
+        are prepared.
+
+        :param index: the index of the camera
+        :type index: int
+        :param image_information: Information of the image
+        :type image_information: Camera.meta.image_information.ImageInformation
+        :param frame: the future of the frame
+        :type frame: :class:`Camera.interface.image_handle.FrameFuture`
+        :param barrier: the barrier of all cameras of this frame
+        :type barrier: threading.Barrier
+        :param start_times:
+            dict for the call and the return times of StartExposure of the
+            cameras
+        :type start_times: dict
+        """
+        camera = self.cameras[index]
+        frame.mark('dequeued')
+        frame.mark('ready')
+        try:
+            camera.__prepare_exposure__(image_information, frame)
+        except Exception:
+            # release the other cameras
+            barrier.abort()
+            camera.current_imageing = False
+            frame.cancel()
+            raise
+        try:
+            barrier.wait(60)
+        except BrokenBarrierError:
+            camera.current_imageing = False
+            frame.cancel()
+            return
+        camera.__start_exposure__(image_information, frame)
+        # the call of StartExposure and its return, the exposure is started
+        # at the latest after the return
+        start_times[index] = (frame.marks['exposure_call'],
+                              frame.marks['exposure_started'])
+        self.poll_event.set()
+
+    def __add_skew__(self, frame_index, start_times):
+        """
+        Stores the skew of the exposure starts of one frame. The skew is
+        measured with the returns of StartExposure, the skew of the calls
+        is stored additionally.
+
+        :param frame_index: the index of the frame in the sequence
+        :type frame_index: int
+        :param start_times: the call and the return times of the cameras
+        :type start_times: dict
+        """
+        if len(start_times) == 0:
+            return
+        calls = dict((k, t[0]) for k, t in start_times.items())
+        starts = dict((k, t[1]) for k, t in start_times.items())
+        first = min(starts.values())
+        first_call = min(calls.values())
+        skew = {'frame': frame_index,
+                'skew': max(starts.values()) - first,
+                'offsets': dict((k, t - first) for k, t in starts.items()),
+                'call_skew': max(calls.values()) - first_call}
+        self.skew_lock.acquire()
+        self.skews.append(skew)
+        self.skew_lock.release()
+
+    def get_skews(self):
+        """
+        Returns the measured skews of the synchronized exposure starts.
+
+        :returns:
+            list with a dict per frame including the frame index, the skew in
+            seconds and the offsets of the single cameras to the first start
+            (both after the return of StartExposure) and the 'call_skew' of
+            the calls of StartExposure
+        :rtype: list
+        """
+        self.skew_lock.acquire()
+        skews = list(self.skews)
+        self.skew_lock.release()
+        return skews
+
+    def get_max_skew(self):
+        """
+        Returns the largest measured skew.
+
+        :returns: the largest skew in seconds or 0 if there is no measurement
+        :rtype: float
+        """
+        skews = self.get_skews()
+        if len(skews) == 0:
+            return 0
+        return max(skew['skew'] for skew in skews)
+
+    def is_ready(self):
+        """
+        Asks if all cameras are ready and there is no synchronized sequence.
+
+        :returns: True if all cameras are ready, else False
+        :rtype: bool
+        """
+        return not self.sequence and all(camera.is_camera_ready2()
+                                          for camera in self.cameras)
+
+    def abort_exposure(self):
+        """
+        Aborts the exposures of all cameras.
+        """
+        for camera in self.cameras:
+            camera.abort_exposure()
+
+    def stop_exposure(self):
+        """
+        Stops the exposures of all cameras.
+        """
+        for camera in self.cameras:
+            camera.stop_exposure()
+
+    def disconnect(self):
+        """
+        Disconnects all cameras and stops the shared threads.
+        """
+        self.active = False
+        for camera in self.cameras:
+            camera.disconnect()
+        self.writer.close()
+
+    def __create_error_message__(self, message):
+        """
+        Stores the message of the last error with the time, it's available
+        by :meth:`get_error_message`.
+
+        :param message: The message of the error
+        :type message: str
+        """
+        self.error_message = message + '\nTime: ' + \
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def get_error_message(self):
+        """
+        Returns the last error message.
+
+        :returns: last error message
+        :rtype: str
+        """
+        return self.error_message
@@ -170,6 +170,18 @@ class CameraInformation(DriverLog):
         """
         return self.temperature
 
+    def clear_settings(self):
+        """
+        Forgets the binning and the temperature, for example after a
+        reconnection, so they are written again at the next set. The
+        subframe is kept, because it depends on the binning and is written
+        with force.
+        """
+        self.bin_x = None
+        self.bin_y = None
+        self.temperature = 99
+        self.set_new_update('settings cleared')
+
 
 class Process(Thread):
     """
@@ -178,7 +190,16 @@ class Process(Thread):
     information like left time or the percent of the process.
     """
 
-    def __init__(self, ctime, signal=None):
+    def __init__(self, ctime, signal=None, threaded=True):
+        """
+        :param ctime: the complete time of the process in seconds
+        :type ctime: float
+        :param signal: optional signal to inform about the start and the end
+        :param threaded:
+            True to update the times in a own thread, False to calculate
+            the times only if they are requested (no thread is started)
+        :type threaded: bool
+        """
         # ini Thread super-class
         Thread.__init__(self)
         # store the complete time
@@ -193,8 +214,27 @@ class Process(Thread):
         self.lock = Lock()
 
         self.signal = signal
-        # start the thread
-        self.start()
+        self.threaded = threaded
+        if threaded:
+            # start the thread
+            self.start()
+        elif self.signal is not None:
+            self.signal.update_label(2)
+
+    def __update__(self):
+        """
+        Calculates the times of a not threaded process. The lock must be
+        acquired before.
+        """
+        if self.threaded or self.time_left <= 0:
+            return
+        self.time_process = time.time() - self.start_time
+        self.time_left = self.ctime - self.time_process
+        if self.time_left <= 0:
+            self.time_process = self.ctime
+            self.time_left = 0
+            if self.signal is not None:
+                self.signal.update_label(0)
 
     def stop(self):
         """
@@ -246,6 +286,7 @@ class Process(Thread):
         try:
             # lock the interactions
             self.lock.acquire()
+            self.__update__()
             # store the left time in local variable
             time_left = self.time_left
             # release the lock
@@ -264,6 +305,7 @@ class Process(Thread):
         """
         # lock the interactions
         self.lock.acquire()
+        self.__update__()
         # store the time in a local variable
         time_process = self.time_process
         # release the lock
@@ -280,6 +322,7 @@ class Process(Thread):
         """
         # lock interactions
         self.lock.acquire()
+        self.__update__()
         # store the left time in a local variable
         time_left = self.time_left
         # calculate the percent of the left time
@@ -316,14 +359,58 @@ class CameraStatus:
     communicate with the interface every time.
     """
 
-    def __init__(self):
+    def __init__(self, threaded=True):
+        """
+        :param threaded:
+            True if the exposure and readout processes should run in their
+            own threads, False to calculate their times on request
+        :type threaded: bool
+        """
         self.status_labels = ['ready', 'preparing', 'exposure', 'readout',
                               'disconnect']
+        self.threaded = threaded
         self.header = Header()
         self.lock = Lock()
+        self.status_listeners = []
         # self.signal = LabelSignalInt()
         # self.signal.labelUpdated.connect(self.__exposure_done__)
 
+    def add_status_listener(self, listener):
+        """
+        Adds a listener which is called after every change of the status id.
+        The listener is called with the old and the new status label from the
+        thread which changed the status, so it must return fast.
+
+        :param listener: callable with the arguments (old_label, new_label)
+        :type listener: callable
+        """
+        self.status_listeners.append(listener)
+
+    def remove_status_listener(self, listener):
+        """
+        Removes a listener which was added with :meth:`add_status_listener`.
+
+        :param listener: the listener to remove
+        :type listener: callable
+        """
+        if listener in self.status_listeners:
+            self.status_listeners.remove(listener)
+
+    def __set_status_id__(self, status_id):
+        """
+        Sets a new status id and informs the status listeners if the status
+        has changed.
+
+        :param status_id: the new status id
+        :type status_id: int
+        """
+        old_status_id = self.status_id
+        self.status_id = status_id
+        if old_status_id != status_id:
+            for listener in list(self.status_listeners):
+                listener(self.status_labels[old_status_id],
+                         self.status_labels[status_id])
+
     def get_target_name(self):
         """
         Returns the current target name.
@@ -405,22 +492,23 @@ class CameraStatus:
         """
         # lock the interactions
         self.lock.acquire()
-        # set the status to exposure (status id=2)
-        self.status_id = 2
         # self.signal.update_label(0)
         # start the time process for the exposure
-        self.exposure_process = Process(exposure_time)
+        self.exposure_process = Process(exposure_time, threaded=self.threaded)
         # set the exposure key to true (can replace by the status id)
         self.exposure = True
         # release the lock
         self.lock.release()
+        # set the status to exposure (status id=2)
+        self.__set_status_id__(2)
 
     def start_readout(self, readout_time):
         self.lock.acquire()
-        self.status_id = 3
-        self.readout_process = Process(readout_time, self.signal)
+        self.readout_process = Process(readout_time, self.signal,
+                                       threaded=self.threaded)
         self.readout = True
         self.lock.release()
+        self.__set_status_id__(3)
 
     def __exposure_done__(self, value):
         pass
@@ -511,7 +599,7 @@ class CameraStatus:
         """
         self.exposure = False
         self.readout = False
-        self.status_id = 0
+        self.__set_status_id__(0)
 
     def stop_exposure(self):
         """
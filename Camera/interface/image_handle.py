@@ -0,0 +1,215 @@
+from concurrent.futures import Future
+from threading import Lock
+import itertools
+import time
+
+
+# the spans of a frame with the names of their start and end marks in the
+# order of the life cycle of the frame
+FRAME_SPANS = [('ready_wait', 'dequeued', 'ready'),
+               ('properties', 'ready', 'properties_set'),
+               ('filter_move', 'properties_set', 'filter_ready'),
+               ('sync_wait', 'filter_ready', 'exposure_call'),
+               ('start_exposure', 'exposure_call', 'exposure_started'),
+               ('exposure', 'exposure_started', 'image_ready'),
+               ('transfer', 'image_ready', 'transfer_end'),
+               ('save_wait', 'transfer_end', 'save_start'),
+               ('conversion', 'save_start', 'converted'),
+               ('header', 'converted', 'header_built'),
+               ('processing', 'header_built', 'processed'),
+               ('write', 'processed', 'written'),
+               ('products', 'written', 'products_saved'),
+               ('wcs_enqueue', 'products_saved', 'wcs_enqueued'),
+               ('log', 'wcs_enqueued', 'logged')]
+
+
+class FrameFuture(Future):
+    """
+    The FrameFuture is the future of a single frame of an exposure request.
+    The result of the future is the path of the saved image. Additionally
+    it collects the times of the different steps of the frame and monotonic
+    marks for the timing spans, see :data:`FRAME_SPANS`.
+    """
+
+    def __init__(self, index, sequence_id=None):
+        """
+        :param index: the index of the frame in the sequence
+        :type index: int
+        :param sequence_id: the id of the request of the frame or None
+        :type sequence_id: int
+        """
+        Future.__init__(self)
+        self.index = index
+        self.sequence_id = sequence_id
+        self.times = {}
+        self.marks = {}
+
+    def set_time(self, name, value=None):
+        """
+        Stores the time of a step of the frame.
+
+        :param name: name of the step like 'exposure_start'
+        :type name: str
+        :param value: the time in seconds or None for now
+        :type value: float
+        """
+        if value is None:
+            value = time.time()
+        self.times[name] = value
+
+    def mark(self, name, value=None):
+        """
+        Stores a monotonic mark of the life cycle of the frame.
+
+        :param name: name of the mark, see :data:`FRAME_SPANS`
+        :type name: str
+        :param value: the time of :func:`time.perf_counter` or None for now
+        :type value: float
+        """
+        if value is None:
+            value = time.perf_counter()
+        self.marks[name] = value
+
+    def get_spans(self):
+        """
+        Returns the durations of all spans, which have both marks.
+
+        :returns: the span names and durations in seconds in life cycle order
+        :rtype: list
+        """
+        marks = dict(self.marks)
+        return [(name, marks[end] - marks[start]) for name, start, end in FRAME_SPANS
+                if start in marks and end in marks]
+
+    def get_timing(self):
+        """
+        Returns the timing breakdown of the frame. It includes the times of
+        the single steps and the durations of the exposure, the readout and
+        the saving if the corresponding steps are available.
+
+        :returns: the times and the durations in seconds
+        :rtype: dict
+        """
+        timing = dict(self.times)
+        durations = [('exposure', 'exposure_start', 'readout_start'),
+                     ('readout', 'readout_start', 'image_ready'),
+                     ('save', 'image_ready', 'saved'),
+                     ('total', 'exposure_start', 'saved')]
+        for name, start, end in durations:
+            if start in self.times and end in self.times:
+                timing[name] = self.times[end] - self.times[start]
+        timing['spans'] = dict(self.get_spans())
+        return timing
+
+
+class ImageHandle:
+    """
+    The ImageHandle is returned by :meth:`Camera.take_image`. It contains one
+    :class:`FrameFuture` per image of the request, so scripts can wait for
+    single frames or the complete request without polling the camera.
+    Every request gets a new sequence id.
+    """
+    sequence_ids = itertools.count(1)
+
+    def __init__(self, amount):
+        """
+        :param amount: the number of images of the request
+        :type amount: int
+        """
+        self.sequence_id = next(ImageHandle.sequence_ids)
+        self.frames = [FrameFuture(i, self.sequence_id) for i in range(amount)]
+        self.future = Future()
+        self.lock = Lock()
+        self.frames_left = amount
+        for frame in self.frames:
+            frame.add_done_callback(self.__frame_done__)
+        if amount == 0:
+            self.future.set_result([])
+
+    def __frame_done__(self, frame):
+        """
+        Callback of the frames. After the last frame the future of the complete
+        request is set with the paths of all saved frames.
+
+        :param frame: the finished frame
+        :type frame: :class:`FrameFuture`
+        """
+        self.lock.acquire()
+        self.frames_left -= 1
+        last = self.frames_left == 0
+        self.lock.release()
+        if last:
+            paths = [f.result() for f in self.frames
+                     if not f.cancelled() and f.exception() is None]
+            self.future.set_result(paths)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get_frame(self, index):
+        """
+        Returns the future of a single frame.
+
+        :param index: the index of the frame
+        :type index: int
+        :returns: the future of the frame
+        :rtype: :class:`FrameFuture`
+        """
+        return self.frames[index]
+
+    def result(self, timeout=None):
+        """
+        Waits until the request is done.
+
+        :param timeout: the maximal time to wait in seconds or None
+        :type timeout: float
+        :returns:
+            the path of the image for a single image, or a list with the paths
+            of all saved images for a sequence
+        :rtype: str, list
+        :raises concurrent.futures.TimeoutError: if the timeout is reached
+        :raises concurrent.futures.CancelledError:
+            if a single image was aborted
+        """
+        if len(self.frames) == 1:
+            return self.frames[0].result(timeout)
+        return self.future.result(timeout)
+
+    def done(self):
+        """
+        Asks if all frames of the request are done.
+
+        :returns: True if the request is done, else False
+        :rtype: bool
+        """
+        return self.future.done()
+
+    def add_done_callback(self, callback):
+        """
+        Adds a callback which is called with this handle after all frames are
+        done. If the request is already done, the callback is called directly.
+
+        :param callback: callable with the handle as the only argument
+        :type callback: callable
+        """
+        self.future.add_done_callback(lambda future: callback(self))
+
+    def cancel(self, first=0):
+        """
+        Cancels all frames which aren't done yet.
+
+        :param first: the index of the first frame to cancel
+        :type first: int
+        """
+        for frame in self.frames[first:]:
+            frame.cancel()
+
+    def get_timing(self):
+        """
+        Returns the timing breakdown of all frames.
+
+        :returns: list with the timing of every frame
+        :rtype: list
+        """
+        return [frame.get_timing() for frame in self.frames]
+
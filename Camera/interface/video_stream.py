@@ -0,0 +1,198 @@
+from collections import deque
+from threading import Thread, Event, Lock
+import numpy as np
+import time
+
+
+class VideoStream(Thread):
+    """
+    The VideoStream takes short exposures of a fixed subframe back to back
+    for focusing or seeing measurements. The frames aren't written, logged
+    or solved, they are delivered into a bounded queue. If the consumer is
+    too slow, the oldest frames are dropped and counted. Optionally all
+    frames are spooled into one memory mapped cube.
+    The stream is started by :meth:`Camera.start_stream`.
+    """
+
+    def __init__(self, camera, exposure_time, max_frames=None, queue_size=8,
+                 spool_path=None, spool_frames=1000, poll=0.005):
+        """
+        :param camera: the camera, which is prepared by :meth:`Camera.start_stream`
+        :type camera: :class:`Camera.interface.camera.Camera`
+        :param exposure_time: the exposure time of every frame in seconds
+        :type exposure_time: float
+        :param max_frames: the number of frames or None to run until the stop
+        :type max_frames: int
+        :param queue_size: the maximal number of frames in the queue
+        :type queue_size: int
+        :param spool_path: the path of the .npy cube or None
+        :type spool_path: str
+        :param spool_frames: the number of frames of the cube
+        :type spool_frames: int
+        :param poll: the time between two ImageReady checks in seconds
+        :type poll: float
+        """
+        Thread.__init__(self)
+        self.daemon = True
+        self.camera = camera
+        self.exposure_time = exposure_time
+        self.max_frames = max_frames
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.lock = Lock()
+        self.frame_event = Event()
+        self.stop_event = Event()
+        self.done_event = Event()
+
+        self.spool_path = spool_path
+        self.spool_frames = spool_frames
+        self.spool = None
+        self.spool_times = np.full(spool_frames if spool_path is not None else 0, np.nan)
+        self.poll = poll
+
+        self.frames = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.spool_dropped = 0
+        self.start_time = None
+        self.error = None
+
+    def run(self):
+        driver = self.camera.camera
+        self.start_time = time.time()
+        try:
+            while not self.stop_event.is_set():
+                if self.max_frames is not None and self.frames >= self.max_frames:
+                    break
+                frame_time = time.time()
+                if not driver.start_exposure(self.exposure_time):
+                    raise RuntimeError(driver.get_error_message())
+                img = driver.read_frame(self.poll, self.exposure_time + 60)
+                if img is None:
+                    raise RuntimeError('The frame {} is not readable'.format(self.frames))
+                self.__add__(img, frame_time)
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.spool is not None:
+                self.spool.flush()
+                np.save(self.__get_times_path__(), self.spool_times[:self.spooled])
+            self.done_event.set()
+            self.frame_event.set()
+            self.camera.__stream_done__(self)
+
+    def __add__(self, img, frame_time):
+        """
+        Adds a new frame to the queue and to the cube.
+
+        :param img: the frame
+        :type img: numpy.ndarray
+        :param frame_time: the unix time of the exposure start
+        :type frame_time: float
+        """
+        if self.spool_path is not None:
+            if self.spool is None:
+                self.spool = np.lib.format.open_memmap(
+                    self.spool_path, mode='w+', dtype=img.dtype,
+                    shape=(self.spool_frames,) + img.shape)
+            if self.spooled < self.spool_frames:
+                self.spool[self.spooled] = img
+                self.spool_times[self.spooled] = frame_time
+                self.spooled += 1
+            else:
+                self.spool_dropped += 1
+        self.lock.acquire()
+        self.queue.append({'index': self.frames, 'time': frame_time,
+                           'exposure_time': self.exposure_time, 'image': img})
+        self.frames += 1
+        while len(self.queue) > self.queue_size:
+            self.queue.popleft()
+            self.dropped += 1
+        self.lock.release()
+        self.frame_event.set()
+
+    def __get_times_path__(self):
+        """
+        Returns the path of the start times of the spooled frames.
+
+        :returns: the path next to the cube
+        :rtype: str
+        """
+        if self.spool_path.endswith('.npy'):
+            return self.spool_path[:-4] + '_times.npy'
+        return self.spool_path + '_times.npy'
+
+    def get_frame(self, timeout=None):
+        """
+        Returns the oldest frame of the queue.
+
+        :param timeout: the maximal waiting time in seconds or None
+        :type timeout: float
+        :returns:
+            dict with 'index', 'time', 'exposure_time' and 'image' or None if
+            there was no frame in the time or the stream is finished
+        :rtype: dict
+        """
+        end = None if timeout is None else time.time() + timeout
+        while True:
+            self.lock.acquire()
+            if len(self.queue) > 0:
+                frame = self.queue.popleft()
+                self.lock.release()
+                return frame
+            self.frame_event.clear()
+            self.lock.release()
+            if self.done_event.is_set():
+                return None
+            wait = None if end is None else end - time.time()
+            if wait is not None and wait <= 0:
+                return None
+            self.frame_event.wait(wait)
+
+    def __iter__(self):
+        """
+        Yields the frames until the stream is finished.
+        """
+        while True:
+            frame = self.get_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def get_metrics(self):
+        """
+        Returns the counters of the stream.
+
+        :returns:
+            dict with 'frames', 'dropped', 'queued', 'spooled',
+            'spool_dropped' and the 'cadence' in frames per second
+        :rtype: dict
+        """
+        self.lock.acquire()
+        metrics = {'frames': self.frames, 'dropped': self.dropped,
+                   'queued': len(self.queue), 'spooled': self.spooled,
+                   'spool_dropped': self.spool_dropped, 'cadence': 0.}
+        self.lock.release()
+        if self.start_time is not None and self.frames > 0:
+            metrics['cadence'] = self.frames / (time.time() - self.start_time)
+        return metrics
+
+    def is_running(self):
+        """
+        Asks if the stream is still running.
+
+        :returns: True if the stream is running, else False
+        :rtype: bool
+        """
+        return not self.done_event.is_set()
+
+    def stop(self, wait=True):
+        """
+        Stops the stream after the current frame.
+
+        :param wait: True to wait until the last frame is read
+        :type wait: bool
+        """
+        self.stop_event.set()
+        if wait:
+            self.done_event.wait()
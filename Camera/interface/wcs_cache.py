@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from threading import Lock
+import math
+import time
+
+
+def get_wcs_key(info):
+    """
+    Creates the cache key of an image. Images with the same key share the
+    pointing of the telescope, the binning and the subframe.
+
+    :param info: the information of the image
+    :type info: Camera.meta.image_information.ImageInformation
+    :returns: the cache key
+    :rtype: tuple
+    """
+    return (str(info.get_ra_telescope()), str(info.get_dec_telescope()),
+            info.get_binning_string(), info.get_subframe_string())
+
+
+def get_pixel_scale(wcs_cards):
+    """
+    Calculates the pixel scale of a WCS solution.
+
+    :param wcs_cards: the WCS header cards
+    :type wcs_cards: dict
+    :returns: the pixel scale in arcsec per pixel or None
+    :rtype: float
+    """
+    if 'CD1_1' in wcs_cards:
+        cd11 = wcs_cards.get('CD1_1', 0.)
+        cd21 = wcs_cards.get('CD2_1', 0.)
+    elif 'CDELT1' in wcs_cards:
+        cdelt = wcs_cards['CDELT1']
+        cd11 = cdelt * wcs_cards.get('PC1_1', 1.)
+        cd21 = cdelt * wcs_cards.get('PC2_1', 0.)
+    else:
+        return None
+    return (cd11 ** 2 + cd21 ** 2) ** 0.5 * 3600.
+
+
+def get_separation(wcs_cards, other_cards):
+    """
+    Calculates the distance between the reference points of two WCS
+    solutions.
+
+    :param wcs_cards: the WCS header cards
+    :type wcs_cards: dict
+    :param other_cards: the WCS header cards of the other solution
+    :type other_cards: dict
+    :returns: the distance in arcsec or None if a solution is incomplete
+    :rtype: float
+    """
+    try:
+        ra1, dec1 = math.radians(wcs_cards['CRVAL1']), math.radians(wcs_cards['CRVAL2'])
+        ra2, dec2 = math.radians(other_cards['CRVAL1']), math.radians(other_cards['CRVAL2'])
+    except (KeyError, TypeError):
+        return None
+    # haversine formula, which is stable for small distances
+    a = (math.sin((dec2 - dec1) / 2) ** 2 +
+         math.cos(dec1) * math.cos(dec2) * math.sin((ra2 - ra1) / 2) ** 2)
+    return math.degrees(2 * math.asin(min(math.sqrt(a), 1.))) * 3600.
+
+
+class WCSCache:
+    """
+    The WCSCache stores the last WCS solution per pointing, binning and
+    subframe. The solution is used as a hint for the next image with the
+    same key to narrow the search of the plate solver. The quality of a
+    solution is its distance to the previous solution of the same key, if
+    it is small enough, the pointing is stable and the solution is reused
+    without a new solution.
+    """
+
+    def __init__(self, max_entries=100, max_age=3600., search_radius=1.,
+                 scale_tolerance=0.05, reuse_quality=None, reuse_age=300.):
+        """
+        :param max_entries: the maximal number of stored solutions
+        :type max_entries: int
+        :param max_age: the maximal age of a solution for a hint in seconds
+        :type max_age: float
+        :param search_radius: the search radius around a hint in degree
+        :type search_radius: float
+        :param scale_tolerance: the relative tolerance of the pixel scale
+        :type scale_tolerance: float
+        :param reuse_quality:
+            the maximal distance in arcsec between a solution and the
+            previous solution of the same key to reuse it without solving,
+            or None to never reuse a solution
+        :type reuse_quality: float
+        :param reuse_age: the maximal age of a reused solution in seconds
+        :type reuse_age: float
+        """
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.search_radius = search_radius
+        self.scale_tolerance = scale_tolerance
+        self.reuse_quality = reuse_quality
+        self.reuse_age = reuse_age
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reuses = 0
+
+    def store(self, key, solution):
+        """
+        Stores a new solution.
+
+        :param key: the cache key, see :func:`get_wcs_key`
+        :type key: tuple
+        :param solution:
+            the solution with the keys 'offset', 'wcs' (dict with the WCS
+            header cards) and 'quality' (the distance to the previous
+            solution in arcsec or None)
+        :type solution: dict
+        """
+        if key is None or not solution.get('wcs'):
+            return
+        entry = dict(solution)
+        entry['time'] = time.time()
+        self.lock.acquire()
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.lock.release()
+
+    def get_hint(self, key):
+        """
+        Returns the hint for the next solution with this key.
+
+        :param key: the cache key, see :func:`get_wcs_key`
+        :type key: tuple
+        :returns:
+            None if there is no usable solution, else a dict with the search
+            parameters ('search'), the previous solution and 'reuse' which is
+            True if the solution can be reused without solving
+        :rtype: dict
+        """
+        self.lock.acquire()
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry['time'] > self.max_age:
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            self.lock.release()
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        age = time.time() - entry['time']
+        reuse = (self.reuse_quality is not None and
+                 entry.get('quality') is not None and
+                 entry['quality'] <= self.reuse_quality and
+                 age <= self.reuse_age)
+        if reuse:
+            self.reuses += 1
+        self.lock.release()
+
+        wcs = entry['wcs']
+        search = {'ra': wcs.get('CRVAL1'), 'dec': wcs.get('CRVAL2'),
+                  'radius': self.search_radius}
+        scale = get_pixel_scale(wcs)
+        if scale is not None:
+            search['scale_low'] = scale * (1 - self.scale_tolerance)
+            search['scale_high'] = scale * (1 + self.scale_tolerance)
+        return {'search': search, 'wcs': wcs, 'offset': entry.get('offset'),
+                'quality': entry.get('quality'), 'reuse': reuse}
+
+    def get_metrics(self):
+        """
+        Returns the usage of the cache.
+
+        :returns: number of entries, hits, misses and reuses
+        :rtype: dict
+        """
+        return {'entries': len(self.entries), 'hits': self.hits,
+                'misses': self.misses, 'reuses': self.reuses}
@@ -0,0 +1,309 @@
+from threading import Thread, Condition, RLock
+from collections import deque
+from datetime import datetime
+import time
+
+
+class WCSJob:
+    """
+    Stores the information of one WCS request.
+    """
+
+    def __init__(self, job_id, path, signal, key=None, hint=None):
+        """
+        :param job_id: the running number of the job
+        :type job_id: int
+        :param path: the path to the image
+        :type path: str
+        :param signal: signal to send the result back or None
+        :param key: the key of the WCS cache or None
+        :type key: tuple
+        :param hint: the hint of the WCS cache or None
+        :type hint: dict
+        """
+        self.job_id = job_id
+        self.path = path
+        self.signal = signal
+        self.key = key
+        self.hint = hint
+        self.queue_time = time.time()
+        self.start_time = 0
+
+
+def __timed_call__(function, path, hint):
+    """
+    Calls the function in the worker process and measures the time.
+
+    :param function: the function to call with the path and the hint
+    :type function: callable
+    :param path: the path to the image
+    :type path: str
+    :param hint: the hint of the WCS cache or None
+    :type hint: dict
+    :returns: the result of the function and the needed time in seconds
+    :rtype: tuple
+    """
+    start = time.time()
+    result = function(path, hint)
+    return result, time.time() - start
+
+
+class WCSPool:
+    """
+    The WCSPool solves the WCS of the images in a persistent pool of worker
+    processes with a bounded queue. If the pool falls behind, the oldest
+    waiting image is dropped ('drop_oldest') or the new image is skipped
+    ('skip'). The offsets are sent back with the signal of the request in
+    the same order as the images were submitted.
+    With a :class:`Camera.interface.wcs_cache.WCSCache` the previous solution
+    of the same pointing is given to the workers as a hint.
+    """
+
+    def __init__(self, function, processes=1, max_queue=10,
+                 policy='drop_oldest', cache=None):
+        """
+        :param function:
+            module level function which solves the WCS of the image with the
+            path and the cache hint (or None) as arguments. It returns None
+            or a dict with the 'offset' (None if nothing is sent), the 'wcs'
+            header cards, the 'quality' and 'reused' (True if the hint was
+            reused).
+        :type function: callable
+        :param processes: the maximal number of parallel solutions
+        :type processes: int
+        :param max_queue: the maximal number of waiting images
+        :type max_queue: int
+        :param policy: 'drop_oldest' or 'skip'
+        :type policy: str
+        :param cache: the cache of the solutions or None
+        :type cache: :class:`Camera.interface.wcs_cache.WCSCache`
+        """
+        if policy not in ('drop_oldest', 'skip'):
+            raise ValueError('Unknown policy: {}'.format(policy))
+        self.function = function
+        self.processes = processes
+        self.max_queue = max_queue
+        self.policy = policy
+        self.cache = cache
+        self.pool = None
+        self.condition = Condition()
+        # keeps the order of the emits of concurrent callbacks, it's
+        # reentrant for signals, which submit a new image
+        self.emit_lock = RLock()
+        self.error_message = ''
+        self.queue = deque()
+        self.running = 0
+        self.next_id = 0
+        self.next_emit = 0
+        self.results = {}
+        self.active = True
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.wait_time = 0.
+        self.solve_time = 0.
+        self.max_solve_time = 0.
+
+        self.th = Thread(target=self.run)
+        self.th.daemon = True
+        self.th.start()
+
+    def submit(self, path, signal=None, key=None):
+        """
+        Adds a new image to the queue.
+
+        :param path: the path to the image
+        :type path: str
+        :param signal: signal to send the result back or None
+        :param key:
+            the cache key of the image, see
+            :func:`Camera.interface.wcs_cache.get_wcs_key`, or None
+        :type key: tuple
+        :returns: True if the image was queued, False if it was skipped
+        :rtype: bool
+        """
+        self.condition.acquire()
+        try:
+            if len(self.queue) >= self.max_queue:
+                if self.policy == 'skip':
+                    self.skipped += 1
+                    return False
+                # the result of the dropped job is empty, so the order of
+                # the following results is kept
+                dropped = self.queue.popleft()
+                self.results[dropped.job_id] = (dropped, None)
+                self.dropped += 1
+            job = WCSJob(self.next_id, path, signal, key)
+            self.next_id += 1
+            self.submitted += 1
+            self.queue.append(job)
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+        # results of dropped jobs can be the next in line
+        self.__emit__()
+        return True
+
+    def run(self):
+        """
+        Dispatches the queued images to the worker processes.
+        """
+        while True:
+            self.condition.acquire()
+            while self.active and (len(self.queue) == 0 or
+                                   self.running >= self.processes):
+                self.condition.wait()
+            if not self.active:
+                self.condition.release()
+                break
+            job = self.queue.popleft()
+            self.running += 1
+            self.condition.release()
+
+            # the hint is taken at the dispatch, so the solution of the
+            # previous frame of a sequence is already in the cache
+            if self.cache is not None and job.key is not None:
+                job.hint = self.cache.get_hint(job.key)
+            if self.pool is None:
+                # imported at the first job, because it's slow
+                import multiprocessing
+                self.pool = multiprocessing.Pool(self.processes)
+            job.start_time = time.time()
+            self.pool.apply_async(__timed_call__,
+                                  (self.function, job.path, job.hint),
+                                  callback=lambda r, job=job: self.__done__(job, r),
+                                  error_callback=lambda e, job=job: self.__failed__(job, e))
+
+    def __done__(self, job, result):
+        """
+        Callback of a successful job.
+
+        :param job: the finished job
+        :type job: :class:`WCSJob`
+        :param result: the result of the function and the needed time
+        :type result: tuple
+        """
+        result, solve_time = result
+        self.condition.acquire()
+        self.running -= 1
+        self.completed += 1
+        self.wait_time += job.start_time - job.queue_time
+        self.solve_time += solve_time
+        self.max_solve_time = max(self.max_solve_time, solve_time)
+        self.results[job.job_id] = (job, result)
+        # the solution is cached before the dispatcher wakes up, so the next
+        # job of the key gets it as hint
+        if (self.cache is not None and result is not None and
+                not result.get('reused', False)):
+            self.cache.store(job.key, result)
+        self.condition.notify_all()
+        self.condition.release()
+        self.__emit__()
+
+    def __failed__(self, job, error):
+        """
+        Callback of a failed job.
+
+        :param job: the failed job
+        :type job: :class:`WCSJob`
+        :param error: the error of the worker
+        :type error: Exception
+        """
+        self.__create_error_message__('Can\'t solve the WCS of {}: {}'.format(
+            job.path, error))
+        self.condition.acquire()
+        self.running -= 1
+        self.failed += 1
+        self.results[job.job_id] = (job, None)
+        self.condition.notify_all()
+        self.condition.release()
+        self.__emit__()
+
+    def __emit__(self):
+        """
+        Sends all results, which are next in line, to their signals. The
+        emit lock is held until the results are sent, so the results of
+        two callbacks can't overtake each other.
+        """
+        self.emit_lock.acquire()
+        try:
+            self.condition.acquire()
+            ready = []
+            while self.next_emit in self.results:
+                ready.append(self.results.pop(self.next_emit))
+                self.next_emit += 1
+            self.condition.release()
+            for job, result in ready:
+                # a reused solution has no new offset
+                if result is not None and result['offset'] is not None and \
+                        job.signal is not None:
+                    job.signal.emit(result['offset'])
+        finally:
+            self.emit_lock.release()
+
+    def __create_error_message__(self, message):
+        """
+        Stores the message of the last error with the time, it's available
+        by :meth:`get_error_message`.
+
+        :param message: The message of the error
+        :type message: str
+        """
+        self.error_message = message + '\nTime: ' + \
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def get_error_message(self):
+        """
+        Returns the last error message.
+
+        :returns: last error message
+        :rtype: str
+        """
+        return self.error_message
+
+    def get_queue_size(self):
+        """
+        Returns the number of waiting images.
+
+        :returns: the number of waiting images
+        :rtype: int
+        """
+        return len(self.queue)
+
+    def get_metrics(self):
+        """
+        Returns the timing and queue metrics of the pool.
+
+        :returns: the metrics
+        :rtype: dict
+        """
+        self.condition.acquire()
+        finished = max(self.completed, 1)
+        metrics = {'queue_size': len(self.queue),
+                   'running': self.running,
+                   'submitted': self.submitted,
+                   'completed': self.completed,
+                   'failed': self.failed,
+                   'dropped': self.dropped,
+                   'skipped': self.skipped,
+                   'mean_wait_time': self.wait_time / finished,
+                   'mean_solve_time': self.solve_time / finished,
+                   'max_solve_time': self.max_solve_time}
+        self.condition.release()
+        return metrics
+
+    def close(self):
+        """
+        Stops the dispatcher and the worker processes. Queued images are
+        discarded, running solutions are finished.
+        """
+        self.condition.acquire()
+        self.active = False
+        self.queue.clear()
+        self.condition.notify_all()
+        self.condition.release()
+        if self.pool is not None:
+            self.pool.close()
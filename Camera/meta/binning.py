@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def split_binning(x_bin, y_bin, max_x, max_y, asymmetric):
+    """
+    Splits a binning into the largest hardware binning, which the camera
+    supports, and the remaining software binning.
+
+    :param x_bin: the wanted binning in x-direction
+    :type x_bin: int
+    :param y_bin: the wanted binning in y-direction
+    :type y_bin: int
+    :param max_x: the maximal hardware binning in x-direction
+    :type max_x: int
+    :param max_y: the maximal hardware binning in y-direction
+    :type max_y: int
+    :param asymmetric: True if the camera supports different x- and y-binnings
+    :type asymmetric: bool
+    :returns: the hardware binning (x, y) and the software binning (x, y)
+    :rtype: tuple
+    """
+    x_hw = max(b for b in range(1, min(x_bin, max_x) + 1) if x_bin % b == 0)
+    y_hw = max(b for b in range(1, min(y_bin, max_y) + 1) if y_bin % b == 0)
+    if not asymmetric and x_hw != y_hw:
+        # the largest common factor of both directions
+        x_hw = y_hw = max(b for b in range(1, min(x_hw, y_hw) + 1)
+                          if x_bin % b == 0 and y_bin % b == 0)
+    return (x_hw, y_hw), (x_bin // x_hw, y_bin // y_hw)
+
+
+def software_bin(img, x_bin, y_bin):
+    """
+    Bins an image by summing the pixels. Rows and columns, which don't
+    fill a complete bin, are removed. The sum is made in uint32 and clipped
+    to the uint16 range.
+
+    :param img: the image with the rows in y-direction
+    :type img: numpy.ndarray
+    :param x_bin: the binning in x-direction
+    :type x_bin: int
+    :param y_bin: the binning in y-direction
+    :type y_bin: int
+    :returns: the binned image
+    :rtype: numpy.ndarray
+    """
+    if x_bin == 1 and y_bin == 1:
+        return img
+    h = img.shape[0] // y_bin * y_bin
+    w = img.shape[1] // x_bin * x_bin
+    binned = img[:h, :w].reshape(h // y_bin, y_bin, w // x_bin, x_bin).sum(
+        axis=(1, 3), dtype=np.uint32)
+    return np.minimum(binned, 65535).astype(np.uint16)
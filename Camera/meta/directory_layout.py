@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from threading import Lock
+import os
+import re
+
+
+DEFAULT_PATTERN = '{night}/{target}/{filter}/{type}'
+
+
+def clean_name(name, default='unknown'):
+    """
+    Converts a name to a safe directory name.
+
+    :param name: the name like the object name
+    :type name: str
+    :param default: the name if the name is empty
+    :type default: str
+    :returns: the name with only letters, numbers, '-', '+', '.' and '_'
+    :rtype: str
+    """
+    name = re.sub(r'[^A-Za-z0-9+\-._]+', '_', str(name).strip()).strip('._')
+    if name == '':
+        return default
+    return name
+
+
+class DirectoryLayout:
+    """
+    The DirectoryLayout places the images in sub directories of a root
+    directory, by default sorted by night, target, filter and image type.
+    If a directory has the maximal number of frames, the next frames are
+    placed in a numbered sub directory ('001', '002', ...). The directories
+    are created at their first use.
+    The limit counts the raw frames, the products of a frame (calibrated
+    frame, previews) are placed next to it and aren't counted.
+    """
+
+    def __init__(self, root='.', pattern=DEFAULT_PATTERN, max_files=1000,
+                 night_offset=12):
+        """
+        :param root: the root directory
+        :type root: str
+        :param pattern:
+            the pattern of the sub directories with the keys 'night',
+            'target', 'filter', 'type' and 'binning'
+        :type pattern: str
+        :param max_files:
+            the maximal number of raw frames per directory or None for no
+            limit
+        :type max_files: int
+        :param night_offset:
+            hours which are subtracted from the local time, so a night
+            gets one date
+        :type night_offset: float
+        """
+        self.root = root
+        self.pattern = pattern
+        self.max_files = max_files
+        self.night_offset = timedelta(hours=night_offset)
+        self.directories = {}
+        self.created = set()
+        self.lock = Lock()
+
+    def get_directory(self, info):
+        """
+        Returns the directory of the image without the numbered sub
+        directory.
+
+        :param info: the information of the image
+        :type info: Camera.meta.image_information.ImageInformation
+        :returns: the directory
+        :rtype: str
+        """
+        local_time = info.get_cet()
+        if local_time is None:
+            local_time = datetime.now()
+        night = (local_time - self.night_offset).strftime('%Y%m%d')
+        sub_directory = self.pattern.format(night=night,
+                                            target=clean_name(info.get_object_name()),
+                                            filter=clean_name(info.get_filter_name()),
+                                            type=clean_name(info.get_image_type()),
+                                            binning=info.get_binning_string().replace(':', 'x'))
+        return os.path.join(self.root, sub_directory)
+
+    def get_path(self, info):
+        """
+        Returns the path of the next image and creates its directory if
+        necessary. The name of the file is the name of the save path of
+        the image information.
+
+        :param info: the information of the image
+        :type info: Camera.meta.image_information.ImageInformation
+        :returns: the path of the image
+        :rtype: str
+        """
+        directory = self.get_directory(info)
+        self.lock.acquire()
+        try:
+            if directory not in self.directories:
+                self.directories[directory] = self.__scan__(directory)
+            shard = self.directories[directory]
+            if self.max_files is not None and shard[1] >= self.max_files:
+                shard[0] += 1
+                shard[1] = 0
+            shard[1] += 1
+            if shard[0] > 0:
+                directory = os.path.join(directory, '{:03d}'.format(shard[0]))
+            if directory not in self.created:
+                os.makedirs(directory, exist_ok=True)
+                self.created.add(directory)
+        finally:
+            self.lock.release()
+        return os.path.join(directory, os.path.basename(info.get_save_path()))
+
+    @staticmethod
+    def __scan__(directory):
+        """
+        Finds the last numbered sub directory and its number of raw frames.
+
+        :param directory: the directory
+        :type directory: str
+        :returns: the number of the sub directory and the number of frames
+        :rtype: list
+        """
+        if not os.path.isdir(directory):
+            return [0, 0]
+        shard = 0
+        for name in os.listdir(directory):
+            if len(name) == 3 and name.isdigit():
+                shard = max(shard, int(name))
+        if shard > 0:
+            directory = os.path.join(directory, '{:03d}'.format(shard))
+        count = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                # the calibrated frames are products of the raw frames
+                if entry.name.endswith(('.fits', '.fit')) and \
+                        not entry.name.endswith('_cal.fits') and entry.is_file():
+                    count += 1
+        return [shard, count]
@@ -0,0 +1,189 @@
+from collections import deque
+from threading import Lock
+import time
+
+
+class FrameBuffer:
+    """
+    The FrameBuffer keeps the last frames of a camera in memory together
+    with the snapshot of their image information, their statistics and
+    their histogram.
+    If there are more frames than allowed or the frames need more memory
+    than the budget, the oldest frames are removed. The frames are given
+    out as read-only views, so several consumers can use the same frame
+    without a copy.
+    """
+
+    def __init__(self, max_frames=16, memory_budget=268435456):
+        """
+        :param max_frames: the maximal number of frames
+        :type max_frames: int
+        :param memory_budget: the maximal size of all frames in bytes
+        :type memory_budget: int
+        """
+        self.max_frames = max_frames
+        self.memory_budget = memory_budget
+        self.frames = deque()
+        self.size = 0
+        self.next_id = 0
+        self.evicted = 0
+        self.lock = Lock()
+
+    def add(self, img, info=None, statistics=None, histogram=None):
+        """
+        Adds a new frame and removes the oldest frames if necessary. The
+        newest frame is always kept, even if it's larger than the budget.
+
+        :param img: the image
+        :type img: numpy.ndarray
+        :param info:
+            the snapshot of the image information, see
+            :meth:`Camera.meta.image_information.ImageInformation.to_dict`
+        :type info: dict
+        :param statistics:
+            the statistics, see
+            :func:`Camera.meta.image_statistics.compute_statistics`
+        :type statistics: dict
+        :param histogram: the 16 bit histogram of the frame or None
+        :type histogram: numpy.ndarray
+        :returns: the id of the frame
+        :rtype: int
+        """
+        self.lock.acquire()
+        frame_id = self.next_id
+        self.next_id += 1
+        self.frames.append({'id': frame_id, 'image': img, 'info': info,
+                            'statistics': statistics, 'histogram': histogram,
+                            'path': None, 'time': time.time()})
+        self.size += __get_nbytes__(img, histogram)
+        while len(self.frames) > 1 and (len(self.frames) > self.max_frames or
+                                        self.size > self.memory_budget):
+            old = self.frames.popleft()
+            self.size -= __get_nbytes__(old['image'], old['histogram'])
+            self.evicted += 1
+        self.lock.release()
+        return frame_id
+
+    def set_path(self, frame_id, path):
+        """
+        Sets the path of a frame after it was written to the disk.
+
+        :param frame_id: the id of the frame
+        :type frame_id: int
+        :param path: the path of the image
+        :type path: str
+        """
+        self.lock.acquire()
+        for frame in self.frames:
+            if frame['id'] == frame_id:
+                frame['path'] = path
+                break
+        self.lock.release()
+
+    def get(self, index=-1):
+        """
+        Returns a frame by its position in the buffer.
+
+        :param index: the position, -1 is the newest frame
+        :type index: int
+        :returns:
+            dict with the 'id', a read-only view of the 'image', the 'info',
+            the 'statistics', the 'histogram', the 'path' and the 'time' or
+            None if there is no frame at this position
+        :rtype: dict
+        """
+        self.lock.acquire()
+        try:
+            frame = self.frames[index]
+        except IndexError:
+            frame = None
+        self.lock.release()
+        return __get_view__(frame)
+
+    def get_by_id(self, frame_id):
+        """
+        Returns a frame by its id.
+
+        :param frame_id: the id of the frame
+        :type frame_id: int
+        :returns: the frame (see :meth:`get`) or None if it was removed
+        :rtype: dict
+        """
+        self.lock.acquire()
+        found = None
+        for frame in self.frames:
+            if frame['id'] == frame_id:
+                found = frame
+                break
+        self.lock.release()
+        return __get_view__(found)
+
+    def get_frames(self):
+        """
+        Returns all frames from the oldest to the newest.
+
+        :returns: the frames, see :meth:`get`
+        :rtype: list
+        """
+        self.lock.acquire()
+        frames = list(self.frames)
+        self.lock.release()
+        return [__get_view__(frame) for frame in frames]
+
+    def get_size(self):
+        """
+        Returns the memory size of all frames.
+
+        :returns: the size in bytes including the histograms
+        :rtype: int
+        """
+        return self.size
+
+    def clear(self):
+        """
+        Removes all frames.
+        """
+        self.lock.acquire()
+        self.frames.clear()
+        self.size = 0
+        self.lock.release()
+
+    def __len__(self):
+        return len(self.frames)
+
+
+def __get_nbytes__(img, histogram):
+    """
+    Returns the memory size of a frame with its histogram.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param histogram: the histogram or None
+    :type histogram: numpy.ndarray
+    :returns: the size in bytes
+    :rtype: int
+    """
+    if histogram is None:
+        return img.nbytes
+    return img.nbytes + histogram.nbytes
+
+
+def __get_view__(frame):
+    """
+    Returns a copy of the frame entry with read-only views of the image and
+    the histogram.
+
+    :param frame: the frame entry or None
+    :type frame: dict
+    :returns: the frame entry or None
+    :rtype: dict
+    """
+    if frame is None:
+        return None
+    frame = dict(frame)
+    for key in ('image', 'histogram'):
+        if frame[key] is not None:
+            view = frame[key].view()
+            view.flags.writeable = False
+            frame[key] = view
+    return frame
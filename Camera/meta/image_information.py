@@ -1,4 +1,3 @@
-from astropy.time import Time
 from datetime import datetime
 
 
@@ -61,6 +60,8 @@ class TelescopeTime:
     date_cet = None
 
     def update_time(self):
+        # astropy.time is imported at the first use, because it's slow
+        from astropy.time import Time
         self.date = Time.now()
         self.date_cet = datetime.now()
 
@@ -135,7 +136,7 @@ class ImageInformation:
 
     def get_iraf_type(self):
         conv = {'science': 'LIGHT', 'flat': 'FLAT', 'dark': 'DARK',
-                'test': 'test'}
+                'bias': 'BIAS', 'test': 'test'}
         return conv[self.image.type]
 
     def get_save_path(self):
@@ -213,6 +214,29 @@ class ImageInformation:
         self.weather_data.date = weather['date']
         self.weather_data.heating = weather['heating']
 
+    def to_dict(self):
+        """
+        Returns a snapshot of the information, which doesn't change with
+        the next exposure. The keys of :meth:`from_dict` are included.
+
+        :returns: the information of the image
+        :rtype: dict
+        """
+        utc = self.get_utc()
+        return {'x0': self.frame.x_start, 'y0': self.frame.y_start,
+                'width': self.frame.x_size, 'height': self.frame.y_size,
+                'bin_x': self.frame.bin_x, 'bin_y': self.frame.bin_y,
+                'repeats': self.image.number, 'object': self.image.object,
+                'observer': self.image.observer, 'filter': self.image.filter,
+                'exposure': self.image.exposure_time,
+                'image_type': self.image.type,
+                'ra_telescope': self.coordinates.ra_telescope,
+                'dec_telescope': self.coordinates.dec_telescope,
+                'ra_target': self.coordinates.ra_target,
+                'dec_target': self.coordinates.dec_target,
+                'utc': utc.isot if utc is not None else '',
+                'save_path': self.save_path}
+
     @staticmethod
     def from_dict(data):
         information = ImageInformation()
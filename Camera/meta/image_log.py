@@ -1,8 +1,56 @@
 from datetime import datetime
-from threading import Thread
+from threading import Thread, Lock
 import os
 
 
+LOG_HEADER = ('# Date; Observer; image name; telescope RA; telescope DEC; target RA; ' +
+              'target DEC; image_type; exposure_time; filter; subframe; binning')
+LOG_COLUMNS = ['date', 'observer', 'target', 'telescope_ra', 'telescope_dec',
+               'target_ra', 'target_dec', 'type', 'exposure_time', 'filter',
+               'subframe_start', 'subframe_size', 'binning', 'chip_temp',
+               'dome_temp', 'out_temp', '', 'dome_hum', 'out_hum']
+
+
+def read_log(path='./image_log.txt'):
+    """
+    Reads the entries of an image log.
+
+    :param path: the path to the log file
+    :type path: str
+    :returns:
+        list with a dict per entry. The keys are the names of
+        :data:`LOG_COLUMNS` with the 'subframe' in the style of
+        :meth:`ImageInformation.get_subframe_string` and the
+        additional 'key=value' fields like the statistics or the 'path'.
+    :rtype: list
+    """
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    f = open(path)
+    for line in f:
+        line = line.rstrip('\n')
+        # older logs have no line break after the header
+        if line.startswith(LOG_HEADER):
+            line = line[len(LOG_HEADER):]
+        if line == '' or line.startswith('#'):
+            continue
+        fields = line.split(';')
+        entry = {}
+        for name, value in zip(LOG_COLUMNS, fields[:len(LOG_COLUMNS)]):
+            if name != '':
+                entry[name] = value
+        for field in fields[len(LOG_COLUMNS):]:
+            if '=' in field:
+                key, value = field.split('=', 1)
+                entry[key] = value
+        if 'subframe_start' in entry and 'subframe_size' in entry:
+            entry['subframe'] = entry['subframe_start'] + ';' + entry['subframe_size']
+        entries.append(entry)
+    f.close()
+    return entries
+
+
 class ImageLog:
     """
     Class to create/interact with the log-file for images.
@@ -13,26 +61,40 @@ class ImageLog:
         self.last_target = ''
         if not os.path.exists(self.path):
             self.f = open(self.path, 'a')
-            self.f.write('# Date; Observer; image name; telescope RA; telescope DEC; target RA; ' +
-                         'target DEC; image_type; exposure_time; filter; subframe; binning')
+            self.f.write(LOG_HEADER + '\n')
             self.f.flush()
         else:
             self.f = open(self.path, 'a')
         self.is_open = True
         self.signal = signal
+        # the log can be shared by several cameras
+        self.lock = Lock()
 
     def close(self):
+        self.lock.acquire()
         self.f.close()
         self.is_open = False
+        self.lock.release()
 
     def open(self):
+        self.lock.acquire()
         self.f = open(self.path, 'a')
         self.is_open = True
+        self.lock.release()
+
+    def read(self):
+        """
+        Reads all entries of the log, see :func:`read_log`.
+
+        :returns: list with a dict per entry
+        :rtype: list
+        """
+        return read_log(self.path)
 
     def add(self, date, observer, target, telescope_ra, telescope_dec,
             target_ra, target_dec, image_type, exposure_time, filt,
             subframe, binning, chip_temp, dome_temp, out_temp, dome_hum, out_hum,
-            readout_time, path):
+            readout_time, path, statistics=None, timing=None):
         """
 
         :param date: Date of the observation
@@ -73,6 +135,14 @@ class ImageLog:
         :type readout_time: float
         :param path: The path to the image
         :type path: str
+        :param statistics:
+            The statistics of the image, which are added as 'key=value'
+            fields at the end of the entry
+        :type statistics: dict
+        :param timing:
+            The timing spans of the image as (name, seconds) pairs, which
+            are added as 'timing_<name>=seconds' fields
+        :type timing: list
 
         Adds a new entry in the log file
         """
@@ -80,23 +150,24 @@ class ImageLog:
                                                target_ra, target_dec, image_type, exposure_time, filt,
                                                subframe, binning, chip_temp, dome_temp, out_temp, dome_hum, out_hum,
                                                readout_time,
-                                               path,))
+                                               path, statistics, timing,))
         th.start()
 
     def __add__(self, date, observer, target, telescope_ra, telescope_dec,
                 target_ra, target_dec, image_type, exposure_time, filt,
                 sub_frame, binning, chip_temp, dome_temp, out_temp, dome_hum, out_hum,
-                readout_time, path):
+                readout_time, path, statistics=None, timing=None):
         infos = {'date': date, 'observer': observer, 'target': target, 'telescope_ra': telescope_ra,
                  'telescope_dec': telescope_dec, 'target_ra': target_ra,
                  'target_dec': target_dec, 'type': image_type, 'exposure_time': exposure_time,
                  'filter': filt, 'subframe': sub_frame, 'binning': binning,
                  'chip_temp': chip_temp, 'dome_temp': dome_temp, 'out_temp': out_temp,
                  'dome_hum': dome_hum, 'out_hum': out_hum, 'readout_time': readout_time,
-                 'path': path}
+                 'path': path, 'statistics': statistics, 'timing': timing}
         if self.signal is not None:
             self.last_target = target
             self.signal.update_information(infos)
+        self.lock.acquire()
         if self.is_open:
             if type(date) == datetime:
                 string = date.strftime("%Y-%m-%d %H:%M:%S")
@@ -107,5 +178,13 @@ class ImageLog:
             string += ';' + exposure_time + ';' + filt + ';' + sub_frame + ';' + binning
             string += ';' + chip_temp + ';' + dome_temp + ';' + out_temp + ';'
             string += ';' + dome_hum + ';' + out_hum
+            if statistics is not None:
+                for key in sorted(statistics.keys()):
+                    string += ';{}={}'.format(key, statistics[key])
+            if timing is not None:
+                for name, seconds in timing:
+                    string += ';timing_{}={:.6f}'.format(name, seconds)
+            string += ';readout_time={};path={}'.format(readout_time, path)
             self.f.write(string + '\n')
             self.f.flush()
+        self.lock.release()
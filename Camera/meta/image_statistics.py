@@ -0,0 +1,120 @@
+import numpy as np
+
+
+HISTOGRAM_SIZE = 65536
+MAD_TO_SIGMA = 1.4826
+# the header cards of add_statistics_header
+STATISTICS_KEYS = ('DATAMIN', 'DATAMAX', 'DATAMEAN', 'DATAMED', 'DATAMAD',
+                   'NSATUR', 'STATSUB')
+
+
+def compute_statistics(img, saturation=65535, subsample=None):
+    """
+    Computes the statistics of an uint16 image in one pass. The pass creates
+    the 16 bit histogram of the image, all other values are derived from
+    the histogram.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param saturation: the first saturated value
+    :type saturation: int
+    :param subsample:
+        None to use every pixel, else only every n-th pixel in both
+        directions is used (the counts are scaled to the full image)
+    :type subsample: int
+    :returns:
+        dict with 'min', 'max', 'mean', 'median', 'mad', 'sigma' (robust
+        sigma from the MAD), 'saturated' (number of saturated pixels),
+        'subsample' and the uint32 'histogram' of the used pixels
+    :rtype: dict
+    """
+    step = 1
+    if subsample is not None and subsample > 1:
+        step = int(subsample)
+        img = img[::step, ::step]
+    histogram = np.bincount(np.asarray(img, dtype=np.uint16).ravel(),
+                            minlength=HISTOGRAM_SIZE)
+    n = histogram.sum()
+    if n == 0:
+        return {'min': 0, 'max': 0, 'mean': 0., 'median': 0., 'mad': 0.,
+                'sigma': 0., 'saturated': 0, 'subsample': step,
+                'histogram': histogram.astype(np.uint32)}
+    values = np.arange(HISTOGRAM_SIZE)
+    filled = np.flatnonzero(histogram)
+    mean = float(np.dot(histogram, values)) / float(n)
+    median = __histogram_median__(histogram, n)
+    # histogram of the absolute deviations from the median
+    deviations = np.bincount(np.abs(values - int(round(median))),
+                             weights=histogram, minlength=HISTOGRAM_SIZE)
+    mad = __histogram_median__(deviations, n)
+    saturated = int(histogram[saturation:].sum()) * step * step
+    return {'min': int(filled[0]), 'max': int(filled[-1]), 'mean': mean,
+            'median': median, 'mad': mad, 'sigma': MAD_TO_SIGMA * mad,
+            'saturated': saturated, 'subsample': step,
+            'histogram': histogram.astype(np.uint32)}
+
+
+def get_subsample(img, max_pixels):
+    """
+    Returns the subsample step to use at most max_pixels pixels.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param max_pixels: the maximal number of used pixels or None
+    :type max_pixels: int
+    :returns: the subsample step or None if every pixel can be used
+    :rtype: int
+    """
+    if max_pixels is None or img.size <= max_pixels:
+        return None
+    return int(np.ceil(np.sqrt(float(img.size) / max_pixels)))
+
+
+def __histogram_median__(histogram, n):
+    """
+    Returns the median of the values of a histogram.
+
+    :param histogram: the histogram with the value as index
+    :type histogram: numpy.ndarray
+    :param n: the number of entries
+    :type n: int
+    :returns: the median
+    :rtype: float
+    """
+    cumulative = np.cumsum(histogram)
+    lower = int(np.searchsorted(cumulative, (n + 1) // 2))
+    upper = int(np.searchsorted(cumulative, n // 2 + 1))
+    return (lower + upper) / 2.
+
+
+def add_statistics_header(header, statistics):
+    """
+    Adds the statistics as cards to the header.
+
+    :param header: the header of the image
+    :type header: astropy.io.fits.Header
+    :param statistics: the statistics, see :func:`compute_statistics`
+    :type statistics: dict
+    :returns: the header
+    """
+    header['DATAMIN'] = (statistics['min'], 'Minimum pixel value')
+    header['DATAMAX'] = (statistics['max'], 'Maximum pixel value')
+    header['DATAMEAN'] = (round(statistics['mean'], 3), 'Mean pixel value')
+    header['DATAMED'] = (statistics['median'], 'Median pixel value')
+    header['DATAMAD'] = (statistics['mad'], 'Median absolute deviation')
+    header['NSATUR'] = (statistics['saturated'], 'Number of saturated pixels')
+    header['STATSUB'] = (statistics['subsample'], 'Subsample step of the statistics')
+    return header
+
+
+def get_log_statistics(statistics):
+    """
+    Returns the statistics for the image log without the histogram.
+
+    :param statistics: the statistics, see :func:`compute_statistics`
+    :type statistics: dict
+    :returns: the statistics without the histogram
+    :rtype: dict
+    """
+    return dict((key, value) for key, value in statistics.items()
+                if key != 'histogram')
@@ -0,0 +1,211 @@
+from threading import Thread, Lock
+from queue import Queue
+import os
+import re
+import time
+
+
+def get_free_path(save_path):
+    """
+    Returns the path itself if there is no file with this path, else the
+    first free path with the suffix '_<number>.fits'.
+
+    :param save_path: the wanted path of the image
+    :type save_path: str
+    :returns: a path without an existing file
+    :rtype: str
+    """
+    c = 0
+    while os.path.exists(save_path):
+        if c == 0:
+            save_path = save_path.split('.fit')[0]
+        else:
+            save_path = save_path.split('_{}.fit'.format(c-1))[0]
+        save_path += '_{}.fits'.format(c)
+        c += 1
+    return save_path
+
+
+class PathAllocator:
+    """
+    The PathAllocator finds free paths with the same naming as
+    :func:`get_free_path`, but without a search. It keeps a counter per base
+    name, which is set by one scan of the directory at the first use of the
+    base name. The files are created exclusively, so two writers never get
+    the same path.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.lock = Lock()
+
+    def allocate(self, save_path):
+        """
+        Creates a new empty file at the wanted path or, if it already
+        exists, at the next path with the suffix '_<number>.fits'.
+
+        :param save_path: the wanted path of the image
+        :type save_path: str
+        :returns: the path of the created file
+        :rtype: str
+        """
+        base = save_path.split('.fit')[0]
+        key = os.path.abspath(base)
+        self.lock.acquire()
+        try:
+            if key not in self.counters:
+                wanted_exists, self.counters[key] = self.__scan__(save_path, base)
+                if not wanted_exists and __create__(save_path):
+                    return save_path
+            while True:
+                path = '{}_{}.fits'.format(base, self.counters[key])
+                self.counters[key] += 1
+                # fails only if the file was created outside of this allocator
+                if __create__(path):
+                    return path
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def __scan__(save_path, base):
+        """
+        Returns the first counter of a base name.
+
+        :param save_path: the wanted path of the image
+        :type save_path: str
+        :param base: the path without the extension
+        :type base: str
+        :returns:
+            True if the wanted path exists and the number after the highest
+            existing suffix
+        :rtype: tuple
+        """
+        directory, name = os.path.split(base)
+        pattern = re.compile(re.escape(name) + r'_(\d+)\.fits$')
+        wanted = os.path.basename(save_path)
+        wanted_exists = False
+        counter = 0
+        try:
+            with os.scandir(directory or '.') as entries:
+                for entry in entries:
+                    if entry.name == wanted:
+                        wanted_exists = True
+                        continue
+                    match = pattern.match(entry.name)
+                    if match is not None:
+                        counter = max(counter, int(match.group(1)) + 1)
+        except FileNotFoundError:
+            pass
+        return wanted_exists, counter
+
+
+def __create__(path):
+    """
+    Creates an empty file, if there is no file with this path.
+
+    :param path: the path of the file
+    :type path: str
+    :returns: True if the file was created, False if it already exists
+    :rtype: bool
+    """
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+
+PATH_ALLOCATOR = PathAllocator()
+
+
+def write_image(hdu, save_path, allocator=None):
+    """
+    Writes the HDU to a free path, see :class:`PathAllocator`.
+
+    :param hdu: the HDU of the image
+    :type hdu: astropy.io.fits.PrimaryHDU
+    :param save_path: the wanted path of the image
+    :type save_path: str
+    :param allocator: the path allocator or None for the shared allocator
+    :type allocator: :class:`PathAllocator`
+    :returns: the path where the image was written
+    :rtype: str
+    """
+    if allocator is None:
+        allocator = PATH_ALLOCATOR
+    save_path = allocator.allocate(save_path)
+    try:
+        hdu.writeto(save_path, overwrite=True)
+    except Exception:
+        # don't leave the empty file behind
+        os.remove(save_path)
+        raise
+    return save_path
+
+
+class ImageWriter(Thread):
+    """
+    The ImageWriter writes images in a separate thread. It can be shared by
+    several cameras, the images are written in the order of their
+    submission.
+    """
+
+    def __init__(self):
+        Thread.__init__(self)
+        self.daemon = True
+        self.queue = Queue()
+        self.active = True
+        # Camera.meta.metrics.Metrics to measure the write times or None
+        self.metrics = None
+        self.start()
+
+    def write(self, hdu, save_path, callback=None):
+        """
+        Adds an image to the write queue.
+
+        :param hdu: the HDU of the image
+        :type hdu: astropy.io.fits.PrimaryHDU
+        :param save_path: the wanted path of the image
+        :type save_path: str
+        :param callback:
+            callable which is called after the write with the final path and
+            the error (None if the write was successful)
+        :type callback: callable
+        """
+        self.queue.put((hdu, save_path, callback))
+
+    def get_queue_size(self):
+        """
+        Returns the number of images which are waiting to be written.
+
+        :returns: number of images in the queue
+        :rtype: int
+        """
+        return self.queue.qsize()
+
+    def run(self):
+        while self.active:
+            job = self.queue.get()
+            if job is None:
+                break
+            hdu, save_path, callback = job
+            error = None
+            start = time.perf_counter()
+            try:
+                save_path = write_image(hdu, save_path)
+            except Exception as e:
+                # a broken image mustn't stop the writer of the next images
+                error = e
+            if self.metrics is not None:
+                self.metrics.observe('write_seconds', time.perf_counter() - start)
+            if callback is not None:
+                try:
+                    callback(save_path, error)
+                except Exception as e:
+                    print(e)
+
+    def close(self):
+        """
+        Stops the writer after all queued images are written.
+        """
+        self.queue.put(None)
@@ -0,0 +1,250 @@
+from threading import Thread, Lock
+import time
+
+
+def __format_labels__(labels):
+    """
+    Formats the labels of a metric in the text format.
+
+    :param labels: the labels as tuple of (name, value) pairs
+    :type labels: tuple
+    :returns: the labels like '{device="Camera"}' or an empty string
+    :rtype: str
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('"', '\\"'))
+                          for name, value in labels) + '}'
+
+
+class Metrics:
+    """
+    The Metrics collect counters and timings of the acquisition pipeline
+    and gauges, which are read only at the export. Counters and timings are
+    updated under a short lock, gauges are functions which must not use the
+    driver lock (like the cached temperature of the camera status).
+    """
+
+    def __init__(self, prefix='camera'):
+        """
+        :param prefix: the prefix of all metric names
+        :type prefix: str
+        """
+        self.prefix = prefix
+        self.counters = {}
+        self.timings = {}
+        self.gauges = {}
+        self.descriptions = {}
+        self.lock = Lock()
+
+    def increment(self, name, value=1, **labels):
+        """
+        Increases a counter.
+
+        :param name: the name of the counter
+        :type name: str
+        :param value: the increment
+        :type value: int
+        :param labels: the labels of the counter
+        """
+        key = (name, tuple(sorted(labels.items())))
+        self.lock.acquire()
+        self.counters[key] = self.counters.get(key, 0) + value
+        self.lock.release()
+
+    def observe(self, name, seconds, **labels):
+        """
+        Adds a duration to a timing, which is exported with its count, sum
+        and maximum.
+
+        :param name: the name of the timing
+        :type name: str
+        :param seconds: the duration in seconds
+        :type seconds: float
+        :param labels: the labels of the timing
+        """
+        key = (name, tuple(sorted(labels.items())))
+        self.lock.acquire()
+        timing = self.timings.get(key)
+        if timing is None:
+            self.timings[key] = [1, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            if seconds > timing[2]:
+                timing[2] = seconds
+        self.lock.release()
+
+    def add_gauge(self, name, function, description=''):
+        """
+        Adds a gauge, which is read at every export.
+
+        :param name: the name of the gauge
+        :type name: str
+        :param function:
+            function without arguments, which returns the value or None
+            if the value is unknown
+        :type function: callable
+        :param description: the description of the gauge
+        :type description: str
+        """
+        self.gauges[name] = function
+        if description:
+            self.descriptions[name] = description
+
+    def describe(self, name, description):
+        """
+        Sets the description of a counter or a timing.
+
+        :param name: the name of the metric
+        :type name: str
+        :param description: the description
+        :type description: str
+        """
+        self.descriptions[name] = description
+
+    def get_text(self):
+        """
+        Returns all metrics in the Prometheus text format.
+
+        :returns: the metrics
+        :rtype: str
+        """
+        self.lock.acquire()
+        counters = sorted(self.counters.items())
+        timings = sorted((key, list(value)) for key, value in self.timings.items())
+        self.lock.release()
+
+        lines = []
+        written = set()
+
+        def header(name, kind):
+            if name in written:
+                return
+            written.add(name)
+            if name in self.descriptions:
+                lines.append('# HELP {}_{} {}'.format(self.prefix, name,
+                                                      self.descriptions[name]))
+            lines.append('# TYPE {}_{} {}'.format(self.prefix, name, kind))
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append('{}_{}_total{} {}'.format(self.prefix, name,
+                                                   __format_labels__(labels), value))
+        for (name, labels), (count, total, maximum) in timings:
+            header(name, 'summary')
+            label_text = __format_labels__(labels)
+            lines.append('{}_{}_count{} {}'.format(self.prefix, name, label_text, count))
+            lines.append('{}_{}_sum{} {:.6f}'.format(self.prefix, name, label_text, total))
+            lines.append('{}_{}_max{} {:.6f}'.format(self.prefix, name, label_text, maximum))
+        for name, function in sorted(self.gauges.items()):
+            try:
+                value = function()
+            except Exception:
+                value = None
+            if value is None:
+                continue
+            header(name, 'gauge')
+            lines.append('{}_{} {}'.format(self.prefix, name, float(value)))
+        return '\n'.join(lines) + '\n'
+
+
+class TimedComObject:
+    """
+    Wrapper of a COM-object, which measures the latency of every property
+    access and method call with :meth:`Metrics.observe`.
+    """
+
+    def __init__(self, com_object, metrics, device):
+        """
+        :param com_object: the COM-object
+        :param metrics: the metrics
+        :type metrics: :class:`Metrics`
+        :param device: the name of the device for the labels
+        :type device: str
+        """
+        object.__setattr__(self, 'com_object', com_object)
+        object.__setattr__(self, 'metrics', metrics)
+        object.__setattr__(self, 'device', device)
+
+    def __getattr__(self, name):
+        start = time.perf_counter()
+        value = getattr(self.com_object, name)
+        duration = time.perf_counter() - start
+        if not callable(value):
+            self.metrics.observe('com_latency_seconds', duration,
+                                 device=self.device, member=name)
+            return value
+
+        def timed_call(*args, **kwargs):
+            call_start = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                # the lookup of the method is part of the call
+                self.metrics.observe('com_latency_seconds',
+                                     time.perf_counter() - call_start + duration,
+                                     device=self.device, member=name)
+        return timed_call
+
+    def __setattr__(self, name, value):
+        start = time.perf_counter()
+        setattr(self.com_object, name, value)
+        self.metrics.observe('com_latency_seconds', time.perf_counter() - start,
+                             device=self.device, member=name)
+
+
+class MetricsServer(Thread):
+    """
+    Local HTTP server, which returns the metrics in the text format at
+    '/metrics'.
+    """
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        """
+        :param metrics: the metrics
+        :type metrics: :class:`Metrics`
+        :param host: the address of the server
+        :type host: str
+        :param port: the port of the server, 0 for a free port
+        :type port: int
+        """
+        # the http server is imported at the first use, because the drivers
+        # import this module
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+        Thread.__init__(self)
+        self.daemon = True
+        self.metrics = metrics
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] not in ('/', '/metrics'):
+                    handler.send_error(404)
+                    return
+                body = metrics.get_text().encode()
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        self.server = Server((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self.start()
+
+    def run(self):
+        self.server.serve_forever()
+
+    def close(self):
+        """
+        Stops the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
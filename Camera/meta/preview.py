@@ -0,0 +1,122 @@
+import numpy as np
+
+
+PREVIEW_FACTORS = (2, 4, 8)
+
+
+def block_sum(img, factor):
+    """
+    Sums blocks of factor x factor pixels. Rows and columns which don't fill
+    a complete block are cut off.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param factor: the size of the blocks
+    :type factor: int
+    :returns: the summed blocks as float64
+    :rtype: numpy.ndarray
+    """
+    h = (img.shape[0] // factor) * factor
+    w = (img.shape[1] // factor) * factor
+    blocks = img[:h, :w].reshape(h // factor, factor, w // factor, factor)
+    return blocks.sum(axis=(1, 3), dtype=np.float64)
+
+
+def create_pyramid(img, factors=PREVIEW_FACTORS):
+    """
+    Creates block mean previews of the image. Only the first level reads the
+    full image, every following level is reduced from the previous one.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param factors:
+        the block sizes in increasing order, every factor must be a
+        multiple of the previous one
+    :type factors: tuple
+    :returns: dict with the factor as key and the float32 preview as value
+    :rtype: dict
+    """
+    previews = {}
+    sums = img
+    last = 1
+    for factor in factors:
+        sums = block_sum(sums, factor // last)
+        previews[factor] = (sums / (factor * factor)).astype(np.float32)
+        last = factor
+    return previews
+
+
+def asinh_stretch(img, low=0.5, high=99.5, softening=10.):
+    """
+    Scales the image with an asinh stretch to 8 bit.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param low: the lower percentile which becomes 0
+    :type low: float
+    :param high: the upper percentile which becomes 255
+    :type high: float
+    :param softening: strength of the asinh stretch
+    :type softening: float
+    :returns: the stretched image
+    :rtype: numpy.ndarray
+    """
+    vmin, vmax = np.percentile(img, [low, high])
+    if vmax <= vmin:
+        return np.zeros(img.shape, dtype=np.uint8)
+    scaled = np.clip((img - vmin) / (vmax - vmin), 0, 1)
+    scaled = np.arcsinh(softening * scaled) / np.arcsinh(softening)
+    return (scaled * 255 + 0.5).astype(np.uint8)
+
+
+def get_preview_path(save_path, name):
+    """
+    Returns the path of a preview next to the image.
+
+    :param save_path: the path of the image
+    :type save_path: str
+    :param name: the name of the preview like 'bin4' or 'thumb'
+    :type name: str
+    :returns: the path of the preview
+    :rtype: str
+    """
+    return save_path.split('.fit')[0] + '_{}.npy'.format(name)
+
+
+def create_previews(img, factors=PREVIEW_FACTORS):
+    """
+    Creates the block mean previews and an 8 bit asinh thumbnail of the
+    coarsest level.
+
+    :param img: the image
+    :type img: numpy.ndarray
+    :param factors: the block sizes of the previews
+    :type factors: tuple
+    :returns: dict with the names ('bin2', ..., 'thumb') and the previews
+    :rtype: dict
+    """
+    pyramid = create_pyramid(img, factors)
+    previews = {}
+    for factor in factors:
+        previews['bin{}'.format(factor)] = pyramid[factor]
+    previews['thumb'] = asinh_stretch(pyramid[factors[-1]])
+    return previews
+
+
+def save_previews(previews, save_path):
+    """
+    Writes the previews next to the image.
+
+    :param previews: the previews, see :func:`create_previews`
+    :type previews: dict
+    :param save_path: the path of the image
+    :type save_path: str
+    :returns: the paths of the previews
+    :rtype: list
+    """
+    paths = []
+    for name, preview in previews.items():
+        path = get_preview_path(save_path, name)
+        np.save(path, preview)
+        paths.append(path)
+    return paths
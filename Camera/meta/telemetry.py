@@ -0,0 +1,249 @@
+from threading import Lock
+import numpy as np
+import os
+
+
+COLUMNS = ('time', 'temperature', 'setpoint', 'cooler_power', 'filter_position')
+# resolution in seconds and number of samples of the levels
+# (1 hour with 1 s, 2 days with 1 min, 14 days with 10 min)
+LEVELS = ((1, 3600), (60, 2880), (600, 2016))
+
+
+class TelemetryLevel:
+    """
+    Ring buffer of one resolution. The samples of one bucket are averaged
+    before they are stored, so every level is filled directly from the
+    new samples.
+    """
+
+    def __init__(self, resolution, capacity, path=None):
+        """
+        :param resolution: the length of a bucket in seconds
+        :type resolution: float
+        :param capacity: the number of buckets in the ring
+        :type capacity: int
+        :param path: the file of the memory map or None to keep it in memory
+        :type path: str
+        """
+        self.resolution = resolution
+        self.capacity = capacity
+        shape = (capacity, len(COLUMNS))
+        if path is None:
+            self.data = np.full(shape, np.nan)
+        elif os.path.exists(path):
+            self.data = np.lib.format.open_memmap(path, mode='r+')
+            if self.data.shape != shape:
+                raise ValueError('{} has the shape {}, expected {}'.format(
+                    path, self.data.shape, shape))
+        else:
+            self.data = np.lib.format.open_memmap(path, mode='w+',
+                                                  dtype=np.float64, shape=shape)
+            self.data[:] = np.nan
+        # the ring position follows from the newest time of the stored data
+        times = self.data[:, 0]
+        self.count = int(np.count_nonzero(~np.isnan(times)))
+        if self.count > 0:
+            self.position = (int(np.nanargmax(times)) + 1) % capacity
+        else:
+            self.position = 0
+        self.bucket = None
+        self.sums = np.zeros(len(COLUMNS))
+        self.counts = np.zeros(len(COLUMNS))
+
+    def add(self, sample):
+        """
+        Adds a sample to the current bucket and stores the finished bucket.
+
+        :param sample: the values of all columns, NaN for unknown values
+        :type sample: numpy.ndarray
+        """
+        bucket = int(sample[0] // self.resolution)
+        if self.bucket is not None and bucket != self.bucket:
+            self.__store__()
+        self.bucket = bucket
+        known = ~np.isnan(sample)
+        self.sums[known] += sample[known]
+        self.counts[known] += 1
+
+    def __store__(self):
+        """
+        Writes the mean of the current bucket into the ring.
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.data[self.position] = self.sums / self.counts
+        self.position = (self.position + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.sums[:] = 0
+        self.counts[:] = 0
+
+    def get_data(self):
+        """
+        Returns the stored buckets in time order and the current bucket.
+
+        :returns: array with one row per bucket
+        :rtype: numpy.ndarray
+        """
+        if self.count < self.capacity:
+            data = self.data[:self.count]
+        else:
+            data = np.concatenate((self.data[self.position:],
+                                   self.data[:self.position]))
+        if self.counts[0] > 0:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                current = self.sums / self.counts
+            data = np.vstack((data, current))
+        return np.array(data)
+
+    def get_start(self):
+        """
+        Returns the time of the oldest bucket.
+
+        :returns: the time or None if the level is empty
+        :rtype: float
+        """
+        if self.count == 0:
+            if self.bucket is None:
+                return None
+            return self.bucket * self.resolution
+        if self.count < self.capacity:
+            return self.data[0, 0]
+        return self.data[self.position, 0]
+
+
+class TelemetryStore:
+    """
+    The TelemetryStore keeps the time series of the CCD temperature, the
+    set temperature, the cooler power and the filter wheel position in
+    ring buffers with decreasing resolution (1 s, 1 min and 10 min). With
+    a path the rings are memory maps, so the history survives a restart.
+    """
+
+    def __init__(self, path=None, levels=LEVELS):
+        """
+        :param path:
+            the prefix of the memory map files or None to keep the data in
+            memory, the files are '<path>_<resolution>s.npy'
+        :type path: str
+        :param levels: the resolution in seconds and the capacity of the levels
+        :type levels: tuple
+        """
+        self.path = path
+        self.levels = []
+        for resolution, capacity in levels:
+            level_path = None
+            if path is not None:
+                level_path = '{}_{}s.npy'.format(path, resolution)
+            self.levels.append(TelemetryLevel(resolution, capacity, level_path))
+        self.lock = Lock()
+
+    def add(self, timestamp, temperature=None, setpoint=None,
+            cooler_power=None, filter_position=None):
+        """
+        Adds a new sample to all levels.
+
+        :param timestamp: the unix time of the sample
+        :type timestamp: float
+        :param temperature: the CCD temperature or None
+        :type temperature: float
+        :param setpoint: the set temperature or None
+        :type setpoint: float
+        :param cooler_power: the cooler power in percent or None
+        :type cooler_power: float
+        :param filter_position: the position of the filter wheel or None
+        :type filter_position: int
+        """
+        sample = np.array([timestamp, temperature, setpoint, cooler_power,
+                           filter_position], dtype=np.float64)
+        self.lock.acquire()
+        for level in self.levels:
+            level.add(sample)
+        self.lock.release()
+
+    def query(self, start=None, end=None, columns=COLUMNS, resolution=None):
+        """
+        Returns the time series of a time range. Without a resolution the
+        finest level, which covers the start, is used.
+
+        :param start: the first unix time or None for all data
+        :type start: float
+        :param end: the last unix time or None for now
+        :type end: float
+        :param columns: the names of the wanted columns, see :data:`COLUMNS`
+        :type columns: tuple
+        :param resolution: the resolution of the level in seconds or None
+        :type resolution: float
+        :returns: dict with the column names as keys and arrays as values
+        :rtype: dict
+        """
+        self.lock.acquire()
+        try:
+            level = self.__get_level__(start, resolution)
+            data = level.get_data()
+        finally:
+            self.lock.release()
+        mask = np.ones(len(data), dtype=bool)
+        if start is not None:
+            # the bucket of the start time is part of the range
+            mask &= data[:, 0] >= start - level.resolution
+        if end is not None:
+            mask &= data[:, 0] <= end
+        data = data[mask]
+        return dict((name, data[:, COLUMNS.index(name)]) for name in columns)
+
+    def __get_level__(self, start, resolution):
+        """
+        Returns the level of a query.
+
+        :param start: the first unix time or None
+        :type start: float
+        :param resolution: the wanted resolution in seconds or None
+        :type resolution: float
+        :returns: the level
+        :rtype: :class:`TelemetryLevel`
+        """
+        if resolution is not None:
+            for level in self.levels:
+                if level.resolution == resolution:
+                    return level
+            raise ValueError('Unknown resolution: {}'.format(resolution))
+        if start is None:
+            return self.levels[-1]
+        for level in self.levels:
+            first = level.get_start()
+            if first is not None and first <= start:
+                return level
+        return self.levels[-1]
+
+    def get_statistics(self, start, end, column='temperature'):
+        """
+        Returns the statistics of a column in a time range, for example
+        the temperature during an exposure.
+
+        :param start: the first unix time
+        :type start: float
+        :param end: the last unix time
+        :type end: float
+        :param column: the name of the column
+        :type column: str
+        :returns:
+            dict with 'min', 'max', 'mean', 'std' and 'count' or None if
+            there are no values in the range
+        :rtype: dict
+        """
+        values = self.query(start, end, (column,))[column]
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return None
+        return {'min': float(values.min()), 'max': float(values.max()),
+                'mean': float(values.mean()), 'std': float(values.std()),
+                'count': len(values)}
+
+    def flush(self):
+        """
+        Writes the memory maps to the disk.
+        """
+        self.lock.acquire()
+        for level in self.levels:
+            if isinstance(level.data, np.memmap):
+                level.data.flush()
+        self.lock.release()
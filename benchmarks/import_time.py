@@ -0,0 +1,59 @@
+"""
+Measures the import time of the modules of the Camera package and checks
+that the slow dependencies aren't loaded at the import.
+
+Usage: python benchmarks/import_time.py [module ...]
+"""
+import subprocess
+import sys
+
+
+MODULES = ['Camera.meta.image_log', 'Camera.meta.image_information',
+           'Camera.interface.camera']
+LAZY_MODULES = ['astropy.io.fits', 'astropy.time', 'astropy.wcs',
+                'multiprocessing.pool', 'ImageProcessing']
+REPEATS = 5
+
+
+def measure(module):
+    """
+    Imports the module in a new interpreter and measures the time.
+
+    :param module: the name of the module
+    :type module: str
+    :returns:
+        the best import time in seconds of all repeats and the slow
+        modules which were loaded
+    :rtype: tuple
+    """
+    code = ('import sys, time\n'
+            'start = time.perf_counter()\n'
+            'import {}\n'
+            'duration = time.perf_counter() - start\n'
+            'loaded = [m for m in {!r} if m in sys.modules]\n'
+            'print(duration, *loaded)\n').format(module, LAZY_MODULES)
+    best = None
+    loaded = []
+    for i in range(REPEATS):
+        output = subprocess.check_output([sys.executable, '-c', code])
+        values = output.decode().split()
+        duration = float(values[0])
+        loaded = values[1:]
+        if best is None or duration < best:
+            best = duration
+    return best, loaded
+
+
+def main(modules):
+    failed = False
+    for module in modules:
+        duration, loaded = measure(module)
+        print('{:40s} {:8.1f} ms'.format(module, duration * 1000))
+        if len(loaded) > 0:
+            print('    loaded at the import: {}'.format(', '.join(loaded)))
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:] or MODULES))
@@ -0,0 +1,45 @@
+import numpy as np
+
+from Camera.meta.binning import split_binning, software_bin
+
+
+def test_split_binning_hardware_only():
+    assert split_binning(2, 2, 4, 4, False) == ((2, 2), (1, 1))
+
+
+def test_split_binning_software_rest():
+    assert split_binning(4, 4, 2, 2, False) == ((2, 2), (2, 2))
+    assert split_binning(3, 3, 2, 2, False) == ((1, 1), (3, 3))
+
+
+def test_split_binning_asymmetric():
+    assert split_binning(4, 2, 4, 4, True) == ((4, 2), (1, 1))
+    # without asymmetric binning the common factor is used in hardware
+    assert split_binning(4, 2, 4, 4, False) == ((2, 2), (2, 1))
+
+
+def test_software_bin_sums_pixels():
+    img = np.arange(24, dtype=np.uint16).reshape(4, 6)
+    binned = software_bin(img, 2, 2)
+    assert binned.dtype == np.uint16
+    assert binned.shape == (2, 3)
+    assert binned[0, 0] == 0 + 1 + 6 + 7
+    assert binned.sum() == img.sum()
+
+
+def test_software_bin_asymmetric_and_crop():
+    img = np.ones((5, 7), dtype=np.uint16)
+    binned = software_bin(img, 3, 2)
+    # the incomplete last row and column are removed
+    assert binned.shape == (2, 2)
+    assert np.all(binned == 6)
+
+
+def test_software_bin_clips_to_uint16():
+    img = np.full((2, 2), 60000, dtype=np.uint16)
+    assert software_bin(img, 2, 2)[0, 0] == 65535
+
+
+def test_software_bin_without_binning():
+    img = np.zeros((3, 3), dtype=np.uint16)
+    assert software_bin(img, 1, 1) is img
@@ -0,0 +1,165 @@
+from datetime import datetime
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from Camera.calibration.calibration_stage import MasterLibrary, CalibrationStage, \
+    add_calibration_header
+from Camera.calibration.master_builder import CalibrationBuilder
+from Camera.meta.image_information import ImageInformation, Image, Frame
+from Camera.meta.image_log import ImageLog
+
+
+def get_information(image_type, exposure_time=0., shape=(48, 64)):
+    # the parts of the information are class attributes, they are
+    # replaced, so the tests don't change each other
+    info = ImageInformation()
+    info.image = Image()
+    info.image.type = image_type
+    info.image.exposure_time = exposure_time
+    info.frame = Frame()
+    info.frame.x_size = shape[1]
+    info.frame.y_size = shape[0]
+    return info
+
+
+def write_frames(directory, info, frames, chip_temp=-10.):
+    """
+    Writes the frames with the image type in the header and logs them like
+    the camera.
+    """
+    log = ImageLog()
+    for i, frame in enumerate(frames):
+        path = os.path.join(directory, '{}_{}.fits'.format(info.get_image_type(), i))
+        hdu = fits.PrimaryHDU(frame)
+        hdu.header['IMAGETYP'] = info.get_iraf_type()
+        hdu.header['EXPTIME'] = info.get_exposure_time()
+        hdu.writeto(path)
+        log.__add__(datetime.now(), '', '', '', '', '', '', info.get_image_type(),
+                    str(info.get_exposure_time()), info.get_filter_name(),
+                    info.get_subframe_string(), info.get_binning_string(),
+                    str(chip_temp), '0', '0', '0', '0', 1., path)
+    log.close()
+
+
+def test_bias_has_an_iraf_type():
+    assert get_information('bias').get_iraf_type() == 'BIAS'
+
+
+def test_master_bias_end_to_end(tmp_path, monkeypatch):
+    # the image log is written into the working directory
+    monkeypatch.chdir(tmp_path)
+    raw = tmp_path / 'raw'
+    masters = tmp_path / 'masters'
+    raw.mkdir()
+    masters.mkdir()
+    rng = np.random.default_rng(3)
+    level = 1000 + np.arange(48 * 64, dtype=np.float32).reshape(48, 64) % 7
+    frames = [np.round(level + rng.normal(0, 2, level.shape)).astype(np.uint16)
+              for i in range(5)]
+    bias_info = get_information('bias')
+    write_frames(str(raw), bias_info, frames)
+
+    builder = CalibrationBuilder(log_path=str(tmp_path / 'image_log.txt'),
+                                 processes=1)
+    entries = builder.select('bias', binning=[1, 1])
+    assert len(entries) == 5
+    path = builder.build('bias', str(masters / 'master_bias.fits'))
+    header = fits.getheader(path)
+    assert header['IMAGETYP'] == 'MASTERBIAS'
+    assert header['NCOMBINE'] == 5
+    assert np.allclose(fits.getdata(path), np.median(frames, axis=0))
+
+    stage = CalibrationStage(MasterLibrary(str(masters)))
+    light = get_information('science', exposure_time=10.)
+    img = np.full((48, 64), 1500, dtype=np.uint16)
+    data, names = stage.apply(img, light, -10.)
+    assert names == {'bias': 'master_bias.fits'}
+    assert np.allclose(data, img - fits.getdata(path))
+    # no master bias for another chip temperature
+    assert stage.apply(img, light, 0.) is None
+
+
+def write_master(directory, name, image_type, data, temperature=-10.,
+                 exposure_time=0., filter_name='B', bias_subtracted=False):
+    hdu = fits.PrimaryHDU(np.asarray(data, dtype=np.float32))
+    hdu.header['IMAGETYP'] = 'MASTER' + image_type.upper()
+    hdu.header['BINNING'] = '1:1'
+    hdu.header['SUBFRAME'] = '0000:0000;0064:0048'
+    hdu.header['CCDTEMP'] = temperature
+    hdu.header['EXPTIME'] = exposure_time
+    hdu.header['FILTER'] = filter_name
+    if bias_subtracted:
+        hdu.header['BIASSUB'] = 'master_bias.fits'
+    hdu.writeto(os.path.join(directory, name))
+
+
+@pytest.fixture
+def library(tmp_path):
+    write_master(str(tmp_path), 'master_bias.fits', 'bias', np.full((48, 64), 100.))
+    write_master(str(tmp_path), 'master_dark.fits', 'dark', np.full((48, 64), 20.),
+                 exposure_time=20., bias_subtracted=True)
+    flat = np.ones((48, 64))
+    flat[:, 32:] = 2.
+    write_master(str(tmp_path), 'master_flat.fits', 'flat', flat, filter_name='R')
+    return MasterLibrary(str(tmp_path))
+
+
+def test_apply_bias_scaled_dark_and_flat(library):
+    stage = CalibrationStage(library)
+    info = get_information('science', exposure_time=10.)
+    info.image.filter = 'R'
+    img = np.full((48, 64), 310, dtype=np.uint16)
+    data, names = stage.apply(img, info, -10.)
+    assert names == {'bias': 'master_bias.fits', 'dark': 'master_dark.fits',
+                     'flat': 'master_flat.fits'}
+    assert data.dtype == np.float32
+    # 310 - 100 (bias) - 10 (dark of 20 s scaled to 10 s), divided by the flat
+    assert np.allclose(data[:, :32], 200.)
+    assert np.allclose(data[:, 32:], 100.)
+
+
+def test_apply_without_flat_of_the_filter(library):
+    stage = CalibrationStage(library)
+    info = get_information('science', exposure_time=20.)
+    data, names = stage.apply(np.full((48, 64), 130, dtype=np.uint16), info, -10.)
+    assert names == {'bias': 'master_bias.fits', 'dark': 'master_dark.fits'}
+    assert np.allclose(data, 10.)
+
+
+def test_apply_skips_masters_of_another_size(library):
+    stage = CalibrationStage(library)
+    info = get_information('science', exposure_time=10.)
+    info.image.filter = 'R'
+    # e.g. a software binned frame of the full subframe
+    assert stage.apply(np.zeros((24, 32), dtype=np.uint16), info, -10.) is None
+
+
+def test_apply_without_masters(library):
+    stage = CalibrationStage(library)
+    info = get_information('science', exposure_time=10.)
+    # the bias and the dark are too warm, there is no flat of the filter B
+    assert stage.apply(np.zeros((48, 64), dtype=np.uint16), info, 5.) is None
+
+
+def test_prepared_set_is_cached(library):
+    stage = CalibrationStage(library)
+    info = get_information('science', exposure_time=10.)
+    img = np.zeros((48, 64), dtype=np.uint16)
+    stage.apply(img, info, -10.)
+    stage.apply(img, info, -10.)
+    assert stage.cache.misses == 1
+    assert stage.cache.hits == 1
+
+
+def test_calibrated_path_and_header(library):
+    assert CalibrationStage(library).get_path('./m31_3.fits') == './m31_3_cal.fits'
+    assert CalibrationStage(library, mode='replace').get_path('./m31.fits') == './m31.fits'
+    with pytest.raises(ValueError):
+        CalibrationStage(library, mode='overwrite')
+    header = fits.Header()
+    add_calibration_header(header, {'bias': 'master_bias.fits'})
+    assert header['BIASCORR'] == 'master_bias.fits'
+    assert 'DARKCORR' not in header
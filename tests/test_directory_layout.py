@@ -0,0 +1,77 @@
+from datetime import datetime
+import os
+
+from Camera.meta.directory_layout import DirectoryLayout, clean_name
+from Camera.meta.image_information import ImageInformation, Image, Frame, TelescopeTime
+
+
+def get_information(object_name='M 31', local_time=datetime(2024, 3, 2, 3, 30)):
+    # the parts of the information are class attributes, they are
+    # replaced, so the tests don't change each other
+    info = ImageInformation()
+    info.image = Image()
+    info.image.object = object_name
+    info.image.filter = 'R'
+    info.image.type = 'science'
+    info.frame = Frame()
+    info.time = TelescopeTime()
+    info.time.date_cet = local_time
+    info.save_path = './image.fits'
+    return info
+
+
+def test_clean_name():
+    assert clean_name('M 31') == 'M_31'
+    assert clean_name('NGC 7000 / North America') == 'NGC_7000_North_America'
+    assert clean_name('../etc') == 'etc'
+    assert clean_name('   ') == 'unknown'
+    assert clean_name('', default='none') == 'none'
+
+
+def test_directory_of_the_night(tmp_path):
+    layout = DirectoryLayout(str(tmp_path))
+    # the morning belongs to the night of the previous date
+    directory = layout.get_directory(get_information())
+    assert directory == os.path.join(str(tmp_path), '20240301', 'M_31', 'R', 'science')
+    directory = layout.get_directory(get_information(local_time=datetime(2024, 3, 2, 13)))
+    assert directory == os.path.join(str(tmp_path), '20240302', 'M_31', 'R', 'science')
+
+
+def test_pattern_with_binning(tmp_path):
+    layout = DirectoryLayout(str(tmp_path), pattern='{target}/{binning}')
+    directory = layout.get_directory(get_information())
+    assert directory == os.path.join(str(tmp_path), 'M_31', '1x1')
+
+
+def test_sub_directories_after_max_files(tmp_path):
+    layout = DirectoryLayout(str(tmp_path), max_files=2)
+    info = get_information()
+    directory = layout.get_directory(info)
+    paths = [layout.get_path(info) for _ in range(5)]
+    assert paths[0] == os.path.join(directory, 'image.fits')
+    assert paths[1] == os.path.join(directory, 'image.fits')
+    assert paths[2] == os.path.join(directory, '001', 'image.fits')
+    assert paths[3] == os.path.join(directory, '001', 'image.fits')
+    assert paths[4] == os.path.join(directory, '002', 'image.fits')
+    assert os.path.isdir(os.path.join(directory, '002'))
+
+
+def test_scan_continues_the_last_sub_directory(tmp_path):
+    info = get_information()
+    directory = DirectoryLayout(str(tmp_path)).get_directory(info)
+    os.makedirs(os.path.join(directory, '001'))
+    for name in ('a.fits', 'b.fit', 'a_cal.fits', 'a.png'):
+        open(os.path.join(directory, '001', name), 'w').close()
+
+    # the calibrated frame and the preview aren't counted
+    layout = DirectoryLayout(str(tmp_path), max_files=3)
+    assert layout.get_path(info) == os.path.join(directory, '001', 'image.fits')
+    assert layout.get_path(info) == os.path.join(directory, '002', 'image.fits')
+
+
+def test_no_limit(tmp_path):
+    layout = DirectoryLayout(str(tmp_path), max_files=None)
+    info = get_information()
+    directory = layout.get_directory(info)
+    for _ in range(5):
+        assert layout.get_path(info) == os.path.join(directory, 'image.fits')
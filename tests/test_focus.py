@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from Camera.analysis.focus import fit_focus_curve, measure_stars
+
+
+def test_fit_focus_curve_hyperbola():
+    positions = np.linspace(4000, 6000, 11)
+    values = 2.5 * np.sqrt(1 + ((positions - 5150) / 300.) ** 2)
+    fit = fit_focus_curve(positions, values)
+    assert fit['position'] == pytest.approx(5150, abs=1e-3)
+    assert fit['minimum'] == pytest.approx(2.5, rel=1e-6)
+    assert fit['coefficients']['b'] == pytest.approx(300, rel=1e-6)
+    assert fit['residual'] < 1e-6
+
+
+def test_fit_focus_curve_parabola():
+    positions = [1, 2, 3, 4, 5]
+    values = [(p - 3.5) ** 2 + 2 for p in positions]
+    fit = fit_focus_curve(positions, values, model='parabola')
+    assert fit['position'] == pytest.approx(3.5)
+    assert fit['minimum'] == pytest.approx(2)
+
+
+def test_fit_focus_curve_ignores_nan():
+    positions = [1, 2, 3, 4, 5, 6]
+    values = [(p - 3.5) ** 2 + 2 for p in positions]
+    values[5] = np.nan
+    fit = fit_focus_curve(positions, values, model='parabola')
+    assert fit['position'] == pytest.approx(3.5)
+
+
+def test_fit_focus_curve_errors():
+    with pytest.raises(ValueError):
+        fit_focus_curve([1, 2], [3, 4])
+    with pytest.raises(ValueError):
+        fit_focus_curve([1, 2, 3], [3, 4, 3])
+    with pytest.raises(ValueError):
+        fit_focus_curve([1, 2, 3], [3, 2, 3], model='gauss')
+
+
+def test_measure_stars_grows_box_for_defocused_stars():
+    rng = np.random.default_rng(1)
+    img = rng.normal(1000, 10, (400, 400))
+    y, x = np.mgrid[:400, :400]
+    sigma = 8.
+    for cy, cx in ((100, 100), (100, 300), (300, 100), (300, 300)):
+        img += 20000 * np.exp(-((y - cy) ** 2 + (x - cx) ** 2) / (2 * sigma ** 2))
+    stars = measure_stars(img.astype(np.uint16))
+    assert len(stars['hfd']) == 4
+    # the box holds the complete star and the HFD of a Gaussian is 2.355 sigma
+    assert stars['radius'] >= 1.5 * np.median(stars['hfd'])
+    assert np.median(stars['hfd']) == pytest.approx(2.355 * sigma, rel=0.1)
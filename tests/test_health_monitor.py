@@ -0,0 +1,106 @@
+from threading import Event, current_thread, main_thread
+import time
+
+import pytest
+
+from Camera.drivers import health_monitor
+from Camera.drivers.health_monitor import HealthMonitor
+
+
+class StubDriver:
+    """
+    Driver with the interface, which is used by the health monitor.
+    """
+
+    def __init__(self, alive=True, reconnects=True):
+        self.driver_type = 'Camera'
+        self.health = 'connected'
+        self.connect_event = Event()
+        self.connect_event.set()
+        self.alive = alive
+        self.reconnects = reconnects
+        self.reconnect_threads = []
+        self.reconnected = Event()
+
+    def probe(self):
+        return self.alive
+
+    def reconnect(self):
+        self.reconnect_threads.append(current_thread())
+        self.reconnected.set()
+        return self.reconnects
+
+    def set_health(self, health):
+        self.health = health
+
+
+def get_stopped_monitor(driver, **kwargs):
+    # the driver isn't checked while it's not connected
+    driver.connect_event.clear()
+    monitor = HealthMonitor([driver], **kwargs)
+    monitor.stop()
+    monitor.join()
+    driver.connect_event.set()
+    return monitor
+
+
+def test_reconnect_in_monitor_thread_with_com(monkeypatch):
+    com_threads = []
+    monkeypatch.setattr(health_monitor, 'CoInitializeEx',
+                        lambda mode: com_threads.append(current_thread()))
+    driver = StubDriver()
+    driver.health = 'reconnecting'
+    monitor = HealthMonitor([driver])
+    try:
+        assert driver.reconnected.wait(5)
+    finally:
+        monitor.stop()
+    assert driver.reconnect_threads[0] is monitor
+    assert driver.reconnect_threads[0] is not main_thread()
+    # COM is initialised once in the monitor thread before the reconnect
+    assert com_threads == [monitor]
+
+
+def test_probe_failure_starts_reconnecting():
+    driver = StubDriver(alive=False)
+    monitor = get_stopped_monitor(driver, backoff_start=2.)
+    state = monitor.states[0]
+    monitor.__check__(state)
+    assert driver.health == 'reconnecting'
+    assert state.probe_failures == 1
+    assert state.next_time - time.time() == pytest.approx(2., abs=0.1)
+
+
+def test_reconnect_backoff_grows_until_the_maximum():
+    driver = StubDriver(reconnects=False)
+    driver.health = 'reconnecting'
+    monitor = get_stopped_monitor(driver, backoff_start=1., backoff_max=5.)
+    state = monitor.states[0]
+    waits = []
+    for i in range(4):
+        monitor.__check__(state)
+        waits.append(round(state.next_time - time.time()))
+    assert waits == [2, 4, 5, 5]
+    assert state.reconnect_attempts == 4
+
+    driver.reconnects = True
+    monitor.__check__(state)
+    assert driver.health == 'connected'
+    assert state.attempts == 0
+    assert state.reconnects == 1
+    assert state.interval == monitor.min_interval
+    assert monitor.get_metrics()['Camera']['transitions'] == {'reconnecting->connected': 1}
+
+
+def test_probe_interval_grows_and_busy_probe_resets_it():
+    driver = StubDriver()
+    monitor = get_stopped_monitor(driver, min_interval=1., max_interval=2.)
+    state = monitor.states[0]
+    for i in range(3):
+        monitor.__check__(state)
+    assert state.interval == 2.
+    driver.alive = None
+    monitor.__check__(state)
+    assert state.interval == 1.
+    assert state.busy_probes == 1
+    assert driver.health == 'connected'
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from Camera.meta.image_log import ImageLog, LOG_COLUMNS, LOG_HEADER, read_log
+
+
+def add_entry(log, path, statistics=None, timing=None):
+    log.__add__(datetime(2024, 3, 1, 22, 15, 30), 'jpr', 'M31', '00:42:44',
+                '+41:16:09', '00:42:44', '+41:16:09', 'science', '30.0', 'R',
+                '0010:0020;0512:0256', '2:2', '-10.0', '5.0', '3.0', '60', '70',
+                1.25, path, statistics, timing)
+
+
+def test_round_trip(tmp_path, monkeypatch):
+    # the log is written into the working directory
+    monkeypatch.chdir(tmp_path)
+    log = ImageLog()
+    add_entry(log, './m31.fits', statistics={'median': 1000.0, 'saturated': 3},
+              timing=[('exposure', 30.0001), ('write', 0.25)])
+    add_entry(log, './m31_0.fits')
+    log.close()
+    entries = read_log(str(tmp_path / 'image_log.txt'))
+    assert len(entries) == 2
+    entry = entries[0]
+    expected = {'date': '2024-03-01 22:15:30', 'observer': 'jpr', 'target': 'M31',
+                'telescope_ra': '00:42:44', 'telescope_dec': '+41:16:09',
+                'target_ra': '00:42:44', 'target_dec': '+41:16:09',
+                'type': 'science', 'exposure_time': '30.0', 'filter': 'R',
+                'subframe_start': '0010:0020', 'subframe_size': '0512:0256',
+                'subframe': '0010:0020;0512:0256', 'binning': '2:2',
+                'chip_temp': '-10.0', 'dome_temp': '5.0', 'out_temp': '3.0',
+                'dome_hum': '60', 'out_hum': '70'}
+    for name, value in expected.items():
+        assert entry[name] == value, name
+    # every named column is read back
+    assert set(name for name in LOG_COLUMNS if name != '') <= set(entry.keys())
+    assert entry['median'] == '1000.0'
+    assert entry['saturated'] == '3'
+    assert entry['timing_exposure'] == '30.000100'
+    assert entry['timing_write'] == '0.250000'
+    assert entry['readout_time'] == '1.25'
+    assert entry['path'] == './m31.fits'
+    assert entries[1]['path'] == './m31_0.fits'
+    assert 'median' not in entries[1]
+
+
+def test_read_old_log_without_line_break(tmp_path):
+    path = tmp_path / 'image_log.txt'
+    path.write_text(LOG_HEADER + '2024-03-01 22:15:30;jpr;M31;;;;;flat;1.0;B;'
+                    '0000:0000;2048:2048;1:1;-10.0;0;0;;0;0\n')
+    entries = read_log(str(path))
+    assert len(entries) == 1
+    assert entries[0]['type'] == 'flat'
+    assert entries[0]['out_hum'] == '0'
+    assert 'path' not in entries[0]
+
+
+def test_missing_log(tmp_path):
+    assert read_log(str(tmp_path / 'image_log.txt')) == []
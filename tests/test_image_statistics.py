@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from Camera.meta.frame_buffer import FrameBuffer
+from Camera.meta.image_statistics import compute_statistics, get_log_statistics, \
+    get_subsample
+
+
+def test_statistics_match_numpy():
+    rng = np.random.default_rng(4)
+    img = rng.integers(900, 1100, (100, 120)).astype(np.uint16)
+    img[0, :3] = 65535
+    statistics = compute_statistics(img)
+    assert statistics['min'] == img.min()
+    assert statistics['max'] == 65535
+    assert statistics['mean'] == pytest.approx(img.mean())
+    assert statistics['median'] == np.median(img)
+    assert statistics['mad'] == np.median(np.abs(img - np.median(img)))
+    assert statistics['saturated'] == 3
+    assert statistics['histogram'].dtype == np.uint32
+    assert statistics['histogram'].sum() == img.size
+
+
+def test_subsample_scales_the_saturated_pixels():
+    img = np.zeros((400, 400), dtype=np.uint16)
+    img[:100] = 65535
+    assert get_subsample(img, 40000) == 2
+    assert get_subsample(img, None) is None
+    statistics = compute_statistics(img, subsample=2)
+    assert statistics['subsample'] == 2
+    assert statistics['saturated'] == 40000
+
+
+def test_log_statistics_without_histogram():
+    statistics = compute_statistics(np.ones((2, 2), dtype=np.uint16))
+    assert 'histogram' not in get_log_statistics(statistics)
+
+
+def test_frame_buffer_keeps_the_histogram():
+    img = np.ones((10, 10), dtype=np.uint16)
+    statistics = compute_statistics(img)
+    buffer = FrameBuffer()
+    buffer.add(img, None, get_log_statistics(statistics), statistics['histogram'])
+    frame = buffer.get()
+    assert frame['histogram'][1] == 100
+    assert not frame['histogram'].flags.writeable
+    assert buffer.get_size() == img.nbytes + statistics['histogram'].nbytes
@@ -0,0 +1,107 @@
+from threading import Thread, Event
+import os
+
+import pytest
+
+from Camera.meta.image_writer import PathAllocator, ImageWriter, get_free_path, \
+    write_image
+
+
+class BrokenHDU:
+
+    def writeto(self, path, overwrite=False):
+        raise IOError('disk full')
+
+
+class FailingHDU:
+
+    def writeto(self, path, overwrite=False):
+        raise ValueError('no data')
+
+
+class HDU:
+
+    def writeto(self, path, overwrite=False):
+        open(path, 'w').close()
+
+
+def test_allocate_wanted_path(tmp_path):
+    allocator = PathAllocator()
+    path = str(tmp_path / 'm31.fits')
+    assert allocator.allocate(path) == path
+    assert os.path.exists(path)
+    assert allocator.allocate(path) == str(tmp_path / 'm31_0.fits')
+    assert allocator.allocate(path) == str(tmp_path / 'm31_1.fits')
+
+
+def test_allocate_after_the_highest_existing_suffix(tmp_path):
+    for name in ('m31.fits', 'm31_0.fits', 'm31_7.fits', 'm31_x.fits', 'm33_9.fits'):
+        (tmp_path / name).touch()
+    allocator = PathAllocator()
+    assert allocator.allocate(str(tmp_path / 'm31.fits')) == str(tmp_path / 'm31_8.fits')
+
+
+def test_allocate_skips_files_of_other_writers(tmp_path):
+    allocator = PathAllocator()
+    path = str(tmp_path / 'm31.fits')
+    allocator.allocate(path)
+    # created after the scan, e.g. by another process
+    (tmp_path / 'm31_0.fits').touch()
+    assert allocator.allocate(path) == str(tmp_path / 'm31_1.fits')
+
+
+def test_allocate_unique_paths_in_threads(tmp_path):
+    allocator = PathAllocator()
+    path = str(tmp_path / 'm31.fits')
+    paths = []
+
+    def allocate():
+        for i in range(50):
+            paths.append(allocator.allocate(path))
+
+    threads = [Thread(target=allocate) for i in range(4)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert len(set(paths)) == 200
+    assert len(os.listdir(str(tmp_path))) == 200
+
+
+def test_same_naming_as_the_search(tmp_path):
+    path = str(tmp_path / 'm31.fits')
+    allocator = PathAllocator()
+    for i in range(3):
+        assert get_free_path(path) == allocator.allocate(path)
+
+
+def test_write_image_removes_the_empty_file(tmp_path):
+    path = str(tmp_path / 'm31.fits')
+    with pytest.raises(IOError):
+        write_image(BrokenHDU(), path, PathAllocator())
+    assert not os.path.exists(path)
+
+
+def test_writer_survives_broken_images(tmp_path):
+    writer = ImageWriter()
+    results = []
+    done = Event()
+
+    def callback(path, error):
+        results.append((os.path.basename(path), type(error)))
+        if len(results) == 4:
+            done.set()
+
+    try:
+        writer.write(BrokenHDU(), str(tmp_path / 'a.fits'), callback)
+        writer.write(FailingHDU(), str(tmp_path / 'b.fits'), callback)
+        # a broken callback doesn't stop the writer either
+        writer.write(HDU(), str(tmp_path / 'c.fits'), lambda path, error: 1 / 0)
+        writer.write(HDU(), str(tmp_path / 'd.fits'), callback)
+        writer.write(HDU(), str(tmp_path / 'e.fits'), callback)
+        assert done.wait(10)
+    finally:
+        writer.close()
+    assert results == [('a.fits', IOError), ('b.fits', ValueError),
+                       ('d.fits', type(None)), ('e.fits', type(None))]
+    assert sorted(os.listdir(str(tmp_path))) == ['c.fits', 'd.fits', 'e.fits']
@@ -0,0 +1,69 @@
+from urllib.request import urlopen
+
+import pytest
+
+from Camera.meta.metrics import Metrics, MetricsServer, TimedComObject
+
+
+class ComObject:
+    Temperature = -10.
+
+    def StartExposure(self, duration, light):
+        return duration
+
+
+def test_counters_and_timings():
+    metrics = Metrics('test')
+    metrics.describe('frames', 'the saved frames')
+    metrics.increment('frames')
+    metrics.increment('frames', 2)
+    metrics.increment('errors', device='Camera')
+    metrics.observe('save_seconds', 0.5)
+    metrics.observe('save_seconds', 1.5)
+    lines = metrics.get_text().splitlines()
+    assert '# HELP test_frames the saved frames' in lines
+    assert '# TYPE test_frames counter' in lines
+    assert 'test_frames_total 3' in lines
+    assert 'test_errors_total{device="Camera"} 1' in lines
+    assert '# TYPE test_save_seconds summary' in lines
+    assert 'test_save_seconds_count 2' in lines
+    assert 'test_save_seconds_sum 2.000000' in lines
+    assert 'test_save_seconds_max 1.500000' in lines
+
+
+def test_gauges():
+    metrics = Metrics('test')
+    metrics.add_gauge('temperature', lambda: -10, 'the chip temperature')
+    metrics.add_gauge('unknown', lambda: None)
+    metrics.add_gauge('broken', lambda: 1 / 0)
+    lines = metrics.get_text().splitlines()
+    assert '# HELP test_temperature the chip temperature' in lines
+    assert 'test_temperature -10.0' in lines
+    # unknown values and failing gauges aren't exported
+    assert not any('unknown' in line or 'broken' in line for line in lines)
+
+
+def test_timed_com_object():
+    metrics = Metrics('test')
+    com_object = ComObject()
+    timed = TimedComObject(com_object, metrics, 'Camera')
+    assert timed.Temperature == -10.
+    assert timed.StartExposure(2., True) == 2.
+    timed.Temperature = -20.
+    assert com_object.Temperature == -20.
+    counts = {dict(labels)['member']: value[0]
+              for (name, labels), value in metrics.timings.items()}
+    assert counts == {'Temperature': 2, 'StartExposure': 1}
+
+
+def test_server():
+    metrics = Metrics('test')
+    metrics.increment('frames')
+    server = MetricsServer(metrics, port=0)
+    try:
+        with urlopen('http://127.0.0.1:{}/metrics'.format(server.port), timeout=5) as response:
+            assert 'test_frames_total 1' in response.read().decode()
+        with pytest.raises(Exception):
+            urlopen('http://127.0.0.1:{}/other'.format(server.port), timeout=5)
+    finally:
+        server.close()
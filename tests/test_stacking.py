@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+
+from Camera.analysis.stacking import LiveStack, LiveStacker
+
+
+def get_frames(amount=20, shape=(30, 40)):
+    rng = np.random.default_rng(2)
+    return rng.normal(100, 10, size=(amount,) + shape).astype(np.float32)
+
+
+def test_live_stack_mean_and_variance():
+    frames = get_frames()
+    stack = LiveStack(frames.shape[1:])
+    for frame in frames:
+        stack.add(frame)
+    mean, variance, count = stack.get_snapshot()
+    assert count == len(frames)
+    assert np.allclose(mean, frames.mean(axis=0), atol=1e-3)
+    assert np.allclose(variance, frames.var(axis=0, ddof=1), rtol=1e-3)
+
+
+def test_live_stack_view_is_read_only():
+    stack = LiveStack((3, 3))
+    view = stack.get_view()
+    assert not view.flags.writeable
+    assert np.shares_memory(view, stack.mean)
+
+
+def test_live_stack_clips_outliers():
+    frames = get_frames()
+    frames[10, 5, 5] = 60000
+    stack = LiveStack(frames.shape[1:], clip_sigma=3.)
+    for frame in frames:
+        stack.add(frame)
+    assert stack.count[5, 5] == len(frames) - 1
+    assert abs(stack.get_view()[5, 5] - 100) < 10
+
+
+def test_live_stack_rejects_other_shape():
+    stack = LiveStack((3, 3))
+    with pytest.raises(ValueError):
+        stack.add(np.zeros((4, 4)))
+
+
+def test_live_stacker_bounds_stacks_and_writes_snapshots(tmp_path):
+    frames = get_frames(3).astype(np.uint16)
+    stacker = LiveStacker(max_stacks=2, snapshot_directory=str(tmp_path))
+    for name in ('a', 'b', 'c'):
+        stacker.add((name, 'V', 'LIGHT', 1), frames[0])
+    assert stacker.get_keys() == [('b', 'V', 'LIGHT', 1), ('c', 'V', 'LIGHT', 1)]
+    assert stacker.wait_snapshots(10)
+    assert os.path.exists(stacker.get_snapshot_path(('c', 'V', 'LIGHT', 1)))
+    assert stacker.get_error_message() == ''
+
+
+def test_live_stacker_restarts_on_new_shape():
+    stacker = LiveStacker()
+    stacker.add('key', np.zeros((3, 3)))
+    stack = stacker.add('key', np.zeros((4, 4)))
+    assert stack.shape == (4, 4)
+    assert stack.frames == 1
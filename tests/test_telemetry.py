@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from Camera.meta.telemetry import TelemetryLevel, TelemetryStore, COLUMNS
+
+
+def get_sample(timestamp, temperature):
+    sample = np.full(len(COLUMNS), np.nan)
+    sample[0] = timestamp
+    sample[1] = temperature
+    return sample
+
+
+def test_level_averages_buckets():
+    level = TelemetryLevel(10, 5)
+    for t in range(30):
+        level.add(get_sample(t, t))
+    data = level.get_data()
+    # two finished buckets and the current one
+    assert len(data) == 3
+    assert data[0, 1] == 4.5
+    assert data[2, 1] == 24.5
+
+
+def test_level_ring_wraps():
+    level = TelemetryLevel(1, 4)
+    for t in range(10):
+        level.add(get_sample(t, t))
+    data = level.get_data()
+    # the four newest finished buckets and the current one in time order
+    assert list(data[:, 0]) == [5, 6, 7, 8, 9]
+    assert level.get_start() == 5
+
+
+def test_level_recovers_ring_position(tmp_path):
+    path = str(tmp_path / 'level.npy')
+    level = TelemetryLevel(1, 4, path)
+    for t in range(7):
+        level.add(get_sample(t, t))
+    level.data.flush()
+    del level
+    level = TelemetryLevel(1, 4, path)
+    assert level.count == 4
+    assert level.position == 2
+    assert list(level.get_data()[:, 0]) == [2, 3, 4, 5]
+    level.add(get_sample(10, 10))
+    level.add(get_sample(11, 11))
+    # the oldest bucket is overwritten first
+    assert list(level.get_data()[:, 0]) == [3, 4, 5, 10, 11]
+
+
+def test_level_rejects_other_shape(tmp_path):
+    path = str(tmp_path / 'level.npy')
+    TelemetryLevel(1, 4, path)
+    with pytest.raises(ValueError):
+        TelemetryLevel(1, 5, path)
+
+
+def test_store_statistics():
+    store = TelemetryStore(levels=((1, 100),))
+    for t in range(10):
+        store.add(t, temperature=-10 + t % 2)
+    statistics = store.get_statistics(2, 7)
+    assert statistics['min'] == -10
+    assert statistics['max'] == -9
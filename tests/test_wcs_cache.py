@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from Camera.interface.wcs_cache import WCSCache, get_pixel_scale, get_separation
+
+
+def get_solution(ra=10., dec=20., quality=None):
+    scale = 1.5 / 3600.
+    return {'offset': (0., 0.), 'quality': quality,
+            'wcs': {'CRVAL1': ra, 'CRVAL2': dec, 'CD1_1': scale, 'CD2_1': 0.}}
+
+
+def test_no_hint_without_solution():
+    cache = WCSCache()
+    assert cache.get_hint(('a',)) is None
+    assert cache.get_metrics()['misses'] == 1
+
+
+def test_hint_narrows_the_search():
+    cache = WCSCache(search_radius=0.5, scale_tolerance=0.1)
+    cache.store(('a',), get_solution())
+    hint = cache.get_hint(('a',))
+    assert hint['search']['ra'] == 10.
+    assert hint['search']['dec'] == 20.
+    assert hint['search']['radius'] == 0.5
+    assert hint['search']['scale_low'] == pytest.approx(1.35)
+    assert hint['search']['scale_high'] == pytest.approx(1.65)
+    assert not hint['reuse']
+    assert cache.get_hint(('b',)) is None
+
+
+def test_solution_without_wcs_isnt_stored():
+    cache = WCSCache()
+    cache.store(('a',), {'offset': None, 'wcs': None})
+    cache.store(None, get_solution())
+    assert cache.get_metrics()['entries'] == 0
+
+
+def test_reuse_of_stable_solutions():
+    cache = WCSCache(reuse_quality=2.)
+    cache.store(('a',), get_solution(quality=1.))
+    assert cache.get_hint(('a',))['reuse']
+    cache.store(('a',), get_solution(quality=5.))
+    assert not cache.get_hint(('a',))['reuse']
+    # the first solution of a key has no quality
+    cache.store(('b',), get_solution())
+    assert not cache.get_hint(('b',))['reuse']
+    assert cache.get_metrics()['reuses'] == 1
+
+
+def test_old_solutions_expire():
+    cache = WCSCache(max_age=10.)
+    cache.store(('a',), get_solution())
+    cache.entries[('a',)]['time'] = time.time() - 11.
+    assert cache.get_hint(('a',)) is None
+    assert cache.get_metrics()['entries'] == 0
+
+
+def test_oldest_key_is_removed():
+    cache = WCSCache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.store((key,), get_solution())
+    assert list(cache.entries.keys()) == [('b',), ('c',)]
+
+
+def test_pixel_scale_and_separation():
+    assert get_pixel_scale(get_solution()['wcs']) == pytest.approx(1.5)
+    assert get_pixel_scale({'CDELT1': -1. / 3600.}) == pytest.approx(1.)
+    assert get_pixel_scale({}) is None
+    assert get_separation({'CRVAL1': 10., 'CRVAL2': 20.},
+                          {'CRVAL1': 10., 'CRVAL2': 20.001}) == pytest.approx(3.6)
+    assert get_separation({'CRVAL1': 10.}, {'CRVAL1': 10., 'CRVAL2': 0.}) is None
@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from Camera.interface.wcs_cache import WCSCache
+from Camera.interface.wcs_pool import WCSPool
+
+
+def solve(path, hint):
+    """
+    Solver of the worker processes, the offset tells if there was a hint.
+    """
+    if path.startswith('broken'):
+        raise ValueError('no stars')
+    if path.startswith('slow'):
+        time.sleep(0.3)
+    return {'offset': (path, hint is not None), 'quality': None, 'reused': False,
+            'wcs': {'CRVAL1': 10., 'CRVAL2': 20.}}
+
+
+class SlowCache(WCSCache):
+    """
+    Cache with a slow store, so a dispatch before the store misses the hint.
+    """
+
+    def store(self, key, solution):
+        time.sleep(0.05)
+        WCSCache.store(self, key, solution)
+
+
+class Signal:
+
+    def __init__(self):
+        self.offsets = []
+
+    def emit(self, offset):
+        self.offsets.append(offset)
+
+
+def wait_emitted(signal, amount, timeout=30.):
+    end = time.time() + timeout
+    while len(signal.offsets) < amount:
+        if time.time() > end:
+            raise AssertionError('only {} offsets'.format(len(signal.offsets)))
+        time.sleep(0.01)
+
+
+def test_next_job_gets_the_cached_hint():
+    signal = Signal()
+    pool = WCSPool(solve, processes=1, cache=SlowCache())
+    try:
+        for i in range(5):
+            pool.submit('img{}'.format(i), signal, ('key',))
+        wait_emitted(signal, 5)
+    finally:
+        pool.close()
+    # only the first image is solved without a hint
+    assert signal.offsets == [('img0', False)] + [('img{}'.format(i), True)
+                                                  for i in range(1, 5)]
+
+
+def test_offsets_in_submission_order():
+    signal = Signal()
+    pool = WCSPool(solve, processes=3)
+    try:
+        for path in ('slow0', 'img1', 'img2', 'slow3', 'img4'):
+            pool.submit(path, signal)
+        wait_emitted(signal, 5)
+    finally:
+        pool.close()
+    assert [offset[0] for offset in signal.offsets] == ['slow0', 'img1', 'img2',
+                                                        'slow3', 'img4']
+
+
+def test_drop_oldest_keeps_the_order():
+    signal = Signal()
+    pool = WCSPool(solve, processes=1, max_queue=2)
+    try:
+        pool.submit('slow0', signal)
+        # the first job is running, the queue holds two jobs
+        time.sleep(0.1)
+        for i in range(1, 5):
+            assert pool.submit('img{}'.format(i), signal)
+        wait_emitted(signal, 3)
+        metrics = pool.get_metrics()
+    finally:
+        pool.close()
+    assert [offset[0] for offset in signal.offsets] == ['slow0', 'img3', 'img4']
+    assert metrics['dropped'] == 2
+
+
+def test_skip_new_images():
+    signal = Signal()
+    pool = WCSPool(solve, processes=1, max_queue=1, policy='skip')
+    try:
+        pool.submit('slow0', signal)
+        time.sleep(0.1)
+        assert pool.submit('img1', signal)
+        assert not pool.submit('img2', signal)
+        wait_emitted(signal, 2)
+        assert pool.get_metrics()['skipped'] == 1
+    finally:
+        pool.close()
+    assert [offset[0] for offset in signal.offsets] == ['slow0', 'img1']
+
+
+def test_failed_job_is_reported_and_skipped():
+    signal = Signal()
+    pool = WCSPool(solve, processes=2)
+    try:
+        pool.submit('broken0', signal)
+        pool.submit('img1', signal)
+        wait_emitted(signal, 1)
+        metrics = pool.get_metrics()
+    finally:
+        pool.close()
+    assert signal.offsets == [('img1', False)]
+    assert metrics['failed'] == 1
+    assert pool.get_error_message().startswith('Can\'t solve the WCS of broken0: no stars')
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        WCSPool(solve, policy='block')